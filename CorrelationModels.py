@@ -113,7 +113,7 @@ models = {
                             'pos': 2, 'type': 'Real', 'doc': 'Eref [GeV]'},
                         'babs': {
                             'pos': 3, 'type': 'Real', 'doc': 'Babs [ T ]'},
-                        'sigma_e:': {
+                        'sigma_e': {
                             'pos': 4, 'type': 'Real', 'doc': 'σE [GeV]'}}},
         'dispersion': {
             'desc': 'Dispersion', 'doc': '',
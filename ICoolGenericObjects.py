@@ -6,6 +6,8 @@ class Container(ICoolObject):
     """Abstract class container for other commands.
     """
 
+    instance_attributes = ['enclosed_commands']
+
     def __init__(self, enclosed_commands=None):
         if enclosed_commands is None:
             self.enclosed_commands = []
@@ -1,4 +1,9 @@
-class ICoolGenerator(object):
+from icool_slots import CommandMeta, SlotState
+
+
+class ICoolGenerator(SlotState):
+
+    __metaclass__ = CommandMeta
 
     def get_base_classes(self):
         base_tuple = self.__class__.__bases__
@@ -114,13 +114,13 @@ models = {
                     'pos': 4, 'type': 'Real', 'doc': 'Distance from center to left edge [m] '},
                 'z1': {
                     'pos': 5, 'type': 'Real', 'doc': 'Distance from center to right edge [m]}'},
-                'θ0': {
+                'theta0': {
                     'pos': 6, 'type': 'Real', 'doc': 'Polar angle from vertex of left edge [deg]'},
-                'φ0': {
+                'phi0': {
                     'pos': 7, 'type': 'Real', 'doc': 'Azimuthal angle of left face [deg]'},
-                'θ1': {
+                'theta1': {
                     'pos': 8, 'type': 'Real', 'doc': 'Polar angle from vertex of right edge [deg] '},
-                'φ1': {
+                'phi1': {
                     'pos': 9, 'type': 'Real', 'doc': 'Azimuthal angle of right face [deg]'}}},
         'PWEDGE': {
             'desc': 'Asymmetric polynomial wedge absorber region',
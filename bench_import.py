@@ -0,0 +1,42 @@
+"""
+Start-up cost of ipycool: time taken by a fresh interpreter to run a bare
+from ipycool import SRegion, and the modules the import pulls in.  Each run is a separate process,
+as a batch worker would be.  The first run compiles ipycool.pyc and is not counted; with
+PYTHONDONTWRITEBYTECODE set every run compiles the module and the figures are much higher.
+
+Run with: python bench_import.py
+"""
+import os
+import subprocess
+import sys
+
+probe = '''
+import sys, time
+start = time.time()
+from ipycool import SRegion
+elapsed = time.time() - start
+print elapsed, int('IPython' in sys.modules), len(sys.modules)
+'''
+
+
+def time_import():
+    """Returns the seconds taken by the import, whether IPython was imported, and the module count."""
+    output = subprocess.check_output([sys.executable, '-c', probe],
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed, ipython, modules = output.split()[-3:]
+    return float(elapsed), ipython == '1', int(modules)
+
+
+def main(num_runs=10):
+    time_import()
+    runs = sorted(time_import() for i in range(num_runs))
+    elapsed = [run[0] for run in runs]
+    print 'from ipycool import SRegion, %d runs' % num_runs
+    print '%-8s %10.1f ms' % ('min', 1000 * elapsed[0])
+    print '%-8s %10.1f ms' % ('median', 1000 * elapsed[num_runs // 2])
+    print '%-8s %10.1f ms' % ('max', 1000 * elapsed[-1])
+    print 'modules loaded: %d, IPython imported: %s' % (runs[0][2], runs[0][1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Per-object memory of slotted command objects compared with the __dict__-backed layout they
+used to have.  The dict-backed figure is measured on a plain object holding the same attributes
+in its __dict__.
+
+Run with: python bench_memory.py
+"""
+import sys
+from ipycool import SRegion, SubRegion, Sol, Accel, Material
+
+
+class DictLayout(object):
+    """Plain object with the previous __dict__-backed layout."""
+    pass
+
+
+def slotted_size(obj):
+    return sys.getsizeof(obj)
+
+
+def dict_size(obj):
+    plain = DictLayout()
+    plain.__dict__.update(obj.__getstate__())
+    return sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)
+
+
+def sample_objects():
+    sol = Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40)
+    accel = Accel(model='ez', rect_cyn=0, freq=4.5, grad=11.1, phase=0, mode=0)
+    material = Material(geom='CBLOCK', mtag='LH')
+    subregion = SubRegion(irreg=1, rlow=0, rhigh=0.5, field=sol, material=material)
+    sregion = SRegion(slen=1.0, nrreg=1, zstep=0.001)
+    sregion.add_enclosed_command(subregion)
+    return [('SRegion', sregion), ('SubRegion', subregion), ('Sol', sol), ('Accel', accel),
+            ('Material', material)]
+
+
+def main(num_regions=100000):
+    objects = sample_objects()
+    print '%-10s %10s %10s' % ('class', '__dict__', '__slots__')
+    per_region_dict = 0
+    per_region_slots = 0
+    for name, obj in objects:
+        before = dict_size(obj)
+        after = slotted_size(obj)
+        print '%-10s %10d %10d' % (name, before, after)
+        if name in ('SRegion', 'SubRegion', 'Sol', 'Material'):
+            per_region_dict += before
+            per_region_slots += after
+    print
+    print 'Deck of %d SRegions (SRegion + SubRegion + Sol + Material each):' % num_regions
+    print '  __dict__: %.1f MB' % (per_region_dict * num_regions / 1e6)
+    print '  __slots__: %.1f MB' % (per_region_slots * num_regions / 1e6)
+
+
+if __name__ == '__main__':
+    main()
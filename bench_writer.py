@@ -0,0 +1,77 @@
+"""
+Time and write() calls taken to write the for001.dat of a deck of 100,000 SRegions, written
+token by token to an unbuffered file as before, and through For001Writer.
+
+Run with: python bench_writer.py
+"""
+import os
+import tempfile
+import time
+from ipycool import ICoolInput, Title, Cont, Bmt, Ints, Section, SRegion, SubRegion, Sol, Material
+
+
+class CountingFile(object):
+    """Wraps a file and counts the calls made to write()."""
+
+    def __init__(self, file):
+        self.file = file
+        self.num_writes = 0
+
+    def write(self, text):
+        self.num_writes += 1
+        self.file.write(text)
+
+
+def build_deck(num_regions):
+    sol = Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40)
+    material = Material(geom='CBLOCK', mtag='LH')
+    section = Section()
+    for i in range(num_regions):
+        sregion = SRegion.from_validated(slen=1.0, nrreg=1, zstep=0.001)
+        sregion.add_enclosed_command(
+            SubRegion.from_validated(irreg=1, rlow=0, rhigh=0.5, field=sol, material=material))
+        section.add_enclosed_command(sregion)
+    return ICoolInput(title=Title(title='bench_writer'), cont=Cont(npart=10), bmt=Bmt(nbeamtyp=1),
+                      ints=Ints(), section=section)
+
+
+def write_tokens(obj, file):
+    """The previous path: one write() per token, recursing into enclosed commands."""
+    for part in obj.for001_parts():
+        if isinstance(part, basestring):
+            file.write(part)
+        else:
+            write_tokens(part, file)
+
+
+def main(num_regions=100000):
+    deck = build_deck(num_regions)
+    path = os.path.join(tempfile.mkdtemp(), 'for001.dat')
+
+    with open(path, 'wb', 0) as raw:
+        file = CountingFile(raw)
+        start = time.time()
+        write_tokens(deck, file)
+        token_time = time.time() - start
+    token_writes = file.num_writes
+    token_size = os.path.getsize(path)
+
+    with open(path, 'wb', 0) as raw:
+        file = CountingFile(raw)
+        start = time.time()
+        deck.gen(file)
+        buffered_time = time.time() - start
+    buffered_writes = file.num_writes
+    buffered_size = os.path.getsize(path)
+    os.remove(path)
+
+    print 'Deck of %d SRegions, %d bytes' % (num_regions, buffered_size)
+    print '%-12s %10s %10s' % ('path', 'writes', 'seconds')
+    print '%-12s %10d %10.2f' % ('per-token', token_writes, token_time)
+    print '%-12s %10d %10.2f' % ('buffered', buffered_writes, buffered_time)
+    if token_size != buffered_size:
+        print 'Output sizes differ: %d and %d bytes' % (token_size, buffered_size)
+
+
+if __name__ == '__main__':
+    main()
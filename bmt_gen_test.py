@@ -2,7 +2,7 @@ import py.test
 from ipycool import *
 
 
-def bmt_gen_test():
+def bmt_gen_test(file='./for001.dat'):
     title = Title(title='Test IPYCOOL')
     co = Cont(npart=10000)
     
@@ -57,7 +57,6 @@ def bmt_gen_test():
     rep.add_enclosed_command(sreg_accel)
     
     input = ICoolInput(cont=co, bmt=bmt, ints=interactions, title=title, section=s)
-    file = './' + 'for001.dat'
     f = open(file, 'w')
     
     input.gen(f)
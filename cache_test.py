@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import icool_cache
+from icool_runner import Runner
+from icool_cache import ResultCache
+
+stand_in = """#!%s
+import os
+import sys
+deck = open('for001.dat').read()
+with open(os.path.join(os.path.dirname(sys.argv[0]), 'runs'), 'a') as file:
+    file.write('x')
+field = open('for003.dat').read() if os.path.exists('for003.dat') else ''
+with open('for009.dat', 'w') as file:
+    file.write(deck.upper() + field + 'y' * 1000)
+print 'ran'
+sys.exit(3 if 'FAIL' in deck else 0)
+"""
+
+
+def cache_test():
+    root = tempfile.mkdtemp()
+    try:
+        executable = os.path.join(root, 'icool')
+        with open(executable, 'w') as file:
+            file.write(stand_in % sys.executable)
+        os.chmod(executable, 0755)
+
+        def count_runs():
+            path = os.path.join(root, 'runs')
+            return len(open(path).read()) if os.path.exists(path) else 0
+
+        def make(name, deck, field=None):
+            directory = os.path.join(root, name)
+            os.mkdir(directory)
+            with open(os.path.join(directory, 'for001.dat'), 'wb') as file:
+                file.write(deck)
+            if field is not None:
+                with open(os.path.join(directory, 'for003.dat'), 'wb') as file:
+                    file.write(field)
+            return directory
+
+        cache = ResultCache(os.path.join(root, 'cache'), max_bytes=2500)
+        runner = Runner(executable, processes=1, cache=cache)
+        first = runner.run([make('a', 'deck one\n', 'field')])[0]
+        assert first.status == 0 and not first.cached and count_runs() == 1
+        # The same deck, with other line endings and trailing blanks, is answered from the cache.
+        b = make('b', 'deck one  \r\n', 'field')
+        second = runner.run([b])[0]
+        assert second.cached and second.status == 0 and count_runs() == 1
+        assert open(os.path.join(b, 'for009.dat')).read().startswith('DECK ONE\nfield')
+        assert open(os.path.join(b, 'icool.log')).read() == 'ran\n'
+        assert (cache.hits, cache.misses) == (1, 1)
+        # A change to an auxiliary input is a miss.
+        assert not runner.run([make('c', 'deck one\n', 'other field')])[0].cached
+        assert count_runs() == 2
+        # Failed runs are not cached.
+        runner.run([make('d', 'FAIL\n')])
+        assert not runner.run([make('e', 'FAIL\n')])[0].cached and count_runs() == 4
+        # Entries are evicted, least recently used first, to keep under max_bytes.
+        assert len(list(cache.iter_entries())) == 2
+        runner.run([make('two', 'deck two\n')])
+        assert cache.get_size() <= 2500 and len(list(cache.iter_entries())) == 2
+        assert runner.run([make('three', 'deck two\n')])[0].cached
+        assert not runner.run([make('f', 'deck one\n', 'field')])[0].cached
+        assert count_runs() == 6
+        # A corrupt entry is removed and the deck run again.
+        key = cache.get_key(os.path.join(root, 'f'), executable)
+        with open(os.path.join(cache.get_entry(key), 'for009.dat'), 'ab') as file:
+            file.write('z')
+        assert cache.verify() == 1
+        assert not runner.run([make('g', 'deck one\n', 'field')])[0].cached
+        assert runner.run([make('h', 'deck one\n', 'field')])[0].cached
+        assert count_runs() == 7
+        # Another build of ICOOL, even of the same name, does not share the results of the first.
+        other = os.path.join(root, 'build', 'icool')
+        os.mkdir(os.path.dirname(other))
+        with open(other, 'w') as file:
+            file.write(stand_in % sys.executable + '# rebuilt\n')
+        os.chmod(other, 0755)
+        directory = make('i', 'deck one\n', 'field')
+        assert cache.get_key(directory, other) != cache.get_key(directory, executable)
+        assert not Runner(other, processes=1, cache=cache).run([directory])[0].cached
+        assert count_runs() == 7 and os.path.exists(os.path.join(root, 'build', 'runs'))
+    finally:
+        shutil.rmtree(root)
+
+
+def cache_entry_test():
+    root = tempfile.mkdtemp()
+    try:
+        source = os.path.join(root, 'run')
+        os.mkdir(source)
+        with open(os.path.join(source, 'for001.dat'), 'w') as file:
+            file.write('deck\n')
+        with open(os.path.join(source, 'for009.dat'), 'w') as file:
+            file.write('output\n')
+        cache = ResultCache(os.path.join(root, 'cache'))
+        key = cache.get_key(source)
+        assert cache.store(key, source, ['for009.dat'], {'status': 0})
+        manifest_path = os.path.join(cache.get_entry(key), 'manifest.json')
+        manifest = json.load(open(manifest_path))
+        size, content = manifest['files']['for009.dat']
+        # A manifest naming a file outside the entry is corrupt: nothing is written outside the run.
+        outside = os.path.join(root, 'outside')
+        for name in (outside, '../../../outside', 'sub/../../outside'):
+            assert cache.store(key, source, ['for009.dat'], {'status': 0})
+            with open(manifest_path, 'w') as file:
+                json.dump(dict(manifest, files={name: [size, content]}), file)
+            target = os.path.join(root, 'target')
+            misses = cache.misses
+            assert cache.restore(key, target) is None and cache.misses == misses + 1
+            assert not os.path.exists(cache.get_entry(key)) and not os.path.exists(outside)
+        # Unreadable entries and temporary directories left by a dead process are removed on eviction.
+        assert cache.store(key, source, ['for009.dat'], {'status': 0})
+        parent = os.path.dirname(cache.get_entry(key))
+        unreadable = os.path.join(parent, 'unreadable')
+        os.mkdir(unreadable)
+        with open(os.path.join(unreadable, 'manifest.json'), 'w') as file:
+            file.write('{')
+        for name, age in (('.tmpold', 2 * icool_cache.temporary_age), ('.tmpnew', 0)):
+            os.mkdir(os.path.join(parent, name))
+            used = time.time() - age
+            os.utime(os.path.join(parent, name), (used, used))
+        assert cache.evict() == 2
+        assert sorted(os.listdir(parent)) == sorted(['.tmpnew', os.path.basename(cache.get_entry(key))])
+        assert cache.restore(key, os.path.join(root, 'target')) == {'status': 0}
+        cache.clear()
+        assert os.listdir(parent) == []
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,72 @@
+from ipycool import *
+from sweep_test import sweep_deck, for001_text
+
+
+def make_sreg():
+    sreg = SRegion(slen=1.0, nrreg=1, zstep=0.001)
+    sreg.add_enclosed_command(SubRegion(irreg=1, rlow=0, rhigh=0.5,
+                                        field=Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40),
+                                        material=Material(geom='CBLOCK', mtag='LH')))
+    return sreg
+
+
+def clone_test():
+    sreg = make_sreg()
+    original = for001_text(sreg)
+    subregion = sreg.enclosed_commands[0]
+
+    # clone shares the enclosed commands, but not the list holding them.
+    shallow = sreg.clone(slen=0.5)
+    assert shallow.enclosed_commands is not sreg.enclosed_commands
+    assert shallow.enclosed_commands[0] is subregion and sreg.slen == 1.0
+    shallow.add_enclosed_command(SubRegion(irreg=2, rlow=0.5, rhigh=1.0, field=NoField(),
+                                           material=Material(geom='CBLOCK', mtag='VAC')))
+    assert len(sreg.enclosed_commands) == 1 and for001_text(sreg) == original
+
+    # deep_clone shares nothing.
+    deep = sreg.deep_clone(slen=0.5)
+    copied = deep.enclosed_commands[0]
+    assert copied is not subregion and copied.field is not subregion.field
+    assert copied.material is not subregion.material
+    assert for001_text(deep) == for001_text(sreg.clone(slen=0.5))
+    copied.field.bs = 2.5
+    copied.rhigh = 0.25
+    assert subregion.field.bs == 40 and subregion.rhigh == 0.5 and for001_text(sreg) == original
+    assert sreg.deep_clone(rhigh=1.0).enclosed_commands[0].rhigh == 0.5
+
+    # A command enclosed twice is copied once.
+    sreg.add_enclosed_command(subregion)
+    deep = sreg.deep_clone()
+    assert deep.enclosed_commands[0] is deep.enclosed_commands[1] is not subregion
+
+
+def wrapped_sreg_test():
+    sreg = make_sreg()
+    original = for001_text(sreg)
+    wrapped = Repeat.wrapped_sreg(outstep=0.25, sreg=sreg)
+    assert wrapped.nrep == 4 and sreg.slen == 1.0
+    wrapped_sreg = wrapped.enclosed_commands[1]
+    assert wrapped_sreg.slen == 0.25
+    subregion = wrapped_sreg.enclosed_commands[0]
+    assert subregion is not sreg.enclosed_commands[0] and subregion.field is not sreg.enclosed_commands[0].field
+
+    # Changing the wrapped region leaves the caller's region alone, and the other way round.
+    wrapped_text = for001_text(wrapped)
+    subregion.field.bs = 2.5
+    subregion.rhigh = 0.25
+    assert for001_text(sreg) == original
+    sreg.enclosed_commands[0].field.bs = 3.0
+    assert subregion.field.bs == 2.5 and for001_text(wrapped) != wrapped_text
+
+
+def evolve_aliasing_test():
+    deck = sweep_deck()
+    original = deck.get_for001()
+    # In sweep_deck every region holds the same Sol, so evolving one region copies that Sol alone.
+    variant = deck.evolve(['section', 1, 0, 'field'], bs=2.5)
+    fields = [sregion.enclosed_commands[0].field for sregion in variant.section.enclosed_commands]
+    old_fields = [sregion.enclosed_commands[0].field for sregion in deck.section.enclosed_commands]
+    assert fields[1] is not old_fields[1] and fields[1].bs == 2.5
+    assert fields[0] is fields[2] is old_fields[1] and old_fields[1].bs == 40
+    old_fields[0].bs = 3.0
+    assert fields[1].bs == 2.5 and deck.get_for001() != original
@@ -0,0 +1,59 @@
+from ipycool import *
+from sweep_test import sweep_deck, for001_text
+
+
+def region_text(deck, number):
+    return deck.section.enclosed_commands[number].get_for001()
+
+
+def dirty_test():
+    deck = sweep_deck()
+    text = deck.get_for001()
+    assert text == for001_text(deck)
+    sregions = deck.section.enclosed_commands
+    sol = sregions[0].enclosed_commands[0].field
+    material = sregions[0].enclosed_commands[0].material
+    before = [region_text(deck, number) for number in range(4)]
+
+    # A Field shared by every region: a change after gen reaches the cached text of each owner.
+    sol.bs = 2.5
+    assert deck.for001_cache is None and deck.section.for001_cache is None
+    assert all(sregion.for001_cache is None for sregion in sregions)
+    after = [region_text(deck, number) for number in range(4)]
+    assert all(old != new for old, new in zip(before, after))
+    assert deck.get_for001() == for001_text(sweep_deck_with(bs=2.5))
+
+    # The same for a shared Material.
+    deck.get_for001()
+    material.mtag = 'LI'
+    assert all(sregion.for001_cache is None for sregion in sregions)
+    assert deck.get_for001() == for001_text(sweep_deck_with(bs=2.5, mtag='LI'))
+
+    # A nested child invalidates its ancestors only.
+    deck.get_for001()
+    subregion = sregions[2].enclosed_commands[0]
+    subregion.rhigh = 0.25
+    assert subregion.for001_cache is None and sregions[2].for001_cache is None
+    assert deck.section.for001_cache is None and deck.for001_cache is None
+    assert sregions[1].for001_cache is not None and deck.cont.for001_cache is not None
+    expected = sweep_deck_with(bs=2.5, mtag='LI')
+    expected.section.enclosed_commands[2].enclosed_commands[0].rhigh = 0.25
+    assert deck.get_for001() == for001_text(expected)
+
+    # Changing enclosed_commands in place and calling mark_dirty.
+    deck.get_for001()
+    sregions[3].enclosed_commands.pop()
+    sregions[3].mark_dirty()
+    assert deck.for001_cache is None
+    expected.section.enclosed_commands[3].enclosed_commands.pop()
+    assert deck.get_for001() == for001_text(expected)
+
+
+def sweep_deck_with(**values):
+    deck = sweep_deck()
+    subregion = deck.section.enclosed_commands[0].enclosed_commands[0]
+    if 'bs' in values:
+        subregion.field.bs = values['bs']
+    if 'mtag' in values:
+        subregion.material.mtag = values['mtag']
+    return deck
@@ -0,0 +1,77 @@
+import os
+import math
+import shutil
+import tempfile
+import numpy
+from icool_ecalc import Ecalc9, write_table, masses, c_light, e_field
+
+m = masses[2]
+sigma_x = 0.01
+sigma_px = 0.02
+pz = 0.2
+count = 20000
+
+
+def write_beam(path):
+    """
+    Writes a for009.dat with two planes of a Gaussian muon beam: in region 1 uncorrelated and without
+    field, in region 2 with an x-Px correlation of 1 GeV/c per m, in a 2 T solenoid.
+    """
+    random = numpy.random.RandomState(5)
+    lines = ['# Gaussian beam\n']
+    for region, correlation, bz in [(1, 0.0, 0.0), (2, 1.0, 2.0)]:
+        x, y = random.normal(0, sigma_x, (2, count))
+        px = random.normal(0, sigma_px, count) + correlation * x
+        py = random.normal(0, sigma_px, count) + correlation * y
+        momentum = random.normal(pz, 0.01, count)
+        t = random.normal(1e-8, 1e-10, count)
+        rows = numpy.zeros((count + 1, 23))
+        rows[1:, 0] = numpy.arange(1, count + 1)
+        rows[:, 1:5] = [1, 2, 0, region]
+        rows[0, 5:12] = [1e-8, 0, 0, region, 0, 0, pz]
+        rows[1:, 5], rows[1:, 6], rows[1:, 7], rows[1:, 8] = t, x, y, region
+        rows[1:, 9], rows[1:, 10], rows[1:, 11] = px, py, momentum
+        rows[:, 14] = bz
+        rows[:, 15] = 1.0
+        # A lost particle and an electron, which are not analysed.
+        rows[-1, 3] = -1
+        rows[-2, 2] = 1
+        lines.extend('%6d%6d%4d%3d%5d' % tuple(row[:5]) + ''.join(' %15.8E' % value for value in row[5:]) + '\n'
+                     for row in rows)
+    with open(path, 'w') as file:
+        file.writelines(lines)
+
+
+def ecalc_test():
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'for009.dat')
+        write_beam(path)
+        eps_t = sigma_x * sigma_px / m
+        transmission = 1 - math.exp(-2) * 3
+        results = Ecalc9(trans_cut_a=4 * eps_t, trans_cut_b=1.0, long_cut=1.0).analyse(path, processes=2)
+        assert list(results['region']) == [1, 2] and list(results['n']) == [count - 2] * 2
+        assert numpy.allclose(results['n0'], count - 2) and numpy.allclose(results['n2'], count - 2)
+        assert numpy.allclose(results['eps_T'], eps_t, rtol=0.02)
+        assert numpy.allclose(results['beta_T'], pz * sigma_x / sigma_px, rtol=0.02)
+        assert numpy.allclose(results['pz'], pz, rtol=0.001)
+        assert numpy.allclose(results['n1'] / results['n0'], transmission, atol=0.015)
+        first, second = results
+        assert abs(first['alpha_T']) < 0.02 and abs(first['L_d']) < 0.02 and first['kappa'] == 0
+        assert abs(second['alpha_T'] + sigma_x ** 2 / (m * eps_t)) < 0.02
+        l_can = e_field * 2.0 / 2 * 2 * sigma_x ** 2
+        assert abs(second['L_can'] - l_can) < 0.02 * l_can
+        assert abs(second['L_d'] - l_can / (2 * m * eps_t)) < 0.02
+        # The 6D emittance of an uncorrelated beam is the product of the others.
+        assert abs(first['eps_6D'] / (first['eps_T'] ** 2 * first['eps_L']) - 1) < 0.02
+        assert abs(first['eps_L'] - c_light * first['sigma_t'] * first['sigma_E'] / m) < 0.02 * first['eps_L']
+        correlated = Ecalc9(pz_correlation=True).analyse(path, processes=1)
+        assert numpy.allclose(correlated['eps_L'], results['eps_L'], rtol=0.02)
+        assert (Ecalc9(trans_cut_a=4 * eps_t, trans_cut_b=1.0, long_cut=1.0).analyse(path, processes=1) ==
+                results).all()
+        cut = Ecalc9(sigma_cut=2.0).analyse(path, processes=1)
+        assert (cut['n0'] < results['n0']).all() and (cut['eps_T'] < results['eps_T']).all()
+        write_table(os.path.join(root, 'ecalc9.dat'), results)
+        assert len(open(os.path.join(root, 'ecalc9.dat')).readlines()) == 3
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,32 @@
+from ipycool import *
+from sweep_test import sweep_deck, for001_text
+
+
+def evolve_test():
+    deck = sweep_deck()
+    original = deck.get_for001()
+    variant = deck.evolve(['section', 1, 0, 'field'], bs=2.5)
+    assert deck.get_for001() == original and deck.for001_cache is original
+    sregions = deck.section.enclosed_commands
+    assert sregions[1].for001_cache is not None and deck.section.for001_cache is not None
+
+    expected = sweep_deck()
+    expected.section.enclosed_commands[1].enclosed_commands[0].field = \
+        Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=2.5)
+    assert variant.get_for001() == for001_text(expected) != original
+    assert for001_text(deck) == original
+
+    # Only the commands along the path are copied.
+    changed = variant.section.enclosed_commands
+    assert variant.cont is deck.cont and changed[0] is sregions[0] and changed[2] is sregions[2]
+    assert changed[1] is not sregions[1]
+    assert changed[1].enclosed_commands[0].material is sregions[1].enclosed_commands[0].material
+    assert sregions[1].enclosed_commands[0].field.bs == 40
+
+    # Changing the copy afterwards leaves the original and its cache alone.
+    changed[1].enclosed_commands[0].field.bs = 3.0
+    assert deck.for001_cache is original and sregions[1].enclosed_commands[0].field.bs == 40
+    assert variant.for001_cache is None and variant.get_for001() != for001_text(expected)
+    retitled = deck.evolve([], title=Title(title='other'))
+    assert retitled.title.title == 'other' and deck.title.title == 'sweep'
+    assert deck.get_for001() == original
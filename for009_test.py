@@ -0,0 +1,72 @@
+import os
+import time
+import shutil
+import random
+import tempfile
+import numpy
+from icool_for009 import For009, read_for009, field_names
+
+header = ['#  test deck\n',
+          '# units = [s]  [m]  [GeV/c]  [T]  [V/m]\n',
+          '#evt par typ flg reg    time        x           y           z          Px          Py          Pz'
+          '          Bx          By          Bz          wt          Ex          Ey          Ez        arc'
+          '       polX        polY        polZ\n']
+
+
+def write_for009(path, events, regions, columns=23):
+    rows = []
+    random.seed(1)
+    with open(path, 'w') as file:
+        file.writelines(header)
+        for event in range(1, events + 1):
+            for region in regions:
+                row = [event, 1, 2, 0, region] + [random.gauss(0, 1) for column in range(columns - 5)]
+                rows.append(row)
+                file.write('%6d%6d%4d%2d%5d' % tuple(row[:5]) +
+                           ''.join(' %14.6E' % value for value in row[5:]) + '\n')
+        file.write('\n')
+    return rows
+
+
+def for009_test():
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'for009.dat')
+        rows = write_for009(path, 50, [1, 4, 9])
+        output = For009(root)
+        assert output.get_title() == '#  test deck' and len(output.header) == 3
+        assert output.dtype.names == tuple(field_names)
+        text = output.load(sidecar=False)
+        assert len(text) == 150 and text['region'].dtype == numpy.int32
+        assert numpy.allclose(text['Pz'], [row[11] for row in rows], rtol=1e-6)
+        records = output.load()
+        assert isinstance(records, numpy.memmap) and not records.flags.writeable
+        assert (records == text).all()
+        planes = list(output.iter_planes())
+        assert [region for region, plane in planes] == [1, 4, 9]
+        for region, plane in planes:
+            assert (plane == text[text['region'] == region]).all()
+            assert list(plane['event']) == range(1, 51)
+        # The sidecar is reused until the text changes.
+        modified = os.path.getmtime(output.sidecar)
+        time.sleep(0.01)
+        assert (read_for009(path) == text).all() and os.path.getmtime(output.sidecar) == modified
+        write_for009(path, 10, [2], columns=19)
+        os.utime(path, (modified + 10, modified + 10))
+        older = For009(path)
+        assert older.dtype.names == tuple(field_names[:19])
+        assert len(older.load()) == 10 and older.get_planes() == [2]
+        assert len(older.get_plane(3)) == 0
+        # Blank lines and a partial last line, as of a run still writing, are not records.
+        rows = write_for009(path, 20, [1, 2])
+        with open(path, 'a') as file:
+            file.write('\n\n     21     1   2 0    1  1.0E-09  2.0E-03')
+        os.utime(path, (modified + 20, modified + 20))
+        partial = For009(path)
+        records = partial.load()
+        assert len(records) == 40 and (records == partial.read()).all()
+        assert numpy.allclose(records['x'], [row[6] for row in rows], rtol=1e-6)
+        assert os.path.getsize(partial.sidecar) == records.offset + 40 * records.itemsize
+        assert partial.get_planes() == [1, 2] and len(partial.get_plane(2)) == 20
+    finally:
+        shutil.rmtree(root)
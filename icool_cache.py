@@ -0,0 +1,302 @@
+"""
+Cache of ICOOL results.
+
+A ResultCache stores the output files of finished runs under a key computed from their inputs, so
+that a run of an identical deck can be answered by copying its outputs back rather than by running
+ICOOL again.  The key is a SHA-256 hash of the canonical for001.dat text (line endings normalised
+and trailing blanks removed), of any auxiliary input files, such as for003.dat and field maps, and
+of the executable, by its real path and the hash of its content, and its arguments, so that runs of
+different builds of ICOOL are kept apart.
+
+Each entry is a directory holding the outputs and a manifest with the size and hash of each file,
+which are checked whenever the entry is used: an entry which fails the check is removed and
+treated as a miss, as is one whose manifest names a file outside the entry.  The total size of the
+entries is kept under max_bytes by removing the least recently used ones.  Entries are written to a
+temporary directory and renamed into place, so that several processes can share one cache.
+Temporary directories left by a process which died, and entries whose manifest cannot be read, are
+removed on eviction.
+
+    cache = ResultCache('~/.ipycool/results', inputs=['for003.dat', 'fields/*.dat'])
+    runner = Runner(processes=4, cache=cache)
+"""
+import os
+import json
+import glob
+import time
+import shutil
+import hashlib
+import tempfile
+
+manifest_name = 'manifest.json'
+deck_name = 'for001.dat'
+
+temporary_prefix = '.tmp'
+# Age in seconds after which a temporary directory is taken to be left by a process which died.
+temporary_age = 3600.0
+
+# Size of the blocks in which files are hashed.
+block_size = 1 << 20
+
+# Hashes of executables, by (real path, size, modification time).
+executable_hashes = {}
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_relative_name(name):
+    """Returns True if name is a relative path which stays inside the directory it is relative to."""
+    if not name or os.path.isabs(name) or os.path.splitdrive(name)[0]:
+        return False
+    return '..' not in name.replace(os.sep, '/').split('/')
+
+
+def find_executable(executable):
+    """Returns the real path of executable, looked up on the PATH if it has no directory, or None."""
+    if os.path.dirname(executable):
+        candidates = [executable]
+    else:
+        candidates = [os.path.join(directory, executable)
+                      for directory in os.environ.get('PATH', '').split(os.pathsep)]
+    for path in candidates:
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return os.path.realpath(path)
+    return None
+
+
+def get_executable_id(executable):
+    """
+    Returns the real path and content hash of executable, which identify its build.  The hash is
+    computed once for each size and modification time of the file.
+    """
+    path = find_executable(executable)
+    if path is None:
+        return [executable, None]
+    status = os.stat(path)
+    stamp = (path, status.st_size, status.st_mtime)
+    if stamp not in executable_hashes:
+        executable_hashes[stamp] = hash_file(path)
+    return [path, executable_hashes[stamp]]
+
+
+def canonical_deck(text):
+    """Returns for001.dat text with line endings normalised and trailing blanks removed."""
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').split('\n')]
+    return '\n'.join(lines).rstrip('\n') + '\n'
+
+
+def hash_deck(path):
+    """Returns the SHA-256 hash of the canonical text of the for001.dat at path."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(canonical_deck(file.read())).hexdigest()
+
+
+class ResultCache(object):
+
+    def __init__(self, root, max_bytes=1 << 30, inputs=('for003.dat',)):
+        """
+        root is the directory of the cache, which is created if need be, and max_bytes the largest
+        total size of the entries.  inputs are names or glob patterns, relative to a run directory,
+        of the files besides for001.dat which a run reads.
+        """
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        self.inputs = list(inputs)
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+    def get_input_files(self, directory):
+        """Returns the paths, relative to directory, of the input files of a run in directory."""
+        names = set([deck_name])
+        for pattern in self.inputs:
+            for path in glob.glob(os.path.join(directory, pattern)):
+                if os.path.isfile(path):
+                    names.add(os.path.relpath(path, directory))
+        return sorted(names)
+
+    def get_key(self, directory, executable='', args=()):
+        """Returns the key of a run of executable with args in directory, or None if it has no deck."""
+        path = os.path.join(directory, deck_name)
+        if not os.path.isfile(path):
+            return None
+        digest = hashlib.sha256()
+        digest.update(json.dumps(get_executable_id(executable) + list(args)))
+        for name in self.get_input_files(directory):
+            path = os.path.join(directory, name)
+            if name == deck_name:
+                content = hash_deck(path)
+            else:
+                content = hash_file(path)
+            digest.update('\0%s\0%s' % (name, content))
+        return digest.hexdigest()
+
+    def get_entry(self, key):
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def read_manifest(self, entry):
+        try:
+            with open(os.path.join(entry, manifest_name)) as file:
+                return json.load(file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def check_entry(self, entry):
+        """
+        Returns the manifest of entry if every file in it is intact, and otherwise None.  A manifest
+        naming a file outside the entry is taken as corrupt.
+        """
+        manifest = self.read_manifest(entry)
+        if manifest is None:
+            return None
+        if not all(is_relative_name(name) for name in manifest['files']):
+            return None
+        for name, (size, content) in manifest['files'].iteritems():
+            path = os.path.join(entry, name)
+            if not os.path.isfile(path) or os.path.getsize(path) != size or hash_file(path) != content:
+                return None
+        return manifest
+
+    def remove_entry(self, entry):
+        shutil.rmtree(entry, ignore_errors=True)
+
+    def restore(self, key, directory):
+        """
+        Copies the outputs stored under key into directory and returns the stored result, a dictionary
+        of RunResult fields, or None on a miss.
+        """
+        entry = self.get_entry(key)
+        if not os.path.isdir(entry):
+            self.misses += 1
+            return None
+        manifest = self.check_entry(entry)
+        if manifest is None:
+            print 'Removing corrupt cache entry ' + key
+            self.remove_entry(entry)
+            self.misses += 1
+            return None
+        for name in manifest['files']:
+            target = os.path.join(directory, name)
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            shutil.copyfile(os.path.join(entry, name), target)
+        # The modification time of the manifest is the time of last use, for eviction.
+        os.utime(os.path.join(entry, manifest_name), None)
+        self.hits += 1
+        return manifest['result']
+
+    def store(self, key, directory, names, result):
+        """
+        Stores the files names, relative to directory, under key with result, a dictionary of RunResult
+        fields.  An existing entry for key is kept.  Returns False if the files cannot be stored.
+        """
+        entry = self.get_entry(key)
+        if os.path.isdir(entry):
+            return True
+        parent = os.path.dirname(entry)
+        if not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                pass
+        temporary = tempfile.mkdtemp(dir=parent, prefix=temporary_prefix)
+        try:
+            files = {}
+            for name in names:
+                target = os.path.join(temporary, name)
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+                shutil.copyfile(os.path.join(directory, name), target)
+                files[name] = (os.path.getsize(target), hash_file(target))
+            with open(os.path.join(temporary, manifest_name), 'w') as file:
+                json.dump({'key': key, 'stored': time.time(), 'result': result, 'files': files},
+                          file, indent=1, sort_keys=True)
+            os.rename(temporary, entry)
+        except (IOError, OSError) as e:
+            self.remove_entry(temporary)
+            if os.path.isdir(entry):
+                return True
+            print 'Cannot store cache entry ' + key + ': ' + str(e)
+            return False
+        self.evict()
+        return True
+
+    def iter_paths(self):
+        """Yields the name and path of every directory in the cache, entries and temporary ones."""
+        for prefix in os.listdir(self.root):
+            parent = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(parent):
+                continue
+            for name in os.listdir(parent):
+                yield name, os.path.join(parent, name)
+
+    def iter_entries(self):
+        """Yields (last use, size, path) for every entry whose manifest can be read."""
+        for name, entry in self.iter_paths():
+            if name.startswith(temporary_prefix):
+                continue
+            manifest = self.read_manifest(entry)
+            if manifest is None:
+                continue
+            size = sum(size for size, content in manifest['files'].itervalues())
+            yield os.path.getmtime(os.path.join(entry, manifest_name)), size, entry
+
+    def iter_leftovers(self, age=temporary_age):
+        """
+        Yields the path of every entry whose manifest cannot be read, and of every temporary directory
+        last changed more than age seconds ago.
+        """
+        limit = time.time() - age
+        for name, path in self.iter_paths():
+            if name.startswith(temporary_prefix):
+                try:
+                    if os.path.getmtime(path) < limit:
+                        yield path
+                except OSError:
+                    pass
+            elif self.read_manifest(path) is None:
+                yield path
+
+    def get_size(self):
+        return sum(size for used, size, entry in self.iter_entries())
+
+    def evict(self):
+        """
+        Removes the leftover directories, then the least recently used entries until the total size is
+        at most max_bytes.  Returns the number of directories removed.
+        """
+        removed = 0
+        for path in list(self.iter_leftovers()):
+            self.remove_entry(path)
+            removed += 1
+        entries = sorted(self.iter_entries())
+        total = sum(size for used, size, entry in entries)
+        for used, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove_entry(entry)
+            total -= size
+            removed += 1
+        return removed
+
+    def verify(self):
+        """Checks every entry, removes those which fail, and returns the number removed."""
+        removed = 0
+        for used, size, entry in list(self.iter_entries()):
+            if self.check_entry(entry) is None:
+                self.remove_entry(entry)
+                removed += 1
+        return removed
+
+    def clear(self):
+        for name, path in list(self.iter_paths()):
+            self.remove_entry(path)
@@ -0,0 +1,249 @@
+"""
+Emittance and transmission of ICOOL output, as computed by ECALC9.
+
+Ecalc9 reproduces the analysis of ECALC9, as set out in R.C. Fernow, "Physics analysis performed by
+ECALC9" (MUC-NOTE-COOL_THEORY-280, shipped as 'Physics Analysis Performed By ECALC9.pdf'), on the
+output planes of a for009.dat read by icool_for009.  For each plane it gives the transverse,
+longitudinal and 6D normalized emittances, the transverse and longitudinal Twiss functions, the
+canonical angular momentum, the dispersions, and the weight of the particles within the two
+transverse and the longitudinal acceptance cuts.  Equation numbers below are those of the note.
+
+The settings are those of ECALC9F.INP, as keyword arguments:
+
+    particle_type   USEPTYPE     particle type analysed (ICOOL code, 2 = muon)
+    pz_min, pz_max  PZMIN/PZMAX  range of pZ analysed, GeV/c
+    trans_cut_a     TRANSCUTA    transverse acceptance cut, m rad
+    trans_cut_b     TRANSCUTB    second transverse acceptance cut, m rad
+    long_cut        LONGCUT      longitudinal acceptance cut, m rad
+    rf_frequency    RFFREQ       RF frequency in MHz, or None
+    sigma_cut       SIGMA_CUT    number of standard deviations of the tail cut, or None
+    pz_correlation  PZCORR       correct for the transverse amplitude - momentum correlation
+
+Every plane is analysed with vectorized numpy operations, and the planes are spread over a pool of
+processes which each map the for009.dat sidecar.  Units are those of ICOOL: m, s, GeV/c and GeV.
+
+    results = Ecalc9(trans_cut_a=0.015).analyse('run/for009.dat', processes=4)
+    print results['eps_T'], results['n1'] / results['n0'][0]
+"""
+import math
+import multiprocessing
+import numpy
+from icool_for009 import For009
+
+# Speed of light in m/s, and the momentum in GeV/c per T m of the charge e.
+c_light = 299792458.0
+e_field = 0.299792458
+
+# Masses in GeV of the ICOOL particle types.
+masses = {1: 0.000510998928, 2: 0.1056583715, 3: 0.13957018, 4: 0.493677, 5: 0.938272046}
+
+defaults = {'particle_type': 2, 'pz_min': 0.0, 'pz_max': float('inf'), 'trans_cut_a': 0.015,
+            'trans_cut_b': 0.030, 'long_cut': 0.150, 'rf_frequency': None, 'sigma_cut': None,
+            'pz_correlation': False}
+
+# Quantities computed for each plane, in the order of the result fields.
+result_names = ['region', 'z', 'n', 'n0', 'n1', 'n2', 'x', 'y', 'pz', 'Bz', 'kappa',
+                'eps_T', 'eps_L', 'eps_6D', 'beta_T', 'alpha_T', 'gamma_T', 'L_can', 'L_d',
+                'beta_L', 'alpha_L', 'delta_L', 'C_t', 'C_E', 'sigma_t', 'sigma_E', 'sigma_Ec',
+                'D_x', 'D_y', 'D_R', 'D_R2']
+result_dtype = numpy.dtype([(name, numpy.int32 if name == 'region' else numpy.int64 if name == 'n' else
+                             numpy.float64) for name in result_names])
+
+# Ecalc9 and for009.dat of the current worker process.
+worker_ecalc = None
+worker_path = None
+worker_data = None
+
+
+def weighted_mean(values, weights):
+    return numpy.dot(weights, values) / weights.sum()
+
+
+def covariance(columns, weights):
+    """Returns the weighted covariance matrix of the rows of columns, M(i, j) = <q_i q_j> - <q_i><q_j>."""
+    centred = columns - weighted_mean(columns.T, weights)[:, None]
+    return numpy.dot(centred * weights, centred.T) / weights.sum()
+
+
+def rf_time(t, frequency):
+    """Takes t modulo the period of an RF wave of frequency Hz, as ECALC9 does."""
+    count = 0.5 + t * frequency
+    count = numpy.where(count < 0, count - 1, count)
+    return t - numpy.trunc(count) / frequency
+
+
+class Ecalc9(object):
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(defaults)
+        if unknown:
+            raise TypeError('Unknown ECALC9 settings: ' + ', '.join(sorted(unknown)))
+        self.settings = dict(defaults)
+        self.settings.update(settings)
+        for name, value in self.settings.iteritems():
+            setattr(self, name, value)
+        self.mass = masses[abs(self.particle_type)]
+
+    def select(self, records):
+        """
+        Returns the records of one plane which are analysed, with the time of each relative to the
+        reference particle, and the on-axis field, taken from the reference particle.
+        """
+        reference = records[records['event'] == 0]
+        keep = ((records['flag'] == 0) & (records['type'] == self.particle_type) &
+                (records['event'] != 0) & (records['Pz'] >= self.pz_min) & (records['Pz'] <= self.pz_max))
+        particles = records[keep]
+        t = particles['t'].copy()
+        if len(reference):
+            t -= reference['t'][0]
+            bz = float(reference['Bz'][0])
+        else:
+            bz = float(particles['Bz'].mean()) if len(particles) else 0.0
+        if self.rf_frequency:
+            t = rf_time(t, self.rf_frequency * 1e6)
+        return particles, t, bz
+
+    def analyse_plane(self, records):
+        """Returns the results of one output plane, a record of result_dtype."""
+        result = numpy.zeros((), result_dtype)
+        for name in result_names:
+            if result_dtype[name].kind == 'f':
+                result[name] = numpy.nan
+        result['region'] = records['region'][0] if len(records) else -1
+        particles, t, bz = self.select(records)
+        if 'weight' in particles.dtype.names:
+            weights = particles['weight']
+        else:
+            weights = numpy.ones(len(particles))
+        result['n'] = len(particles)
+        result['n0'] = weights.sum()
+        result['Bz'] = bz
+        if len(particles) < 7:
+            return result
+        m = self.mass
+        x, y, px, py, pz = [particles[name] for name in ('x', 'y', 'Px', 'Py', 'Pz')]
+        energy = numpy.sqrt(px ** 2 + py ** 2 + pz ** 2 + m ** 2)
+        active = numpy.ones(len(particles), bool)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            for iteration in range(20):
+                values = self.emit(x, y, t, px, py, pz, energy, weights, active, bz)
+                if not self.sigma_cut:
+                    break
+                n = self.sigma_cut
+                rejected = active & ((values['A_T2'] > 2 * n ** 2 * values['eps_T']) |
+                                     (values['A_L'] > n ** 2 * values['eps_L']))
+                if not rejected.any() or active.sum() - rejected.sum() < 7:
+                    break
+                active &= ~rejected
+        result['z'] = weighted_mean(particles['z'][active], weights[active])
+        for name in result_names:
+            if name in values:
+                result[name] = values[name]
+        return result
+
+    def emit(self, x, y, t, px, py, pz, energy, weights, active, bz):
+        """Returns the quantities of subroutine EMIT for the active particles, and their amplitudes."""
+        m = self.mass
+        w = weights[active]
+        q = numpy.array([x[active], y[active], t[active], px[active], py[active], energy[active]])
+        values = {}
+        # First loop: transverse quantities (1-15).
+        mean = weighted_mean(q.T, w)
+        values['x'], values['y'] = mean[0], mean[1]
+        values['pz'] = p = weighted_mean(pz[active], w)
+        values['n0'] = w.sum()
+        M = covariance(q, w)
+        values['sigma_t'] = math.sqrt(M[2, 2])
+        values['sigma_E'] = math.sqrt(M[5, 5])
+        e = mean[5]
+        r = numpy.sqrt(q[0] ** 2 + q[1] ** 2)
+        values['D_x'] = e * M[0, 5] / M[5, 5]
+        values['D_y'] = e * M[1, 5] / M[5, 5]
+        values['D_R'] = e * (weighted_mean(q[5] * r, w) - e * weighted_mean(r, w)) / M[5, 5]
+        values['D_R2'] = e * (weighted_mean(q[5] * r ** 2, w) - (M[0, 0] + M[1, 1]) * e) / M[5, 5]
+        values['eps_6D'] = c_light * math.sqrt(max(numpy.linalg.det(M), 0.0)) / m ** 3
+        MT = M[numpy.ix_([0, 1, 3, 4], [0, 1, 3, 4])]
+        values['eps_T'] = eps_t = max(numpy.linalg.det(MT), 0.0) ** 0.25 / m
+        eb = e_field * bz
+        values['Bz'] = bz
+        values['kappa'] = kappa = eb / (2 * p)
+        values['L_can'] = (weighted_mean(q[0] * q[4] - q[1] * q[3], w) +
+                           eb / 2 * weighted_mean(q[0] ** 2 + q[1] ** 2, w))
+        values['L_d'] = l_d = (M[0, 4] - M[1, 3] + eb / 2 * (M[0, 0] + M[1, 1])) / (2 * m * eps_t)
+        values['beta_T'] = beta_t = (M[0, 0] + M[1, 1]) * p / (2 * m * eps_t)
+        values['alpha_T'] = alpha_t = -(M[0, 3] + M[1, 4]) / (2 * m * eps_t)
+        values['gamma_T'] = gamma_t = (M[3, 3] + M[4, 4]) / (2 * m * eps_t * p)
+        # Second loop: transverse amplitudes of all the particles, and longitudinal quantities (16-21).
+        xc, yc = x - mean[0], y - mean[1]
+        pxc, pyc = px - mean[3], py - mean[4]
+        a_t2 = (beta_t / p * (pxc ** 2 + pyc ** 2) + gamma_t * p * (xc ** 2 + yc ** 2) +
+                2 * alpha_t * (xc * pxc + yc * pyc) +
+                2 * (beta_t * kappa - l_d) * (xc * pyc - yc * pxc)) / m
+        ML = covariance(numpy.array([t[active], energy[active], a_t2[active]]), w)
+        if self.pz_correlation:
+            values['eps_L'] = eps_l = c_light / m * math.sqrt(max(numpy.linalg.det(ML) / ML[2, 2], 0))
+            values['alpha_L'] = alpha_l = (c_light / (m * eps_l) *
+                                           (ML[0, 1] - ML[0, 2] * ML[1, 2] / ML[2, 2]))
+            values['delta_L'] = delta = c_light / (m * eps_l) * (ML[0, 0] - ML[0, 2] ** 2 / ML[2, 2])
+            values['C_t'] = c_t = ML[0, 2] / ML[2, 2]
+            values['C_E'] = c_e = ML[1, 2] / ML[2, 2]
+        else:
+            values['eps_L'] = eps_l = c_light / m * math.sqrt(max(ML[0, 0] * ML[1, 1] - ML[0, 1] ** 2, 0))
+            values['alpha_L'] = alpha_l = c_light * ML[0, 1] / (m * eps_l)
+            values['delta_L'] = delta = c_light * ML[0, 0] / (m * eps_l)
+            values['C_t'] = c_t = 0.0
+            values['C_E'] = c_e = 0.0
+        values['beta_L'] = c_light * delta * p ** 3 / (m ** 2 + p ** 2)
+        values['sigma_Ec'] = math.sqrt(max(ML[1, 1] - c_e ** 2 * ML[2, 2], 0.0))
+        # Third loop: longitudinal amplitudes and the particles within the acceptance cuts (22-24).
+        mean_a_t2 = weighted_mean(a_t2[active], w)
+        tc = t - mean[2] - c_t * (a_t2 - mean_a_t2)
+        ec = energy - mean[5] - c_e * (a_t2 - mean_a_t2)
+        a_l = c_light / m * (tc ** 2 / delta + delta * (ec - alpha_l * tc / delta) ** 2)
+        within = active & (a_l < self.long_cut)
+        values['n1'] = weights[within & (a_t2 < self.trans_cut_a)].sum()
+        values['n2'] = weights[within & (a_t2 < self.trans_cut_b)].sum()
+        values['A_T2'] = a_t2
+        values['A_L'] = a_l
+        return values
+
+    def analyse(self, path, processes=None):
+        """
+        Analyses every output plane of the for009.dat at path, using a pool of processes (by default
+        one per CPU; with processes=1, this process).  Returns an array of result_dtype with one record
+        per plane, in order of region.
+        """
+        output = For009(path)
+        regions = output.get_planes()
+        if processes == 1 or len(regions) < 2:
+            results = [self.analyse_plane(records) for region, records in output.iter_planes()]
+        else:
+            processes = min(processes or multiprocessing.cpu_count(), len(regions))
+            pool = multiprocessing.Pool(processes, init_worker, (self.settings, output.path))
+            try:
+                results = pool.map(analyse_region, regions)
+            finally:
+                pool.terminate()
+                pool.join()
+        return numpy.array(results, result_dtype)
+
+
+def init_worker(settings, path):
+    global worker_ecalc, worker_path, worker_data
+    worker_ecalc = Ecalc9(**settings)
+    worker_path = For009(path)
+    worker_data = (worker_path.load(), worker_path.load_index())
+
+
+def analyse_region(region):
+    records, index = worker_data
+    return worker_ecalc.analyse_plane(worker_path.get_plane(region, records, index))
+
+
+def write_table(path, results):
+    """Writes results as a table with a header line, one line per plane, like ECALC9F.DAT."""
+    with open(path, 'w') as file:
+        file.write('#' + ' '.join('%14s' % name for name in result_names)[1:] + '\n')
+        for result in results:
+            file.write(' '.join('%14.6e' % result[name] if result.dtype[name].kind == 'f' else
+                                '%14d' % result[name] for name in result_names) + '\n')
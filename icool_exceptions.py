@@ -308,3 +308,39 @@ class ContainerCommandError(InputError):
 class FieldError(InputError):
     pass
 
+
+
+class OutOfBounds(InputError):
+    """Exception raised for a value outside the min and max of a parameter."""
+
+    def __init__(self, command_parameter, value, min_value, max_value):
+        InputError.__init__(self, str(value), 'Out of bounds.')
+        self.command_parameter = command_parameter
+        self.value = value
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def __str__(self):
+        msg = 'Value ' + str(self.value) + ' of ' + str(self.command_parameter) + ' is out of bounds [' + \
+            str(self.min_value) + ', ' + str(self.max_value) + ']'
+        return msg
+
+
+class For001ParseError(InputError):
+    """Exception raised for text in a for001.dat deck which cannot be parsed."""
+
+    def __init__(self, msg, line_num, token=None):
+        InputError.__init__(self, str(token), msg)
+        self.line_num = line_num
+        self.token = token
+
+    def __str__(self):
+        msg = 'for001.dat line ' + str(self.line_num) + ': ' + self.msg
+        if self.token is not None:
+            msg += ' (at ' + repr(self.token) + ')'
+        return msg
+
+
+class SerialFormatError(Error):
+    """Exception raised for data which is not a valid ipycool binary encoding."""
+    pass
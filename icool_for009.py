@@ -0,0 +1,236 @@
+"""
+Reader of ICOOL particle output (for009.dat).
+
+for009.dat holds one line for each particle at each output plane, with the columns
+
+    event particle type flag region t x y z Px Py Pz Bx By Bz weight Ex Ey Ez arc spin_x spin_y spin_z
+
+in ICOOL units (s, m, GeV/c, T, V/m).  A For009 parses the file into a numpy structured array with
+one record per line and these fields; files from older versions of ICOOL, with fewer columns, give
+the leading fields only.  The file is parsed in chunks of lines, each converted by numpy at once.
+
+Parsing a large file is slow, so load() converts it once into a sidecar, for009.dat.npy beside it,
+which later loads map into memory without reading or copying it.  The sidecar is written again
+whenever the text is newer.  A second sidecar, for009.dat.planes.npz, indexes the records of each
+output plane (region), so that iter_planes() yields one plane at a time, in file order within the
+plane, without the whole file in memory.
+
+    output = For009('run/for009.dat')
+    for region, records in output.iter_planes():
+        print region, records['Pz'].mean()
+"""
+import os
+import itertools
+import numpy
+
+sidecar_suffix = '.npy'
+index_suffix = '.planes.npz'
+
+int_fields = ['event', 'particle', 'type', 'flag', 'region']
+float_fields = ['t', 'x', 'y', 'z', 'Px', 'Py', 'Pz', 'Bx', 'By', 'Bz', 'weight', 'Ex', 'Ey', 'Ez',
+                'arc', 'spin_x', 'spin_y', 'spin_z']
+field_names = int_fields + float_fields
+
+# Number of lines parsed at a time.
+chunk_lines = 1 << 16
+block_size = 1 << 20
+
+
+def get_dtype(columns):
+    """Returns the record type of a file with the given number of columns."""
+    names = field_names[:columns]
+    return numpy.dtype([(name, numpy.int32 if name in int_fields else numpy.float64)
+                        for name in names])
+
+
+def is_data(line):
+    """Returns True for a line of particle data: twelve columns or more, the first five integers."""
+    fields = line.split()
+    return len(fields) >= 12 and all(field.lstrip('-').isdigit() for field in fields[:5])
+
+
+def parse_lines(lines, dtype):
+    """Returns the records of a list of data lines."""
+    columns = len(dtype.names)
+    lines = [line for line in lines if not line.isspace()]
+    values = numpy.fromstring(''.join(lines), sep=' ')
+    if values.size != columns * len(lines):
+        # Some line has a different number of columns, or a number numpy cannot read: parse by line.
+        rows = []
+        for line in lines:
+            row = numpy.fromstring(line, sep=' ')
+            if row.size < columns:
+                print 'for009.dat: cannot read line: ' + line.strip()
+                continue
+            rows.append(row[:columns])
+        values = numpy.array(rows).reshape(-1, columns)
+    else:
+        values = values.reshape(-1, columns)
+    records = numpy.empty(len(values), dtype)
+    for column, name in enumerate(dtype.names):
+        records[name] = values[:, column]
+    return records
+
+
+def truncate_records(path, count):
+    """
+    Shortens the records in the .npy file at path to the first count, in place: the shape in the
+    header is rewritten, padded to its old length, and the data after the last record is cut off.
+    """
+    with open(path, 'r+b') as file:
+        version = numpy.lib.format.read_magic(file)
+        prefix = file.tell()
+        if version == (1, 0):
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(file)
+            prefix += 2
+        else:
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(file)
+            prefix += 4
+        start = file.tell()
+        header = repr({'descr': numpy.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                       'shape': (count,)})
+        file.seek(prefix)
+        file.write(header.ljust(start - prefix - 1) + '\n')
+        file.truncate(start + count * dtype.itemsize)
+
+
+def newer(path, than):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(than)
+
+
+class For009(object):
+
+    def __init__(self, path):
+        """path is a for009.dat file, or a directory holding one."""
+        if os.path.isdir(path):
+            path = os.path.join(path, 'for009.dat')
+        self.path = path
+        self.sidecar = path + sidecar_suffix
+        self.index = path + index_suffix
+        self.header = []
+        self.dtype = None
+        self.read_header()
+
+    def read_header(self):
+        """
+        Reads the header lines, the title, units and column names, which come before the first line of
+        data, and the record type of the data.
+        """
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if is_data(line):
+                    self.dtype = get_dtype(len(line.split()))
+                    return
+                self.header.append(line.rstrip('\r\n'))
+        self.header = []
+        self.dtype = get_dtype(len(field_names))
+
+    def get_title(self):
+        return self.header[0].strip() if self.header else ''
+
+    def iter_chunks(self, lines=chunk_lines):
+        """Yields the records of the file, parsed from the text, in arrays of at most lines records."""
+        with open(self.path, 'rb') as file:
+            for line in itertools.islice(file, len(self.header)):
+                pass
+            while True:
+                chunk = list(itertools.islice(file, lines))
+                if chunk and not chunk[-1].endswith('\n'):
+                    # A partial last line, as of a file still being written, is not read.
+                    chunk.pop()
+                if not chunk:
+                    break
+                yield parse_lines(chunk, self.dtype)
+
+    def read(self):
+        """Parses the whole file and returns its records."""
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return numpy.empty(0, self.dtype)
+        return numpy.concatenate(chunks)
+
+    def count_lines(self):
+        """
+        Returns the number of complete lines after the header, which is at least the number of
+        records.
+        """
+        count = 0
+        with open(self.path, 'rb') as file:
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    break
+                count += block.count('\n')
+        return max(count - len(self.header), 0)
+
+    def convert(self):
+        """Writes the sidecar and the plane index, parsing the file one chunk at a time."""
+        count = self.count_lines()
+        temporary = self.sidecar + '.tmp'
+        records = numpy.lib.format.open_memmap(temporary, 'w+', self.dtype, (count,))
+        start = 0
+        for chunk in self.iter_chunks():
+            records[start:start + len(chunk)] = chunk
+            start += len(chunk)
+        records.flush()
+        regions = numpy.array(records['region'][:start])
+        del records
+        if start != count:
+            # Blank lines, partial lines and lines which could not be read were skipped.
+            truncate_records(temporary, start)
+        order = numpy.argsort(regions, kind='mergesort')
+        planes, starts, counts = numpy.unique(regions[order], return_index=True, return_counts=True)
+        temporary_index = self.index + '.tmp.npz'
+        numpy.savez(temporary_index, order=order, planes=planes, starts=starts, counts=counts)
+        os.rename(temporary_index, self.index)
+        os.rename(temporary, self.sidecar)
+
+    def is_converted(self):
+        return newer(self.sidecar, self.path) and newer(self.index, self.path)
+
+    def load(self, sidecar=True):
+        """
+        Returns the records of the file.  With sidecar True they are mapped from the sidecar, which is
+        written first if need be, and are read only; otherwise the text is parsed.
+        """
+        if not sidecar:
+            return self.read()
+        if not self.is_converted():
+            self.convert()
+        return numpy.load(self.sidecar, mmap_mode='r')
+
+    def load_index(self):
+        if not self.is_converted():
+            self.convert()
+        index = numpy.load(self.index)
+        try:
+            return dict((name, index[name]) for name in index.files)
+        finally:
+            index.close()
+
+    def get_planes(self):
+        """Returns the region numbers of the output planes, in increasing order."""
+        return list(self.load_index()['planes'])
+
+    def get_plane(self, region, records=None, index=None):
+        """Returns a copy of the records of the output plane in region, in file order."""
+        records = self.load() if records is None else records
+        index = self.load_index() if index is None else index
+        number = numpy.searchsorted(index['planes'], region)
+        if number == len(index['planes']) or index['planes'][number] != region:
+            return numpy.empty(0, self.dtype)
+        start = index['starts'][number]
+        rows = index['order'][start:start + index['counts'][number]]
+        return records[rows]
+
+    def iter_planes(self):
+        """Yields (region, records) for each output plane, with one plane in memory at a time."""
+        records = self.load()
+        index = self.load_index()
+        for region in index['planes']:
+            yield int(region), self.get_plane(region, records, index)
+
+
+def read_for009(path, sidecar=True):
+    """Returns the records of the for009.dat at path.  See For009.load."""
+    return For009(path).load(sidecar)
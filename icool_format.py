@@ -0,0 +1,109 @@
+"""
+Generated for001.dat formatters.
+
+compile_for001_parts turns the positional layout of a command (its begtag, the parameter at each
+position, the line_splits of its for001_format and its closing text) into the source of a
+for001_parts generator, which is compiled once per class or model.  All of the text between two
+enclosed command objects is produced by a single string formatting operation, so rendering an
+object no longer walks its parameters or line_splits.
+"""
+
+value = 'value'
+logical = 'logical'
+command = 'command'
+
+
+class Marker(str):
+
+    """
+    Text which stands in for a parameter value, as in the decks compiled by icool_template.  A marker
+    is rendered as itself in any position, including a logical one.
+    """
+
+
+class LogicalText(dict):
+
+    def __missing__(self, key):
+        if isinstance(key, Marker):
+            return key
+        raise KeyError(key)
+
+
+logical_text = LogicalText({True: '.true.', False: '.false.'})
+
+
+def field_text(text):
+    """A position filled with fixed text."""
+    return (None, text)
+
+
+def field_attr(name, kind=value):
+    """A position filled with attribute name, formatted according to kind."""
+    return (name, kind)
+
+
+def layout_literals(prefix, num_fields, line_splits, suffix):
+    """
+    Returns the text preceding each of num_fields fields, followed by the text after the last one.
+    A newline is started whenever the number of fields on the current line reaches the current
+    entry of line_splits.
+    """
+    literals = [prefix]
+    count = 0
+    split_num = 0
+    cur_split = line_splits[split_num]
+    for i in range(num_fields):
+        if count == cur_split:
+            literals[-1] += '\n'
+            count = 0
+            split_num = split_num + 1
+            cur_split = line_splits[split_num]
+        literals.append(' ')
+        count = count + 1
+    literals[-1] += suffix
+    return literals
+
+
+def compile_for001_parts(name, prefix, fields, line_splits, suffix):
+    """
+    Returns a generator function of one argument, the object being rendered, which yields its
+    for001.dat text and, in their place in the text, the command objects held by its command fields.
+    fields holds one entry per position, built with field_text or field_attr.
+    """
+    literals = layout_literals(prefix, len(fields), line_splits, suffix)
+    body = []
+    template = [literals[0].replace('%', '%%')]
+    args = []
+
+    def flush():
+        text = ''.join(template)
+        if args:
+            body.append('    yield %r %% (%s,)' % (text, ', '.join(args)))
+        elif text:
+            body.append('    yield %r' % text)
+        del template[:]
+        del args[:]
+
+    for (attr, kind), literal in zip(fields, literals[1:]):
+        if attr is None:
+            template.append(kind.replace('%', '%%'))
+        elif kind == command:
+            flush()
+            body.append('    yield obj.%s' % attr)
+        elif kind == logical:
+            template.append('%s')
+            args.append('logical_text[obj.%s]' % attr)
+        else:
+            template.append('%s')
+            args.append('obj.%s' % attr)
+        template.append(literal.replace('%', '%%'))
+    flush()
+    if not body:
+        body.append('    return')
+        body.append('    yield')
+    source = '\n'.join(['def for001_parts(obj):'] + body) + '\n'
+    namespace = {'logical_text': logical_text}
+    exec compile(source, '<for001 %s>' % name, 'exec') in namespace
+    function = namespace['for001_parts']
+    function.source = source
+    return function
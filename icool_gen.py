@@ -1,18 +1,12 @@
-import json
 from pprint import pprint
+from icool_schema import load_schema
 
 title_def='Default ICOOL'
 cont_def={'npart': '10000', 'bgen': '.true'}
 bmt_def={}
 
 def parse_icool_lang():
-    with open('icool_commands.json') as data_file:
-        data=json.load(data_file)
-        #pprint(data)
-        ic=get_ICOOL_COMMANDS(data)
-        reg=get_REGION_COMMANDS(data)
-        #pprint(ic)
-        return ic
+    return get_ICOOL_COMMANDS(load_schema().groups)
         
 def get_ICOOL_COMMANDS(icool_dict):
     return icool_dict['ICOOL_COMMANDS']
@@ -21,11 +15,11 @@ def get_REGION_COMMANDS(icool_dict):
     return icool_dict['REGION_COMMANDS']
 
 def get_NAMELIST(namelist):
-    ic=get_icool_commands()
+    ic=parse_icool_lang()
     return ic[namelist]
 
 def get_CONT_COMMANDS():
-    ic=get_icool_commands()
+    ic=parse_icool_lang()
     return ic['CONT']
 
 def CONT_COMMAND(command):
@@ -36,10 +30,7 @@ def help(command_spec):
     return command_spec[3]
 
 def get_IC_command_spec(command):
-    ic=parse_icool_lang()
-    for key in ic:
-        if command in ic[key]:
-            return (key, ic[key][command])
+    return load_schema().get(command)
 
 def help(command):
     cs=get_IC_command_spec(command)
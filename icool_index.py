@@ -0,0 +1,257 @@
+"""
+Offset index for large for001.dat decks.
+
+For001Index memory-maps a deck and records the byte offsets of every SECTION, CELL, REPEAT and
+SREGION command, together with the matching ENDSECTION/ENDCELL/ENDREPEAT, and the command
+enclosing each of them.  A single command, or a range of SREGIONs, can then be read into ipycool
+objects with icool_parser without reading the rest of the deck.
+
+An SREGION has no end tag: its span ends with the last line of its own parameters and SubRegions,
+so that pseudoregions following it (OUTPUT, REFP, GRID, ...) are not read as part of it.
+
+The index is saved next to the deck (for001.dat.idx) and reused by open() as long as the size and
+modification time of the deck are unchanged.
+
+    index = For001Index.open('for001.dat')
+    cell = index.load(index.find('CELL')[0])
+    sregions = index.load_range(index.find('SREGION')[1000:1010])
+"""
+import os
+import re
+import mmap
+import struct
+from array import array
+import ipycool
+from icool_parser import For001Parser, load_registries, get_region_layout, get_model_table, \
+    field_classes, to_integer
+
+tags = ('SECTION', 'CELL', 'REPEAT', 'SREGION')
+tag_codes = dict((tag, code) for code, tag in enumerate(tags))
+container_tags = ('SECTION', 'CELL', 'REPEAT')
+
+tag_pattern = re.compile(r'^[ \t]*(END)?(SECTION|CELL|REPEAT|SREGION)(?=\s|$)', re.M)
+
+index_suffix = '.idx'
+index_magic = 'ICOOLIDX'
+index_version = 3
+index_header = struct.Struct('<8sIIqq')
+
+# Each entry is stored as four integers: tag code, start offset, end offset and parent entry.
+entry_size = 4
+entry_type = 'l'
+
+
+def get_modeled_length(cls):
+    """Returns the number of tokens of a modeled command parameter, e.g. a Material."""
+    table = get_model_table(cls)
+    return table.num_parms + (1 if table.endtag else 0)
+
+
+def get_sregion_length(words):
+    """
+    Returns the number of tokens of the SREGION whose tag is words[0]: the tag, its parameters and its
+    SubRegions with their fields and materials, as they are read by icool_parser.  Returns None if
+    words ends first or a field is unknown.
+    """
+    load_registries()
+    layout = get_region_layout(ipycool.SRegion)
+    names = [slot[0] if slot else None for slot in layout]
+    position = 1 + len(layout)
+    if position > len(words):
+        return None
+    try:
+        count = to_integer(words[1 + names.index('nrreg')])
+    except ValueError:
+        return None
+    for i in xrange(count):
+        for slot in get_region_layout(ipycool.SubRegion):
+            if slot is not None and slot[1] == 'Field':
+                if position >= len(words) or words[position] not in field_classes:
+                    return None
+                position += 1 + get_modeled_length(field_classes[words[position]])
+            elif slot is not None and slot[1] in ipycool.object_types:
+                position += get_modeled_length(getattr(ipycool, slot[1]))
+            else:
+                position += 1
+    return position if position <= len(words) else None
+
+
+class For001Index(object):
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = ''
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size:
+                self.map = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+            if entries is None:
+                entries = self.scan()
+        except BaseException:
+            self.close()
+            raise
+        self.entries = entries
+
+    @classmethod
+    def open(cls, path, save=True):
+        """
+        Returns the index of the deck at path, loading it from path + '.idx' if it is up to date, and
+        otherwise building it (and saving it, if save is True).
+        """
+        entries = load_entries(path)
+        index = cls(path, entries)
+        if entries is None and save:
+            index.save()
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return len(self.entries) // entry_size
+
+    def scan(self):
+        """Builds the entries by scanning the mapped deck for region tags."""
+        entries = array(entry_type)
+        stack = []
+        size = len(self.map)
+        previous_sregion = None
+        # The first line is the title, which may itself start with a tag name.
+        body = self.map.find('\n') + 1
+        for match in tag_pattern.finditer(self.map, body if body else size):
+            start = match.start()
+            tag = match.group(2)
+            if previous_sregion is not None:
+                base = previous_sregion * entry_size
+                entries[base + 2] = self.get_sregion_end(entries[base + 1], start)
+                previous_sregion = None
+            if match.group(1):
+                if not stack or tags[entries[stack[-1] * entry_size]] != tag:
+                    raise ValueError('Unmatched END%s at offset %d of %s' % (tag, start, self.path))
+                end = self.map.find('\n', match.end())
+                entries[stack.pop() * entry_size + 2] = size if end < 0 else end + 1
+                continue
+            entry = len(entries) // entry_size
+            entries.extend((tag_codes[tag], start, size, stack[-1] if stack else -1))
+            if tag in container_tags:
+                stack.append(entry)
+            else:
+                previous_sregion = entry
+        if previous_sregion is not None:
+            base = previous_sregion * entry_size
+            entries[base + 2] = self.get_sregion_end(entries[base + 1], size)
+        return entries
+
+    def get_sregion_end(self, start, end):
+        """
+        Returns the offset just after the last line of the SREGION at start, and of any blank lines
+        following it, whose text ends at the latest at end.  Returns end if the whole of the text
+        belongs to the SREGION or it cannot be read.
+        """
+        text = self.map[start:end]
+        words = text.split()
+        length = get_sregion_length(words)
+        if not length or length == len(words):
+            return end
+        # Other commands follow the SREGION: find the line of its last token.
+        offset = start
+        count = 0
+        for line in text.splitlines(True):
+            if count >= length and not line.isspace():
+                break
+            offset += len(line)
+            count += len(line.split())
+        return offset
+
+    def save(self, path=None):
+        """Writes the index to path, by default next to the deck."""
+        if path is None:
+            path = self.path + index_suffix
+        stat = os.stat(self.path)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(index_header.pack(index_magic, index_version, self.entries.itemsize,
+                                         stat.st_size, int(stat.st_mtime * 1e6)))
+            self.entries.tofile(file)
+        os.rename(temp_path, path)
+
+    def get_tag(self, entry):
+        return tags[self.entries[entry * entry_size]]
+
+    def get_span(self, entry):
+        """Returns the start and end offsets of an entry."""
+        base = entry * entry_size
+        return self.entries[base + 1], self.entries[base + 2]
+
+    def get_parent(self, entry):
+        """Returns the entry enclosing entry, or None for a top level entry."""
+        parent = self.entries[entry * entry_size + 3]
+        return None if parent < 0 else parent
+
+    def find(self, tag):
+        """Returns the entries of all commands with tag, in the order they appear in the deck."""
+        code = tag_codes[tag]
+        entries = self.entries
+        return [entry for entry in xrange(len(self)) if entries[entry * entry_size] == code]
+
+    def children(self, entry):
+        """Returns the indexed entries enclosed directly by entry."""
+        entries = self.entries
+        return [child for child in xrange(entry + 1, len(self))
+                if entries[child * entry_size + 3] == entry]
+
+    def text(self, entry):
+        start, end = self.get_span(entry)
+        return self.map[start:end]
+
+    def load(self, entry, intern=False):
+        """Reads the command of entry, and everything it encloses, into ipycool objects."""
+        return For001Parser(self.text(entry).splitlines(), intern).parse_command()
+
+    def load_range(self, entries, intern=False):
+        """Reads the commands of a list of entries, sharing identical commands if intern is True."""
+        if not entries:
+            return []
+        parser = None
+        commands = []
+        for entry in entries:
+            lines = self.text(entry).splitlines()
+            if parser is None:
+                parser = For001Parser(lines, intern)
+            else:
+                parser.reset(lines)
+            commands.append(parser.parse_command())
+        return commands
+
+
+def load_entries(path):
+    """Returns the saved entries for the deck at path, or None if there are none or they are stale."""
+    index_path = path + index_suffix
+    try:
+        stat = os.stat(path)
+        file = open(index_path, 'rb')
+    except (IOError, OSError):
+        return None
+    with file:
+        header = file.read(index_header.size)
+        if len(header) != index_header.size:
+            return None
+        magic, version, itemsize, size, mtime = index_header.unpack(header)
+        entries = array(entry_type)
+        if (magic != index_magic or version != index_version or itemsize != entries.itemsize or
+                size != stat.st_size or mtime != int(stat.st_mtime * 1e6)):
+            return None
+        data = file.read()
+    if len(data) % (entry_size * entries.itemsize):
+        return None
+    entries.fromstring(data)
+    return entries
@@ -0,0 +1,67 @@
+"""
+Interning of modeled command parameters.
+
+Lattices typically reuse a handful of Field and Material settings across thousands of SubRegions.
+InternPool maps the content_key of a command (class, model and parameter values in position
+order) to one canonical instance, so that identical fields and materials are held, and rendered,
+only once.  Interned commands are shared: changing a parameter of one changes it everywhere it is
+used.
+"""
+
+
+class InternPool(object):
+
+    def __init__(self):
+        self.commands = {}
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __contains__(self, command):
+        return command.content_key() in self.commands
+
+    def clear(self):
+        self.commands.clear()
+
+    def intern(self, command):
+        """
+        Returns the canonical command with the same content as command, adding command to the pool if
+        there is none.  A pooled command which has since been modified is replaced.
+        """
+        key = command.content_key()
+        pooled = self.commands.get(key)
+        if pooled is not None and pooled is not command and pooled.content_key() == key:
+            return pooled
+        self.commands[key] = command
+        return command
+
+    def intern_tree(self, root):
+        """
+        Replaces every internable command held as a parameter by root, or by any command root encloses,
+        with its canonical instance.  Returns the number of commands replaced.
+        """
+        replaced = 0
+        pending = [root]
+        seen = set()
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            state = obj.__getstate__()
+            for name in state:
+                value = state[name]
+                if isinstance(value, list):
+                    pending.extend(command for command in value if hasattr(command, '__getstate__'))
+                elif hasattr(value, 'content_key'):
+                    canonical = self.intern(value)
+                    if canonical is not value:
+                        obj.assign(name, canonical)
+                        value.remove_owner(obj)
+                        replaced += 1
+                elif hasattr(value, '__getstate__'):
+                    pending.append(value)
+        return replaced
+
+
+intern_pool = InternPool()
@@ -0,0 +1,239 @@
+"""
+Background ICOOL runs.
+
+JobRunner runs ICOOL without blocking the caller, for use from a notebook kernel.  submit() queues a
+deck directory and returns a Job at once; a background thread starts queued jobs, at most processes
+at a time, and follows them to completion.  A Job can be waited on, cancelled, and given callbacks
+which are called with each new line of its output and when it finishes.  Runs are started and
+measured as by icool_runner.Runner, and their output is still written to icool.log and icool.err.
+
+    runner = JobRunner(processes=4)
+    job = runner.submit('runs/point_0', on_line=lambda job, stream, line: ...)
+    ...
+    result = job.wait()
+
+Callbacks are called on the background thread.  The %icool_submit, %icool_status and %icool_cancel
+magics (see icool_magics) share one JobRunner.
+"""
+import io
+import os
+import time
+import threading
+import traceback
+from icool_runner import Runner, RunResult, log_name, err_name, poll_interval
+
+queued = 'queued'
+running = 'running'
+done = 'done'
+cancelled = 'cancelled'
+
+
+def call(callback, *args):
+    """Calls a job callback.  An error in a callback is printed rather than stopping the runner."""
+    try:
+        callback(*args)
+    except Exception:
+        traceback.print_exc()
+
+
+class LogFollower(object):
+
+    """
+    Reads the lines added to a log file since the last call.  The file is read through io rather than
+    a built-in file, whose end of file is sticky with some C libraries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.partial = ''
+
+    def read_lines(self, final=False):
+        if self.file is None:
+            try:
+                self.file = io.open(self.path, 'rb')
+            except IOError:
+                return []
+        text = self.partial + self.file.read()
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        if final:
+            if self.partial:
+                lines.append(self.partial)
+            self.partial = ''
+            self.file.close()
+            self.file = None
+        return lines
+
+
+class Job(object):
+
+    def __init__(self, number, directory, on_line=None):
+        self.number = number
+        self.directory = directory
+        self.state = queued
+        self.result = None
+        self.run = None
+        self.submitted = time.time()
+        self.last_line = ''
+        self.line_callbacks = [on_line] if on_line is not None else []
+        self.done_callbacks = []
+        self.cancel_requested = False
+        self.condition = threading.Condition()
+
+    def __repr__(self):
+        return '<Job %d %s %s>' % (self.number, self.directory, self.state)
+
+    def done(self):
+        return self.state in (done, cancelled)
+
+    def wait(self, timeout=None):
+        """Waits for the job to finish, for at most timeout seconds, and returns its RunResult."""
+        with self.condition:
+            if timeout is None:
+                while not self.done():
+                    self.condition.wait(1.0)
+            elif not self.done():
+                self.condition.wait(timeout)
+        return self.result
+
+    def cancel(self):
+        """
+        Cancels the job: a queued job is not started and a running one is killed.  Returns False if
+        the job had already finished.
+        """
+        with self.condition:
+            if self.done():
+                return False
+            self.cancel_requested = True
+        return True
+
+    def add_line_callback(self, callback):
+        """callback(job, stream, line) is called with each line of output; stream is 'out' or 'err'."""
+        self.line_callbacks.append(callback)
+
+    def add_done_callback(self, callback):
+        """callback(job) is called when the job finishes or is cancelled, or now if it already has."""
+        with self.condition:
+            if not self.done():
+                self.done_callbacks.append(callback)
+                return
+        call(callback, self)
+
+    def elapsed(self):
+        if self.result is not None:
+            return self.result.wall_time
+        if self.run is not None:
+            return time.time() - self.run.start
+        return 0.0
+
+    def set_finished(self, state, result):
+        with self.condition:
+            self.state = state
+            self.result = result
+            self.run = None
+            self.condition.notify_all()
+        for callback in self.done_callbacks:
+            call(callback, self)
+
+
+class JobRunner(Runner):
+
+    def __init__(self, executable=None, args=(), processes=None, timeout=None, cache=None):
+        Runner.__init__(self, executable, args, processes, timeout, cache)
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.stopping = False
+
+    def submit(self, directory, on_line=None):
+        """Queues a run of ICOOL in directory and returns its Job."""
+        with self.lock:
+            job = Job(len(self.jobs), directory, on_line)
+            self.jobs.append(job)
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping = False
+                self.thread = threading.Thread(target=self.manage, name='icool-jobs')
+                self.thread.daemon = True
+                self.thread.start()
+        self.wakeup.set()
+        return job
+
+    def submit_all(self, directories, on_line=None):
+        return [self.submit(directory, on_line) for directory in directories]
+
+    def get_jobs(self, state=None):
+        with self.lock:
+            return [job for job in self.jobs if state is None or job.state == state]
+
+    def shutdown(self, cancel=True, wait=True):
+        """Stops the background thread, cancelling outstanding jobs unless cancel is False."""
+        if cancel:
+            for job in self.get_jobs():
+                job.cancel()
+        with self.lock:
+            self.stopping = True
+        self.wakeup.set()
+        if wait and self.thread is not None:
+            self.thread.join()
+
+    def manage(self):
+        """Body of the background thread."""
+        active = []
+        while True:
+            self.wakeup.clear()
+            with self.lock:
+                queue = [job for job in self.jobs if job.state == queued]
+                stopping = self.stopping
+            for job in queue:
+                if job.cancel_requested:
+                    job.set_finished(cancelled, None)
+            queue = [job for job in queue if not job.done()]
+            if stopping and not active and not queue:
+                return
+            while queue and len(active) < self.processes:
+                job = queue.pop(0)
+                try:
+                    self.start_job(job, active)
+                except Exception:
+                    # A job which cannot be started fails alone; the thread goes on with the others.
+                    traceback.print_exc()
+                    job.set_finished(done, RunResult(job.directory, None, 0.0, 0, False, False))
+            for job, followers in list(active):
+                self.follow(job, followers)
+                if job.cancel_requested:
+                    result = self.kill(job.run)
+                else:
+                    result = self.poll(job.run)
+                if result is not None:
+                    self.follow(job, followers, final=True)
+                    active.remove((job, followers))
+                    job.set_finished(cancelled if job.cancel_requested else done, result)
+            if active:
+                self.wakeup.wait(poll_interval)
+            elif not queue:
+                self.wakeup.wait()
+
+    def start_job(self, job, active):
+        run = self.start(job.directory)
+        followers = (('out', LogFollower(os.path.join(job.directory, log_name))),
+                     ('err', LogFollower(os.path.join(job.directory, err_name))))
+        if isinstance(run, RunResult):
+            if run.cached:
+                # Pass on the output restored from the cache.
+                self.follow(job, followers, final=True)
+            job.set_finished(done, run)
+            return
+        with job.condition:
+            job.run = run
+            job.state = running
+        active.append((job, followers))
+
+    def follow(self, job, followers, final=False):
+        for stream, follower in followers:
+            for line in follower.read_lines(final):
+                if stream == 'out':
+                    job.last_line = line
+                for callback in job.line_callbacks:
+                    call(callback, job, stream, line)
@@ -0,0 +1,314 @@
+"""
+Resumable sweeps.
+
+A JobTable records the runs of a sweep in a SQLite database: for each job its directory, the
+parameters of its point, the hash of its deck, its state, and once it has run, its RunResult and the
+files it wrote.  Progress is kept in the database rather than in the process running the sweep, so
+an interrupted sweep is resumed by starting a worker on the same table, which runs only the jobs not
+yet finished.
+
+Jobs are claimed in a transaction, so that several workers, in several processes or on several
+machines sharing the filesystem, can take jobs from one table without running any job twice.  A
+worker marks its running jobs every heartbeat_interval seconds; a job whose worker has died, or
+which has not been marked for stale_after seconds, is returned to pending by recover(), which each
+worker calls every recover_interval seconds and before it stops for want of pending jobs.  (SQLite
+relies on file locks, which some network filesystems do not provide; keep the table on one which
+does.)  Directories are stored relative to the table, so that machines may mount it at different
+paths.
+
+    sweep = Sweep(template, 'runs', grid=[('Sol.bs', [1.0, 2.0, 3.0])])
+    sweep.run()
+    table = JobTable('runs/jobs.db')
+    table.add_sweep(sweep)
+    table.work(Runner(processes=4))
+
+or, on each machine,
+
+    python icool_jobtable.py runs/jobs.db -j 4
+"""
+import os
+import sys
+import errno
+import json
+import time
+import socket
+import sqlite3
+import argparse
+from icool_runner import Runner, RunResult, poll_interval
+from icool_cache import hash_deck
+
+pending = 'pending'
+running = 'running'
+done = 'done'
+failed = 'failed'
+
+heartbeat_interval = 10.0
+stale_after = 300.0
+recover_interval = 60.0
+# Longest wait between attempts to claim pending jobs held back by other workers.
+max_idle = 1.0
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    directory TEXT UNIQUE NOT NULL,
+    parameters TEXT NOT NULL,
+    deck_hash TEXT,
+    state TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed REAL,
+    heartbeat REAL,
+    finished REAL,
+    status INTEGER,
+    wall_time REAL,
+    max_rss INTEGER,
+    timed_out INTEGER,
+    cached INTEGER,
+    outputs TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+def get_worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def is_alive(worker):
+    """Returns False if worker is a process on this machine which no longer exists, else True."""
+    host, pid = worker.rsplit(':', 1)
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class JobTable(object):
+
+    def __init__(self, path, timeout=60.0):
+        """Opens, creating if need be, the table at path.  timeout is the time to wait for a lock."""
+        self.path = os.path.abspath(path)
+        self.base = os.path.dirname(self.path)
+        self.connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def transaction(self):
+        """Returns a cursor in a transaction which holds the write lock; end it with commit."""
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        return cursor
+
+    def get_path(self, directory):
+        return os.path.normpath(os.path.join(self.base, directory))
+
+    def add(self, directories, parameters=None):
+        """
+        Adds a job for each directory, with the parameters of the same index.  A directory already in
+        the table keeps its job, unless its deck has changed, in which case the job is run again.
+        Returns the number of jobs added or reset.
+        """
+        parameters = parameters or [{}] * len(directories)
+        changed = 0
+        cursor = self.transaction()
+        try:
+            for directory, point in zip(directories, parameters):
+                path = os.path.relpath(os.path.abspath(directory), self.base)
+                deck = os.path.join(directory, 'for001.dat')
+                deck_hash = hash_deck(deck) if os.path.isfile(deck) else None
+                text = json.dumps(point, sort_keys=True)
+                row = cursor.execute('SELECT deck_hash, parameters FROM jobs WHERE directory = ?',
+                                     (path,)).fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO jobs (directory, parameters, deck_hash, state) '
+                                   'VALUES (?, ?, ?, ?)', (path, text, deck_hash, pending))
+                    changed += 1
+                elif row['deck_hash'] != deck_hash or row['parameters'] != text:
+                    cursor.execute('UPDATE jobs SET parameters = ?, deck_hash = ?, state = ?, '
+                                   'worker = NULL, status = NULL, outputs = NULL WHERE directory = ?',
+                                   (text, deck_hash, pending, path))
+                    changed += 1
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        return changed
+
+    def add_sweep(self, sweep):
+        """Adds a job for every point of an icool_sweep.Sweep whose decks have been written."""
+        return self.add([sweep.get_directory(number) for number in range(len(sweep))], sweep.points)
+
+    def claim(self, worker, count=1):
+        """Marks at most count pending jobs as run by worker and returns their (id, directory)."""
+        now = time.time()
+        cursor = self.transaction()
+        try:
+            rows = cursor.execute('SELECT id, directory FROM jobs WHERE state = ? ORDER BY id LIMIT ?',
+                                  (pending, count)).fetchall()
+            cursor.executemany('UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, '
+                               'claimed = ?, heartbeat = ? WHERE id = ?',
+                               [(running, worker, now, now, row['id']) for row in rows])
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        return [(row['id'], self.get_path(row['directory'])) for row in rows]
+
+    def heartbeat(self, worker):
+        self.connection.execute('UPDATE jobs SET heartbeat = ? WHERE state = ? AND worker = ?',
+                                (time.time(), running, worker))
+
+    def finish(self, job_id, worker, result, outputs=()):
+        """
+        Records the RunResult of a job run by worker and the files, relative to its directory, which it
+        wrote.  If the job is no longer running for worker, as when it was recovered and claimed by
+        another, nothing is recorded: prints a message and returns False.
+        """
+        state = done if result.status == 0 and not result.timed_out else failed
+        count = self.connection.execute(
+            'UPDATE jobs SET state = ?, finished = ?, status = ?, wall_time = ?, max_rss = ?, '
+            'timed_out = ?, cached = ?, outputs = ? WHERE id = ? AND state = ? AND worker = ?',
+            (state, time.time(), result.status, result.wall_time, result.max_rss, result.timed_out,
+             result.cached, json.dumps(list(outputs)), job_id, running, worker)).rowcount
+        if count == 0:
+            print 'Job %d is no longer run by %s; its result was not recorded' % (job_id, worker)
+            return False
+        return True
+
+    def release(self, job_ids):
+        """Returns jobs to pending, as when their worker is stopped."""
+        self.connection.executemany('UPDATE jobs SET state = ?, worker = NULL WHERE id = ?',
+                                    [(pending, job_id) for job_id in job_ids])
+
+    def recover(self, stale_after=stale_after):
+        """
+        Returns to pending the running jobs whose worker has died or has not marked them for
+        stale_after seconds.  Returns the number of jobs recovered.
+        """
+        limit = time.time() - stale_after
+        cursor = self.transaction()
+        try:
+            rows = cursor.execute('SELECT id, worker, heartbeat FROM jobs WHERE state = ?',
+                                  (running,)).fetchall()
+            lost = [row['id'] for row in rows if row['heartbeat'] < limit or not is_alive(row['worker'])]
+            cursor.executemany('UPDATE jobs SET state = ?, worker = NULL WHERE id = ?',
+                               [(pending, job_id) for job_id in lost])
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        return len(lost)
+
+    def retry_failed(self):
+        """Returns the failed jobs to pending.  Returns their number."""
+        return self.connection.execute('UPDATE jobs SET state = ?, worker = NULL WHERE state = ?',
+                                       (pending, failed)).rowcount
+
+    def get_counts(self):
+        """Returns a dictionary of state to number of jobs."""
+        return dict((row['state'], row['count']) for row in self.connection.execute(
+            'SELECT state, COUNT(*) AS count FROM jobs GROUP BY state'))
+
+    def get_jobs(self, state=None):
+        """Returns the jobs, as dictionaries of column to value, in the order they were added."""
+        if state is None:
+            rows = self.connection.execute('SELECT * FROM jobs ORDER BY id')
+        else:
+            rows = self.connection.execute('SELECT * FROM jobs WHERE state = ? ORDER BY id', (state,))
+        jobs = []
+        for row in rows:
+            job = dict(zip(row.keys(), row))
+            job['directory'] = self.get_path(job['directory'])
+            job['parameters'] = json.loads(job['parameters'])
+            job['outputs'] = json.loads(job['outputs']) if job['outputs'] else None
+            jobs.append(job)
+        return jobs
+
+    def work(self, runner, worker=None, limit=None):
+        """
+        Runs pending jobs with runner, an icool_runner.Runner, at most runner.processes at a time,
+        until none are left or limit jobs have been started.  Jobs lost by other workers are recovered
+        every recover_interval seconds meanwhile.  Returns the number of jobs run.
+        """
+        worker = worker or get_worker_name()
+        self.recover()
+        active = []
+        started = 0
+        last_heartbeat = last_recover = time.time()
+        idle = poll_interval
+        try:
+            while True:
+                if time.time() - last_recover > recover_interval:
+                    self.recover()
+                    last_recover = time.time()
+                free = runner.processes - len(active)
+                if limit is not None:
+                    free = min(free, limit - started)
+                claimed = self.claim(worker, free) if free > 0 else []
+                for job_id, directory in claimed:
+                    started += 1
+                    run = runner.start(directory)
+                    if isinstance(run, RunResult):
+                        self.finish(job_id, worker, run)
+                    else:
+                        active.append((job_id, run))
+                if not active:
+                    if free <= 0:
+                        break
+                    if not self.get_counts().get(pending):
+                        # Jobs lost since the last recovery would otherwise be left to the next worker.
+                        if not self.recover():
+                            break
+                        last_recover = time.time()
+                        continue
+                    if not claimed:
+                        # Pending jobs were taken by other workers first: back off before trying again.
+                        time.sleep(idle)
+                        idle = min(2 * idle, max_idle)
+                    continue
+                idle = poll_interval
+                finished = False
+                for job_id, run in list(active):
+                    result = runner.poll(run)
+                    if result is not None:
+                        active.remove((job_id, run))
+                        self.finish(job_id, worker, result, runner.get_outputs(run))
+                        finished = True
+                if time.time() - last_heartbeat > heartbeat_interval:
+                    self.heartbeat(worker)
+                    last_heartbeat = time.time()
+                if not finished:
+                    time.sleep(poll_interval)
+        finally:
+            for job_id, run in active:
+                runner.kill(run)
+            self.release([job_id for job_id, run in active])
+        return started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the pending jobs of a sweep job table.')
+    parser.add_argument('table', help='Path of the job table.')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='Largest number of runs at a time (default: one per CPU).')
+    parser.add_argument('-e', '--executable', default=None,
+                        help='ICOOL executable (default: $ICOOL or icool).')
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help='Seconds after which a run is killed.')
+    args = parser.parse_args(argv)
+    table = JobTable(args.table)
+    runner = Runner(args.executable, processes=args.processes, timeout=args.timeout)
+    count = table.work(runner)
+    counts = sorted(table.get_counts().items())
+    print 'Ran %d jobs: %s' % (count, ', '.join('%d %s' % (number, state) for state, number in counts))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+"""
+IPython magics for ipycool.
+
+Registered when ipycool is imported into a running IPython session, or with
+
+    %load_ext ipycool
+
+This module imports IPython and is never imported by ipycool itself outside of IPython.
+"""
+import glob
+from IPython.core.magic_arguments import argument, magic_arguments, parse_argstring
+from icool_runner import Runner
+from icool_jobs import JobRunner
+from icool_cache import ResultCache
+
+# Runner of the jobs started by %icool_submit, created by the first of them.
+job_runner = None
+
+
+def expand_directories(patterns):
+    directories = []
+    for pattern in patterns or ['.']:
+        directories.extend(sorted(glob.glob(pattern)) or [pattern])
+    return directories
+
+
+def format_result(result):
+    return 'status %-5s %8.1f s %8d KB%s%s' % (result.status, result.wall_time, result.max_rss,
+                                                ' (timed out)' if result.timed_out else '',
+                                                ' (cached)' if result.cached else '')
+
+
+def get_cache(path):
+    return ResultCache(path) if path else None
+
+
+@magic_arguments()
+@argument('-j', '--processes', type=int, default=None,
+          help='Largest number of runs at a time (default: one per CPU).')
+@argument('-e', '--executable', default=None, help='ICOOL executable (default: $ICOOL or icool).')
+@argument('-t', '--timeout', type=float, default=None, help='Seconds after which a run is killed.')
+@argument('-c', '--cache', default=None, help='Directory of a result cache to use.')
+@argument('directories', nargs='*', help='Deck directories or patterns (default: the current directory).')
+def icool(line):
+    """Runs ICOOL in each of a set of deck directories: %icool [-j N] [directory ...]"""
+    args = parse_argstring(icool, line)
+    runner = Runner(args.executable, processes=args.processes, timeout=args.timeout,
+                    cache=get_cache(args.cache))
+    results = []
+    for result in runner.iter_run(expand_directories(args.directories)):
+        print '%-40s %s' % (result.directory, format_result(result))
+        results.append(result)
+    return results
+
+
+@magic_arguments()
+@argument('-j', '--processes', type=int, default=None,
+          help='Largest number of runs at a time (default: one per CPU).')
+@argument('-e', '--executable', default=None, help='ICOOL executable (default: $ICOOL or icool).')
+@argument('-t', '--timeout', type=float, default=None, help='Seconds after which a run is killed.')
+@argument('-c', '--cache', default=None, help='Directory of a result cache to use.')
+@argument('directories', nargs='*', help='Deck directories or patterns (default: the current directory).')
+def icool_submit(line):
+    """
+    Runs ICOOL in the background in each of a set of deck directories and returns at once:
+    %icool_submit [-j N] [directory ...].  Follow the runs with %icool_status.
+    """
+    global job_runner
+    args = parse_argstring(icool_submit, line)
+    if job_runner is None:
+        job_runner = JobRunner(args.executable, processes=args.processes, timeout=args.timeout,
+                               cache=get_cache(args.cache))
+    else:
+        if args.executable is not None:
+            job_runner.executable = args.executable
+        if args.processes is not None:
+            job_runner.processes = args.processes
+        if args.timeout is not None:
+            job_runner.timeout = args.timeout
+        if args.cache is not None:
+            job_runner.cache = get_cache(args.cache)
+    jobs = job_runner.submit_all(expand_directories(args.directories))
+    print 'Submitted jobs %d-%d' % (jobs[0].number, jobs[-1].number)
+    return jobs
+
+
+@magic_arguments()
+@argument('-a', '--all', action='store_true', help='Also list finished jobs.')
+def icool_status(line):
+    """Lists the jobs started by %icool_submit: %icool_status [-a]"""
+    args = parse_argstring(icool_status, line)
+    if job_runner is None:
+        print 'No jobs submitted'
+        return
+    jobs = job_runner.get_jobs()
+    counts = {}
+    for job in jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    print ', '.join('%d %s' % (counts[state], state) for state in sorted(counts))
+    for job in jobs:
+        if args.all or not job.done():
+            if job.result is not None:
+                detail = format_result(job.result)
+            else:
+                detail = '%8.1f s  %s' % (job.elapsed(), job.last_line[:60])
+            print '%4d %-40s %-9s %s' % (job.number, job.directory, job.state, detail)
+
+
+@magic_arguments()
+@argument('jobs', nargs='*', help='Numbers of the jobs to cancel, or all.')
+def icool_cancel(line):
+    """Cancels jobs started by %icool_submit: %icool_cancel [all | number ...]"""
+    args = parse_argstring(icool_cancel, line)
+    if job_runner is None:
+        return
+    jobs = job_runner.get_jobs()
+    if args.jobs != ['all']:
+        numbers = set(int(number) for number in args.jobs)
+        jobs = [job for job in jobs if job.number in numbers]
+    cancelled = [job.number for job in jobs if job.cancel()]
+    print 'Cancelled %d jobs' % len(cancelled)
+
+
+def load_ipython_extension(ipython):
+    ipython.register_magic_function(icool, 'line', 'icool')
+    ipython.register_magic_function(icool_submit, 'line', 'icool_submit')
+    ipython.register_magic_function(icool_status, 'line', 'icool_status')
+    ipython.register_magic_function(icool_cancel, 'line', 'icool_cancel')
@@ -0,0 +1,113 @@
+"""
+Model registries.
+
+A ModelRegistry holds, in ready-to-use form, what is otherwise looked up in the models dictionary
+of a class (Sol, Accel, Material, Distribution, Correlation, Refp, ...) on every call: the model
+descriptor, the model names, the parms of each model, the ICOOL name of each model, the parameter
+names of each model in position order, and the reverse index from ICOOL model code to model name
+used when reading decks.
+
+Registries are lazy.  When a class with a models table is created, icool_slots.CommandMeta gives
+it a LazyRegistry, which builds the ModelRegistry the first time the class uses it and then
+replaces itself on the class with the registry.  Importing ipycool builds none of them.
+"""
+
+
+def code_key(code):
+    """Returns a comparable form of an ICOOL model code, so that e.g. 8, '8' and '8.' match."""
+    text = str(code)
+    try:
+        if text.lstrip('+-').isdigit():
+            return int(text)
+        return float(text.replace('d', 'e').replace('D', 'E'))
+    except ValueError:
+        return text.upper()
+
+
+class ModelRegistry(object):
+
+    """
+    Read-only view of a models table.  The parms dictionaries are shared with the table and must
+    not be modified.
+    """
+
+    __slots__ = ('descriptor', 'descriptor_name', 'num_parms', 'line_splits', 'names', 'parms',
+                 'icool_names', 'orderings', 'codes', 'code_positions', 'untagged')
+
+    def __init__(self, models):
+        set_slot = object.__setattr__
+        descriptor = models['model_descriptor']
+        descriptor_name = descriptor['name']
+        names = tuple(name for name in models if name != 'model_descriptor')
+        parms = {}
+        icool_names = {}
+        orderings = {}
+        codes = {}
+        untagged = []
+        for name in names:
+            model_parms = models[name]['parms']
+            parms[name] = model_parms
+            icool_names[name] = models[name].get('icool_model_name', name)
+            orderings[name] = tuple(sorted(model_parms, key=lambda parm: model_parms[parm]['pos']))
+            if descriptor_name in model_parms:
+                pos = int(model_parms[descriptor_name]['pos']) - 1
+                codes[(pos, code_key(icool_names[name]))] = name
+            else:
+                untagged.append(name)
+        set_slot(self, 'descriptor', descriptor)
+        set_slot(self, 'descriptor_name', descriptor_name)
+        set_slot(self, 'num_parms', descriptor.get('num_parms'))
+        set_slot(self, 'line_splits', tuple(descriptor.get('for001_format', {}).get('line_splits', ())))
+        set_slot(self, 'names', names)
+        set_slot(self, 'parms', parms)
+        set_slot(self, 'icool_names', icool_names)
+        set_slot(self, 'orderings', orderings)
+        set_slot(self, 'codes', codes)
+        set_slot(self, 'code_positions', tuple(sorted(set(pos for pos, code in codes))))
+        set_slot(self, 'untagged', tuple(untagged))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelRegistry is read only')
+
+    def __contains__(self, model):
+        return str(model) in self.parms
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def find_model(self, fields):
+        """
+        Returns the name of the model whose ICOOL code appears at the position of the model
+        descriptor in a list of positional for001 fields, or None.  A model without a descriptor
+        parameter (e.g. the VAC material) is returned if it is the only one and no code matches.
+        """
+        for pos in self.code_positions:
+            if pos < len(fields):
+                model = self.codes.get((pos, code_key(fields[pos])))
+                if model is not None:
+                    return model
+        if len(self.untagged) == 1:
+            return self.untagged[0]
+        return None
+
+
+class LazyRegistry(object):
+
+    """
+    Class attribute which builds the ModelRegistry of a models table on first access and then
+    replaces itself on the class with the registry.
+    """
+
+    def __init__(self, models):
+        self.models = models
+
+    def __get__(self, obj, cls):
+        registry = ModelRegistry(self.models)
+        for owner in cls.__mro__:
+            if owner.__dict__.get('_registry') is self:
+                setattr(owner, '_registry', registry)
+                break
+        return registry
@@ -0,0 +1,260 @@
+"""
+Local ICOOL runs.
+
+Runner runs an ICOOL executable in each of a set of deck directories, at most processes at a time.
+The standard output and standard error of each run are written straight to icool.log and icool.err
+in its directory.  Each finished run gives a RunResult holding its exit status, its wall time and
+the peak resident memory of the process, and the results can be written as a table (CSV).
+
+Given an icool_cache.ResultCache, a Runner first looks each deck up in the cache, and copies the
+outputs of an identical earlier run into the directory instead of running ICOOL.  The outputs of each
+successful run, the files written in its directory while it ran, are added to the cache.
+
+Peak memory is read from /proc while a run is in progress.  The kernel's own figure, returned when
+the process is reaped, also counts the memory of the Python process it was forked from, and is only
+used for runs which finish before they can be sampled.
+
+The executable is 'icool' on the PATH unless given, or set by the ICOOL environment variable; any
+program which reads for001.dat in its working directory can stand in for it.
+
+    runner = Runner(processes=4)
+    results = runner.run(['runs/point_0', 'runs/point_1'])
+    runner.write_results('runs/results.csv', results)
+"""
+import os
+import csv
+import time
+import signal
+import subprocess
+import multiprocessing
+from collections import namedtuple
+
+default_executable = 'icool'
+deck_name = 'for001.dat'
+log_name = 'icool.log'
+err_name = 'icool.err'
+
+# Seconds to wait between checks on running processes when none has finished.
+poll_interval = 0.02
+
+# Result of one run.  status is the exit status, or minus the number of the signal which ended the
+# process (as for subprocess), and None if the executable could not be started; max_rss is in KB.
+# cached is True for a run answered from the cache, whose status and max_rss are those of the run
+# which was cached.
+RunResult = namedtuple('RunResult', ['directory', 'status', 'wall_time', 'max_rss', 'timed_out',
+                                     'cached'])
+
+result_fields = RunResult._fields
+
+
+def exit_status(status):
+    """Converts a status returned by os.wait4 to a subprocess style return code."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def read_peak_rss(pid):
+    """Returns the peak resident memory in KB of process pid since it started its program, or 0."""
+    try:
+        with open('/proc/%d/status' % pid) as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return 0
+
+
+def get_unique_directories(directories):
+    """
+    Returns directories without the repeats of any directory, by real path, in the order given.
+    Prints a warning if there are any.
+    """
+    unique = []
+    seen = set()
+    for directory in directories:
+        path = os.path.realpath(directory)
+        if path not in seen:
+            seen.add(path)
+            unique.append(directory)
+    if len(unique) < len(directories):
+        print 'Warning: %d repeated directories are run once' % (len(directories) - len(unique))
+    return unique
+
+
+class Run(object):
+
+    """A running process, with the files it writes to."""
+
+    def __init__(self, directory, process, files, start, key=None):
+        self.directory = directory
+        self.process = process
+        self.files = files
+        self.start = start
+        self.key = key
+        self.timed_out = False
+        self.max_rss = 0
+
+    def sample(self):
+        self.max_rss = max(self.max_rss, read_peak_rss(self.process.pid))
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+
+class Runner(object):
+
+    def __init__(self, executable=None, args=(), processes=None, timeout=None, cache=None):
+        """
+        executable is the ICOOL program to run and args any arguments to pass to it.  processes is the
+        largest number of runs at a time (by default one per CPU), and timeout, if given, the number of
+        seconds after which a run is killed.  cache, if given, is an icool_cache.ResultCache.
+        """
+        self.executable = executable or os.environ.get('ICOOL', default_executable)
+        self.args = list(args)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.timeout = timeout
+        self.cache = cache
+
+    def start(self, directory):
+        """
+        Starts the executable in directory.  Returns a Run, or a RunResult if the run was answered from
+        the cache or cannot start.
+        """
+        key = None
+        if self.cache is not None:
+            start = time.time()
+            key = self.cache.get_key(directory, self.executable, self.args)
+            stored = self.cache.restore(key, directory) if key is not None else None
+            if stored is not None:
+                return RunResult(directory, stored['status'], time.time() - start, stored['max_rss'],
+                                 False, True)
+        files = []
+        devnull = open(os.devnull, 'rb')
+        start = time.time()
+        try:
+            files.append(open(os.path.join(directory, log_name), 'wb'))
+            files.append(open(os.path.join(directory, err_name), 'wb'))
+            process = subprocess.Popen([self.executable] + self.args, cwd=directory, stdin=devnull,
+                                       stdout=files[0], stderr=files[1], close_fds=True)
+        except (IOError, OSError) as e:
+            message = 'Cannot run %s in %s: %s' % (self.executable, directory, e)
+            if len(files) == 2:
+                files[1].write(message + '\n')
+            else:
+                # The directory is missing or cannot be written.
+                print message
+            for file in files:
+                file.close()
+            return RunResult(directory, None, 0.0, 0, False, False)
+        finally:
+            devnull.close()
+        return Run(directory, process, files, start, key)
+
+    def finish(self, run, status, usage):
+        run.close()
+        # The process has been reaped by os.wait4; record it so that Popen does not wait for it again.
+        run.process.returncode = exit_status(status)
+        result = RunResult(run.directory, run.process.returncode, time.time() - run.start,
+                           run.max_rss or usage.ru_maxrss, run.timed_out, False)
+        if run.key is not None and result.status == 0 and not result.timed_out:
+            self.cache.store(run.key, run.directory, self.get_outputs(run),
+                             {'status': result.status, 'max_rss': result.max_rss})
+        return result
+
+    def get_outputs(self, run):
+        """Returns the paths, relative to its directory, of the files written by run."""
+        if self.cache is not None:
+            inputs = set(self.cache.get_input_files(run.directory))
+        else:
+            inputs = set([deck_name])
+        # Modification times may only be kept to the second.
+        start = int(run.start)
+        outputs = []
+        for parent, directories, names in os.walk(run.directory):
+            for name in names:
+                path = os.path.join(parent, name)
+                name = os.path.relpath(path, run.directory)
+                if name not in inputs and os.path.getmtime(path) >= start:
+                    outputs.append(name)
+        return sorted(outputs)
+
+    def poll(self, run):
+        """
+        Returns the RunResult of run if it has finished, and otherwise None.  A run which has passed
+        the timeout is killed.
+        """
+        run.sample()
+        pid, status, usage = os.wait4(run.process.pid, os.WNOHANG)
+        if pid:
+            return self.finish(run, status, usage)
+        if self.timeout is not None and time.time() - run.start > self.timeout:
+            run.timed_out = True
+            os.kill(run.process.pid, signal.SIGKILL)
+        return None
+
+    def kill(self, run):
+        """Kills run and returns its RunResult."""
+        os.kill(run.process.pid, signal.SIGKILL)
+        pid, status, usage = os.wait4(run.process.pid, 0)
+        return self.finish(run, status, usage)
+
+    def iter_run(self, directories):
+        """
+        Runs the executable in each directory, at most processes at a time, and yields a RunResult as
+        each run finishes.  A directory given more than once is run once, as two runs in one directory
+        would overwrite each other's output.
+        """
+        pending = list(reversed(get_unique_directories(directories)))
+        running = []
+        try:
+            while pending or running:
+                while pending and len(running) < self.processes:
+                    run = self.start(pending.pop())
+                    if isinstance(run, RunResult):
+                        yield run
+                    else:
+                        running.append(run)
+                finished = False
+                for run in list(running):
+                    result = self.poll(run)
+                    if result is not None:
+                        running.remove(run)
+                        finished = True
+                        yield result
+                if not finished:
+                    time.sleep(poll_interval)
+        finally:
+            for run in running:
+                self.kill(run)
+
+    def run(self, directories):
+        """
+        Runs the executable in each directory and returns the RunResults in directory order, one for
+        each directory given.  A directory given more than once is run once, and its result repeated.
+        """
+        results = dict((os.path.realpath(result.directory), result) for result in self.iter_run(directories))
+        return [results[os.path.realpath(directory)] for directory in directories]
+
+    def write_results(self, path, results):
+        """Writes results to path as a CSV table with a header row."""
+        with open(path, 'wb') as file:
+            writer = csv.writer(file)
+            writer.writerow(result_fields)
+            for result in results:
+                writer.writerow(result)
+
+
+def read_results(path):
+    """Reads a table written by Runner.write_results and returns its RunResults."""
+    results = []
+    with open(path, 'rb') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            directory, status, wall_time, max_rss, timed_out, cached = row
+            results.append(RunResult(directory, int(status) if status else None, float(wall_time),
+                                     int(max_rss), timed_out == 'True', cached == 'True'))
+    return results
@@ -0,0 +1,158 @@
+"""
+Compiled ICOOL command reference loaded from icool_commands.json.
+
+load_schema compiles the JSON description of the namelist variables and region commands into a
+read-only CommandRegistry, in which a command is looked up by name in a single dictionary access.
+The registry is kept in memory, and the compiled form is also saved next to the JSON file
+(icool_commands.json.cache) and reused by later processes as long as the size and modification time
+of the JSON file are unchanged.
+
+    registry = load_schema()
+    namespace, (desc, icool_type, default) = registry['EPSF']
+"""
+import os
+import json
+import marshal
+import struct
+
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icool_commands.json')
+
+cache_suffix = '.cache'
+cache_magic = 'ICOOLSCH'
+cache_version = 1
+cache_header = struct.Struct('<8sIqq')
+
+# Registries already loaded in this process, by path, with the size and modification time of the
+# file they were loaded from.
+loaded = {}
+
+
+class ReadOnlyDict(dict):
+
+    """
+    Dictionary which cannot be changed once built.  Registries are shared by every user in the
+    process through loaded, so their tables are read only; dict(table) gives a copy to modify.
+    """
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError('Registry tables are read only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self):
+        return ReadOnlyDict, (dict(self),)
+
+
+def freeze(groups):
+    """Returns groups, a dictionary of group to namespace to commands, with every level read only."""
+    return ReadOnlyDict((group, ReadOnlyDict((namespace, ReadOnlyDict(commands))
+                                             for namespace, commands in namespaces.iteritems()))
+                        for group, namespaces in groups.iteritems())
+
+
+class CommandRegistry(object):
+
+    """
+    Read-only index of the ICOOL commands.  groups maps ICOOL_COMMANDS and REGION_COMMANDS to their
+    namespaces, namespaces maps each namelist or kind of region command (CONT, BMT, INTS, REGULAR,
+    ...) to its commands, and commands maps the upper case name of every command to its namespace and
+    its (description, ICOOL type, default) entry.  All of these are ReadOnlyDicts.
+    """
+
+    __slots__ = ('groups', 'namespaces', 'commands')
+
+    def __init__(self, groups):
+        groups = freeze(groups)
+        namespaces = {}
+        commands = {}
+        for group in groups.itervalues():
+            namespaces.update(group)
+        for namespace in namespaces:
+            for name, entry in namespaces[namespace].iteritems():
+                commands[name.upper()] = (namespace, entry)
+        object.__setattr__(self, 'groups', groups)
+        object.__setattr__(self, 'namespaces', ReadOnlyDict(namespaces))
+        object.__setattr__(self, 'commands', ReadOnlyDict(commands))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CommandRegistry is read only')
+
+    def __contains__(self, name):
+        return name.upper() in self.commands
+
+    def __getitem__(self, name):
+        return self.commands[name.upper()]
+
+    def __iter__(self):
+        return iter(self.commands)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def get(self, name, default=None):
+        return self.commands.get(name.upper(), default)
+
+
+def compile_schema(data):
+    """
+    Returns the JSON data as a dictionary of group to namespace to command name to (description,
+    ICOOL type, default) tuples.
+    """
+    groups = {}
+    for group, namespaces in data.iteritems():
+        groups[str(group)] = dict(
+            (str(namespace), dict((str(name), tuple(entry)) for name, entry in commands.iteritems()))
+            for namespace, commands in namespaces.iteritems())
+    return groups
+
+
+def load_schema(path=default_path, cache=True):
+    """
+    Returns the CommandRegistry of the JSON file at path.  The registry is reused while the file is
+    unchanged.  If cache is True the compiled registry is read from, or written to, path + '.cache'.
+    """
+    stat = os.stat(path)
+    key = (stat.st_size, int(stat.st_mtime * 1e6))
+    entry = loaded.get(path)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    groups = read_cache(path, key) if cache else None
+    if groups is None:
+        with open(path) as file:
+            groups = compile_schema(json.load(file))
+        if cache:
+            write_cache(path, key, groups)
+    registry = CommandRegistry(groups)
+    loaded[path] = (key, registry)
+    return registry
+
+
+def read_cache(path, key):
+    """Returns the groups saved for the JSON file at path, or None if there are none or they are stale."""
+    try:
+        with open(path + cache_suffix, 'rb') as file:
+            data = file.read()
+    except (IOError, OSError):
+        return None
+    if len(data) < cache_header.size:
+        return None
+    magic, version, size, mtime = cache_header.unpack_from(data)
+    if magic != cache_magic or version != cache_version or (size, mtime) != key:
+        return None
+    try:
+        return marshal.loads(data[cache_header.size:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def write_cache(path, key, groups):
+    """Saves the groups next to the JSON file.  A directory which cannot be written is ignored."""
+    cache_path = path + cache_suffix
+    temp_path = cache_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(cache_header.pack(cache_magic, cache_version, key[0], key[1]))
+            file.write(marshal.dumps(groups, 2))
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        pass
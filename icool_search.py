@@ -0,0 +1,164 @@
+"""
+Full-text search over the ICOOL documentation held by ipycool.
+
+The index covers every command class (its docstring and command_params), every model in a models
+table (Sol, Accel, Material, Distribution, Correlation, ...) and the parameters of each model, and the
+namelist variables and region commands of icool_commands.json.  It is an inverted index from word
+stems to the entries they appear in, built once, the first time it is used.  Results are ranked
+with BM25, with words in the name and the first line of an entry counting more than words in the
+rest of its description.  Query words which appear nowhere in the documentation are matched against
+similar words (e.g. 'focussing' finds 'focusing').
+
+    >>> search('focusing deficit')
+"""
+import re
+import math
+import difflib
+from collections import namedtuple
+
+# One searchable entry.  kind is 'command', 'parameter', 'model', 'model parameter' or 'variable',
+# and name is its dotted path, e.g. 'Sol.edge.bs'.
+Entry = namedtuple('Entry', ['kind', 'name', 'text'])
+Match = namedtuple('Match', ['score', 'kind', 'name', 'text'])
+
+word_pattern = re.compile(r'[a-z][a-z0-9]*|[0-9]+(?:\.[0-9]+)?')
+suffixes = ('ing', 'ed', 'es', 's')
+
+# Weight of a word in the name of an entry, and in the first line of its description, relative to a
+# word in the rest of the description.
+name_weight = 3.0
+title_weight = 2.0
+# BM25 parameters.
+k1 = 1.2
+b = 0.75
+# Similar words are found with difflib; each counts for at most this fraction of an exact match.
+fuzzy_cutoff = 0.75
+fuzzy_weight = 0.5
+fuzzy_matches = 3
+
+search_index = None
+
+
+def stem(word):
+    """Strips a common English suffix, so that e.g. 'focusing' and 'focused' match 'focus'."""
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Returns the word stems of text.  Names such as 'ent_def' or 'x_mean' are split on '_'."""
+    return [stem(word) for word in word_pattern.findall(text.lower().replace('_', ' '))]
+
+
+def first_line(text):
+    for line in (text or '').splitlines():
+        if line.strip():
+            return line.strip()
+    return ''
+
+
+def entry_text(spec):
+    return ' '.join(part for part in (spec.get('desc'), spec.get('doc')) if part)
+
+
+def iter_entries():
+    """Yields an Entry for every documented command, parameter, model and namelist variable."""
+    import ipycool
+    from icool_slots import CommandMeta
+    from icool_schema import load_schema
+    for class_name in sorted(vars(ipycool)):
+        cls = getattr(ipycool, class_name)
+        if not isinstance(cls, CommandMeta) or cls.__module__ != ipycool.__name__:
+            continue
+        yield Entry('command', class_name, cls.__doc__ or '')
+        command_params = cls.__dict__.get('command_params', {})
+        for name in sorted(command_params):
+            yield Entry('parameter', '%s.%s' % (class_name, name), entry_text(command_params[name]))
+        models = cls.__dict__.get('models', {})
+        for model in sorted(models):
+            if model == 'model_descriptor':
+                continue
+            spec = models[model]
+            text = '%s (%s %s)' % (entry_text(spec), models['model_descriptor']['name'],
+                                   spec.get('icool_model_name', model))
+            yield Entry('model', '%s.%s' % (class_name, model), text)
+            for name in sorted(spec['parms']):
+                yield Entry('model parameter', '%s.%s.%s' % (class_name, model, name),
+                            entry_text(spec['parms'][name]))
+    registry = load_schema()
+    for name in sorted(registry.commands):
+        namespace, (desc, icool_type, default) = registry.commands[name]
+        yield Entry('variable', '%s.%s' % (namespace, name), desc or '')
+
+
+class SearchIndex(object):
+
+    """Inverted index mapping each word stem to the entries it appears in and its weight there."""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.postings = {}
+        self.lengths = []
+        for number, entry in enumerate(self.entries):
+            weights = {}
+            for term in tokenize(entry.name):
+                weights[term] = weights.get(term, 0.0) + name_weight
+            for term in tokenize(first_line(entry.text)):
+                weights[term] = weights.get(term, 0.0) + title_weight - 1.0
+            for term in tokenize(entry.text):
+                weights[term] = weights.get(term, 0.0) + 1.0
+            for term, weight in weights.iteritems():
+                self.postings.setdefault(term, []).append((number, weight))
+            self.lengths.append(sum(weights.itervalues()))
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, term):
+        """Returns (term, weight) pairs for a query term: the term itself, or else similar terms."""
+        if term in self.postings:
+            return [(term, 1.0)]
+        similar = difflib.get_close_matches(term, self.vocabulary, fuzzy_matches, fuzzy_cutoff)
+        return [(other, fuzzy_weight * difflib.SequenceMatcher(None, term, other).ratio())
+                for other in similar]
+
+    def search(self, query, limit=10, kind=None):
+        """Returns up to limit Matches for query, best first, optionally only entries of one kind."""
+        scores = {}
+        num_entries = len(self.entries)
+        for query_term in set(tokenize(query)):
+            for term, term_weight in self.expand(query_term):
+                postings = self.postings[term]
+                idf = math.log(1.0 + (num_entries - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, weight in postings:
+                    norm = k1 * (1.0 - b + b * self.lengths[number] / self.average_length)
+                    score = term_weight * idf * weight * (k1 + 1.0) / (weight + norm)
+                    scores[number] = scores.get(number, 0.0) + score
+        ranked = sorted(scores.iteritems(), key=lambda item: (-item[1], item[0]))
+        matches = []
+        for number, score in ranked:
+            entry = self.entries[number]
+            if kind is not None and entry.kind != kind:
+                continue
+            matches.append(Match(round(score, 3), entry.kind, entry.name, first_line(entry.text)))
+            if len(matches) == limit:
+                break
+        return matches
+
+
+def get_index():
+    """Returns the search index, building it on first use."""
+    global search_index
+    if search_index is None:
+        search_index = SearchIndex(iter_entries())
+    return search_index
+
+
+def search(query, limit=10, kind=None):
+    """
+    Searches the documentation of commands, parameters, models and namelist variables.  Returns up to
+    limit Matches (score, kind, name, first line of the description), best first.  kind restricts
+    the results to 'command', 'parameter', 'model', 'model parameter' or 'variable' entries.
+    """
+    return get_index().search(query, limit, kind)
@@ -0,0 +1,235 @@
+"""
+Compact binary serialization of ipycool object trees.
+
+dump/dumps write a tree of command objects as a table of layouts followed by one record per
+object.  A layout names a class and the parameters set on its objects, e.g. (Sol, model, bs,
+ent_def, ...), and is written once; each record is then just a layout number and the vector of
+parameter values in layout order, encoded with marshal.  Enclosed and referenced commands are
+written once and referred to by record number, so commands shared within a tree (see icool_intern)
+stay shared when the tree is loaded.  Class-level tables such as command_params and models, and the
+transient render caches, are never written.
+
+load/loads rebuild the objects without going through the validating __setattr__, in the same way
+as unpickling.  The file records the format version and the parameter names of every layout, so a
+file written against a different set of parameters is rejected rather than loaded wrongly.
+
+    with open('lattice.icb', 'wb') as file:
+        dump(inp, file)
+"""
+import gc
+import marshal
+import struct
+from contextlib import contextmanager
+from array import array
+import icool_exceptions as ie
+import ipycool
+from icool_slots import SlotState
+
+magic = 'ICOOLBIN'
+format_version = 1
+header = struct.Struct('<8sI')
+
+# Column kinds.  Columns in which every value is an int, float or bool, or a command, or a list of
+# commands, are packed into arrays; any other column is written as a list of values.
+int_column = 'i'
+float_column = 'f'
+bool_column = 'b'
+command_column = 'c'
+commands_column = 'l'
+value_column = 'v'
+
+int_types = ('b', 'h', 'i', 'l')
+float_type = 'd'
+bool_type = 'b'
+
+
+@contextmanager
+def gc_paused():
+    """Suspends cyclic garbage collection, which would otherwise run many times while building
+    or encoding a large tree without freeing anything."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def collect(root):
+    """Returns every command object reachable from root, each once, with its state."""
+    objects = []
+    states = []
+    seen = set()
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        state = obj.__getstate__()
+        objects.append(obj)
+        states.append(state)
+        for value in state.itervalues():
+            if isinstance(value, SlotState):
+                pending.append(value)
+            elif isinstance(value, list):
+                pending.extend(item for item in value if isinstance(item, SlotState))
+    return objects, states
+
+
+def pack_ints(values):
+    """Packs a list of ints into the narrowest array type which holds all of them."""
+    low = min(values) if values else 0
+    high = max(values) if values else 0
+    for type_code in int_types:
+        packed = array(type_code)
+        if -(1 << (8 * packed.itemsize - 1)) <= low and high < (1 << (8 * packed.itemsize - 1)):
+            packed.extend(values)
+            return type_code, packed.tostring()
+
+
+def encode_column(values, numbers):
+    """Returns the kind and the packed data of the column of one parameter of a layout."""
+    types = set(type(value) for value in values)
+    if types == set([int]):
+        return int_column, pack_ints(values)
+    if types == set([float]):
+        return float_column, array(float_type, values).tostring()
+    if types == set([bool]):
+        return bool_column, array(bool_type, values).tostring()
+    if all(isinstance(value, SlotState) for value in values):
+        return command_column, pack_ints([numbers[id(value)] for value in values])
+    if types == set([list]) and all(isinstance(item, SlotState) for value in values for item in value):
+        counts = pack_ints([len(value) for value in values])
+        items = pack_ints([numbers[id(item)] for value in values for item in value])
+        return commands_column, (counts, items)
+    for value in values:
+        if isinstance(value, (SlotState, tuple)) or (
+                isinstance(value, list) and any(isinstance(item, SlotState) for item in value)):
+            raise ie.SerialFormatError('Cannot serialize value %r' % (value,))
+    return value_column, values
+
+
+def decode_column(kind, data, objects):
+    if kind == int_column:
+        return unpack(*data)
+    if kind == float_column:
+        return unpack(float_type, data)
+    if kind == bool_column:
+        return [bool(value) for value in unpack(bool_type, data)]
+    if kind == command_column:
+        return [objects[number] for number in unpack(*data)]
+    if kind == commands_column:
+        counts = unpack(*data[0])
+        items = unpack(*data[1])
+        values = []
+        start = 0
+        for count in counts:
+            values.append([objects[number] for number in items[start:start + count]])
+            start += count
+        return values
+    if kind == value_column:
+        return data
+    raise ie.SerialFormatError('Unknown column kind %r' % (kind,))
+
+
+def unpack(type_code, data):
+    values = array(type_code)
+    values.fromstring(data)
+    return values.tolist()
+
+
+def dumps(root):
+    """Returns the binary encoding of the tree of command objects rooted at root."""
+    with gc_paused():
+        return encode(root)
+
+
+def encode(root):
+    objects, states = collect(root)
+    layouts = []
+    layout_numbers = {}
+    rows = []
+    for i, (obj, state) in enumerate(zip(objects, states)):
+        key = (obj.__class__, tuple(sorted(state)))
+        layout = layout_numbers.get(key)
+        if layout is None:
+            layout = len(layouts)
+            layouts.append((obj.__class__.__module__, obj.__class__.__name__, key[1]))
+            layout_numbers[key] = layout
+            rows.append([])
+        rows[layout].append(i)
+    # Objects are numbered in layout order, which is the order in which loads creates them.
+    numbers = {}
+    for layout_rows in rows:
+        for i in layout_rows:
+            numbers[id(objects[i])] = len(numbers)
+    columns = []
+    for (module, name, names), layout_rows in zip(layouts, rows):
+        columns.append([encode_column([states[i][attr] for i in layout_rows], numbers)
+                        for attr in names])
+    counts = [len(layout_rows) for layout_rows in rows]
+    data = (numbers[id(root)], layouts, counts, columns)
+    return header.pack(magic, format_version) + marshal.dumps(data, 2)
+
+
+def loads(data):
+    """
+    Rebuilds and returns the tree of command objects encoded in data by dumps.  Raises
+    SerialFormatError if data is not a complete encoding.
+    """
+    try:
+        file_magic, version = header.unpack_from(data)
+    except struct.error:
+        raise ie.SerialFormatError('Not an ipycool binary file')
+    if file_magic != magic:
+        raise ie.SerialFormatError('Not an ipycool binary file')
+    if version != format_version:
+        raise ie.SerialFormatError('Unsupported ipycool binary format version %d' % version)
+    with gc_paused():
+        try:
+            return decode(*marshal.loads(data[header.size:]))
+        except (EOFError, ValueError, TypeError, IndexError, struct.error) as e:
+            raise ie.SerialFormatError('Truncated or corrupt ipycool binary file: %s' % e)
+
+
+def decode(root, layouts, counts, columns):
+    objects = []
+    layout_objects = []
+    for (module, name, names), count in zip(layouts, counts):
+        cls = get_layout_class(module, name, names)
+        new = cls.__new__
+        created = [new(cls) for i in xrange(count)]
+        layout_objects.append(created)
+        objects.extend(created)
+    set_slot = object.__setattr__
+    for (module, name, names), created, layout_columns in zip(layouts, layout_objects, columns):
+        for attr, (kind, column) in zip(names, layout_columns):
+            for obj, value in zip(created, decode_column(kind, column, objects)):
+                set_slot(obj, attr, value)
+    return objects[root]
+
+
+def get_layout_class(module, name, names):
+    """
+    Returns the class of a layout.  Only command classes of ipycool are loaded; no other module is
+    imported.
+    """
+    cls = getattr(ipycool, name, None) if module == ipycool.__name__ else None
+    if not (isinstance(cls, type) and issubclass(cls, ipycool.ICoolObject)):
+        raise ie.SerialFormatError('Unknown class %s.%s' % (module, name))
+    unknown = set(names).difference(cls._slot_names)
+    if unknown:
+        raise ie.SerialFormatError('Unknown parameters for %s: %s' % (name, ', '.join(sorted(unknown))))
+    return cls
+
+
+def dump(root, file):
+    """Writes the binary encoding of the tree rooted at root to file."""
+    file.write(dumps(root))
+
+
+def load(file):
+    """Reads a tree written by dump from file and returns its root."""
+    return loads(file.read())
@@ -0,0 +1,85 @@
+"""
+Slot-based storage for ICOOL command objects.
+
+CommandMeta gives every command class a __slots__ layout derived from its command_params and,
+for modeled command parameters, the union of the parms of all of its models.  Instances therefore
+carry no per-object __dict__.  Attributes which are not command parameters (e.g. enclosed_commands)
+are declared by a class in instance_attributes.  Attributes declared in transient_attributes (e.g.
+render caches) also get slots, but are reset to None on construction and are not pickled or copied.
+Classes with a models table also get a ModelRegistry in _registry, built on first use.
+"""
+from icool_registry import LazyRegistry
+
+
+def model_slot_names(models):
+    """Returns the set of attribute names used by any model in a models table."""
+    names = set()
+    for model in models:
+        if model == 'model_descriptor':
+            if models[model]['name'] is not None:
+                names.add(models[model]['name'])
+        else:
+            names.update(models[model]['parms'])
+    return names
+
+
+class CommandMeta(type):
+
+    """
+    Metaclass deriving __slots__ from the command_params, models, instance_attributes and
+    transient_attributes defined in a class body.  Names already provided by a base class are not
+    repeated.  A class which defines __slots__ explicitly is left alone.  A models table in the
+    class body gets a ModelRegistry, compiled on first use.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        inherited = set()
+        inherited_transient = set()
+        for base in bases:
+            inherited.update(getattr(base, '_slot_names', ()))
+            inherited_transient.update(getattr(base, '_transient_names', ()))
+        transient = set(namespace.get('transient_attributes', ())) - inherited_transient
+        if '__slots__' not in namespace:
+            names = set(namespace.get('instance_attributes', ()))
+            if 'command_params' in namespace:
+                names.update(namespace['command_params'])
+            if 'models' in namespace:
+                names.update(model_slot_names(namespace['models']))
+            namespace['__slots__'] = tuple(sorted(names - inherited)) + tuple(sorted(transient))
+        namespace['_slot_names'] = tuple(sorted(inherited.union(namespace['__slots__']) - transient))
+        namespace['_transient_names'] = tuple(sorted(inherited_transient.union(transient)))
+        if 'models' in namespace:
+            namespace['_registry'] = LazyRegistry(namespace['models'])
+        return type.__new__(mcs, name, bases, namespace)
+
+
+class SlotState(object):
+
+    """
+    Pickling and copying support for slotted command objects.  State is restored directly, without
+    going through the validating __setattr__ of the command classes.  Command objects may be
+    weakly referenced.
+    """
+
+    __slots__ = ('__weakref__',)
+
+    def __new__(cls, *args, **kwargs):
+        obj = object.__new__(cls)
+        obj.reset_transient()
+        return obj
+
+    def reset_transient(self):
+        for name in getattr(self, '_transient_names', ()):
+            object.__setattr__(self, name, None)
+
+    def __getstate__(self):
+        state = {}
+        for name in self._slot_names:
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        self.reset_transient()
+        for name in state:
+            object.__setattr__(self, name, state[name])
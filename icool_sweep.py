@@ -0,0 +1,348 @@
+"""
+Parameter sweeps.
+
+A Sweep writes one for001.dat for every point of a parameter sweep, each in its own directory under
+an output root, from a template ICoolInput.  The points are given either as a grid, a list of
+(parameter, values) pairs whose every combination is a point, or as a list of dictionaries of
+overrides.  A parameter is named in one of two ways:
+
+    'Sol.bs'                   every Sol in the template
+    'section.0.0.field.bs'     one command, reached from the template by a path of parameter names
+                               and indices into enclosed_commands (see ICoolObject.evolve)
+
+When every point sets every parameter to a plain value, the template is compiled once into an
+icool_template.DeckTemplate and each deck is written by substituting the values into its text.
+Otherwise each point is built from the template by path copying: only the commands which change, and
+the commands enclosing them, are cloned, and the for001 text of everything else is rendered once per
+worker process and reused.  Points are spread over a pool of processes.
+
+The directory of point n is point_<n>, zero padded to the width of the largest point number, so the
+layout depends only on the order of the points.  The root also gets manifest.json, which lists the
+parameters and, for every point, its directory and its values.
+
+    sweep = Sweep(template, 'runs', grid=[('Sol.bs', [1.0, 2.0, 3.0]), ('cont.rnseed', [1, 2])])
+    sweep.run(processes=8)
+"""
+import os
+import json
+import itertools
+import multiprocessing
+import ipycool
+import icool_serial
+from icool_slots import CommandMeta
+from icool_writer import For001Writer
+
+manifest_name = 'manifest.json'
+deck_name = 'for001.dat'
+
+scalar_types = (int, long, float, bool, basestring)
+
+# Template, and the paths of the instances of each swept class, or the compiled DeckTemplate, of the
+# current worker process.
+worker_template = None
+worker_class_paths = None
+worker_deck_template = None
+
+
+def parse_parameter(parameter):
+    """
+    Splits a parameter name into its target and parameter.  The target is a command class for a name
+    starting with a class name, and otherwise a path tuple.
+    """
+    steps = parameter.split('.')
+    if len(steps) < 2:
+        return None, parameter
+    first = getattr(ipycool, steps[0], None)
+    if len(steps) == 2 and isinstance(first, CommandMeta):
+        return first, steps[1]
+    path = tuple(int(step) if step.isdigit() else step for step in steps[:-1])
+    return path, steps[-1]
+
+
+def iter_children(obj):
+    """Yields the (step, command) pairs of the command objects held by obj."""
+    state = obj.__getstate__()
+    for name in sorted(state):
+        value = state[name]
+        if isinstance(value, ipycool.ICoolObject):
+            yield name, value
+    for i, command in enumerate(getattr(obj, 'enclosed_commands', None) or ()):
+        yield i, command
+
+
+def find_paths(root, classes):
+    """Returns a dictionary of each class in classes to the paths of its instances below root."""
+    paths = dict((cls, []) for cls in classes)
+    pending = [(root, ())]
+    while pending:
+        obj, path = pending.pop()
+        for cls in classes:
+            if isinstance(obj, cls):
+                paths[cls].append(path)
+        for step, child in iter_children(obj):
+            pending.append((child, path + (step,)))
+    for cls in paths:
+        paths[cls].sort()
+    return paths
+
+
+def get_target(root, path):
+    obj = root
+    for step in path:
+        obj = obj.get_child(step)
+    return obj
+
+
+def get_targets(root, parameter, class_paths):
+    """
+    Returns the parameter name and the distinct command objects below root named by parameter, or
+    prints the error and returns None.  class_paths is as returned by find_paths.
+    """
+    target, name = parse_parameter(parameter)
+    if target is None:
+        print 'Parameter ' + parameter + ' does not name a command'
+        return None
+    if isinstance(target, CommandMeta):
+        objects = [get_target(root, path) for path in class_paths[target]]
+        if not objects:
+            print 'Parameter ' + parameter + ': no ' + target.__name__ + ' found'
+            return None
+    else:
+        try:
+            objects = [get_target(root, target)]
+        except (AttributeError, IndexError, TypeError):
+            print 'Parameter ' + parameter + ': no command at ' + repr(target)
+            return None
+    return name, dict((id(obj), obj) for obj in objects).values()
+
+
+def build_trie(overrides, class_paths):
+    """
+    Returns a trie of the overrides of one point.  Each node maps the steps below it to their nodes,
+    and None to the parameters to set on the command at that node.  All instances of a class share
+    one dictionary of parameters.
+    """
+    trie = {}
+    targets = []
+    by_class = {}
+    for parameter in sorted(overrides):
+        target, name = parse_parameter(parameter)
+        if isinstance(target, CommandMeta):
+            if target not in by_class:
+                by_class[target] = {}
+                targets.extend((path, by_class[target]) for path in class_paths[target])
+            by_class[target][name] = overrides[parameter]
+        else:
+            targets.append((target, {name: overrides[parameter]}))
+    for path, params in targets:
+        node = trie
+        for step in path:
+            node = node.setdefault(step, {})
+        if None in node and node[None] is not params:
+            merged = dict(node[None])
+            merged.update(params)
+            params = merged
+        node[None] = params
+    return trie
+
+
+def clone_command(obj, params):
+    return obj.clone(**params)
+
+
+def rebuild(obj, node, memo, clone=clone_command):
+    """
+    Returns a copy of obj with the overrides of node applied to it and to the commands below it.
+    Commands not named in node are shared with obj.  A command reached by several paths with the
+    same overrides is copied once.  clone(obj, params) returns the copy of one command.
+    """
+    params = node.get(None)
+    if len(node) == 1 and params is not None:
+        key = (id(obj), id(params))
+        new = memo.get(key)
+        if new is None:
+            new = memo[key] = clone(obj, params)
+        return new
+    new = clone(obj, params or {})
+    for step in node:
+        if step is None:
+            continue
+        child = rebuild(obj.get_child(step), node[step], memo, clone)
+        if isinstance(step, (int, long)):
+            new.enclosed_commands[step] = child
+        else:
+            new.assign(step, child)
+    return new
+
+
+def build_point(template, overrides, class_paths):
+    """Returns the deck of one point: template with overrides applied."""
+    trie = build_trie(overrides, class_paths)
+    if not trie:
+        return template
+    return rebuild(template, trie, {})
+
+
+def init_worker(data, classes, deck_template=None):
+    global worker_template, worker_class_paths, worker_deck_template
+    worker_deck_template = deck_template
+    if deck_template is None:
+        worker_template = icool_serial.loads(data)
+        worker_template.get_for001()
+        worker_class_paths = find_paths(worker_template, classes)
+
+
+def write_point(task):
+    number, directory, overrides = task
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(os.path.join(directory, deck_name), 'wb') as file:
+        with For001Writer(file) as writer:
+            if worker_deck_template is not None:
+                writer.write(worker_deck_template.substitute(overrides))
+            else:
+                deck = build_point(worker_template, overrides, worker_class_paths)
+                for text in deck.iter_for001():
+                    writer.write(text)
+    return number
+
+
+class Sweep(object):
+
+    def __init__(self, template, root, grid=None, points=None):
+        """
+        template is the ICoolInput to sweep and root the directory to write into.  Give either grid, a
+        list of (parameter, values) pairs or a dictionary, or points, a list of dictionaries of
+        parameter to value.
+        """
+        self.template = template
+        self.root = root
+        if grid is not None:
+            if isinstance(grid, dict):
+                grid = sorted(grid.items())
+            names = [name for name, values in grid]
+            points = [dict(zip(names, values))
+                      for values in itertools.product(*[values for name, values in grid])]
+        self.points = list(points or [])
+        self.parameters = sorted(set(itertools.chain.from_iterable(self.points)))
+
+    def __len__(self):
+        return len(self.points)
+
+    def get_directory(self, number):
+        width = len(str(max(len(self.points) - 1, 0)))
+        return os.path.join(self.root, 'point_%0*d' % (width, number))
+
+    def get_classes(self):
+        classes = set()
+        for parameter in self.parameters:
+            target, name = parse_parameter(parameter)
+            if isinstance(target, CommandMeta):
+                classes.add(target)
+        return sorted(classes, key=lambda cls: cls.__name__)
+
+    def check(self):
+        """
+        Checks every point against the template, so that errors are reported before any deck is
+        written.  Returns True if all points are valid; otherwise prints the error and returns False.
+        """
+        class_paths = find_paths(self.template, self.get_classes())
+        targets = {}
+        for parameter in self.parameters:
+            targets[parameter] = get_targets(self.template, parameter, class_paths)
+            if targets[parameter] is None:
+                return False
+        for number, point in enumerate(self.points):
+            by_object = {}
+            for parameter in point:
+                name, objects = targets[parameter]
+                for obj in objects:
+                    by_object.setdefault(id(obj), (obj, {}))[1][name] = point[parameter]
+            for obj, overrides in by_object.itervalues():
+                if not obj.check_overrides(overrides):
+                    print 'in sweep point ' + str(number) + ': ' + repr(point)
+                    return False
+        return True
+
+    def get_placeholders(self):
+        """
+        Returns the placeholders with which the template can be compiled for this sweep, or None if
+        some point leaves a parameter unset, sets one to a command, or changes a model.
+        """
+        parameters = set(self.parameters)
+        for point in self.points:
+            if set(point) != parameters:
+                return None
+            for value in point.itervalues():
+                if not isinstance(value, scalar_types):
+                    return None
+        class_paths = find_paths(self.template, self.get_classes())
+        for parameter in self.parameters:
+            name, objects = get_targets(self.template, parameter, class_paths)
+            for obj in objects:
+                if name == getattr(obj, 'get_model_descriptor_name', lambda: None)():
+                    return None
+        return dict((parameter, parameter) for parameter in self.parameters)
+
+    def run(self, processes=None, chunksize=None, use_template=True):
+        """
+        Writes the deck of every point and the manifest, using a pool of processes (by default one per
+        CPU).  With processes=1 the decks are written in this process.  If use_template is True the
+        decks are written from a compiled DeckTemplate whenever get_placeholders allows.  Returns the
+        manifest, or False if the sweep is not valid.
+        """
+        if not self.check():
+            return False
+        classes = self.get_classes()
+        tasks = [(number, self.get_directory(number), point)
+                 for number, point in enumerate(self.points)]
+        placeholders = self.get_placeholders() if use_template else None
+        if placeholders:
+            import icool_template
+            deck_template = icool_template.DeckTemplate(self.template, placeholders)
+            if not deck_template.valid:
+                return False
+            for number, point in enumerate(self.points):
+                if not deck_template.check(point):
+                    print 'in sweep point ' + str(number) + ': ' + repr(point)
+                    return False
+            data = None
+        else:
+            deck_template = None
+            data = icool_serial.dumps(self.template)
+        if processes == 1:
+            init_worker(data, classes, deck_template)
+            for task in tasks:
+                write_point(task)
+        else:
+            processes = processes or multiprocessing.cpu_count()
+            if chunksize is None:
+                chunksize = max(1, len(tasks) // (4 * processes))
+            pool = multiprocessing.Pool(processes, init_worker, (data, classes, deck_template))
+            try:
+                for number in pool.imap_unordered(write_point, tasks, chunksize):
+                    pass
+            finally:
+                pool.terminate()
+                pool.join()
+        return self.write_manifest()
+
+    def get_manifest(self):
+        return {'parameters': self.parameters,
+                'points': [{'number': number,
+                            'directory': os.path.basename(self.get_directory(number)),
+                            'parameters': point}
+                           for number, point in enumerate(self.points)]}
+
+    def write_manifest(self):
+        manifest = self.get_manifest()
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        with open(os.path.join(self.root, manifest_name), 'w') as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+        return manifest
+
+
+def sweep(template, root, grid=None, points=None, processes=None):
+    """Writes the decks of a sweep of template into root.  See Sweep."""
+    return Sweep(template, root, grid, points).run(processes)
@@ -0,0 +1,142 @@
+"""
+Precompiled deck templates.
+
+A DeckTemplate is the rendered for001.dat text of an ICoolInput with some parameters left as named
+placeholders.  The deck is rendered once, with a marker in place of each placeholder parameter, and
+the text is split at the markers.  Each variant is then produced by formatting the placeholder values
+and joining them with the fixed text, without building, validating or rendering any command objects.
+
+Placeholder values are still checked against the type, and the min and max, declared for the
+parameter by every command it is substituted into.  Parameters are named as for icool_sweep:
+
+    template = DeckTemplate(deck, {'bs': 'Sol.bs', 'seed': 'cont.rnseed'})
+    text = template.render({'bs': 2.5, 'seed': 7})
+"""
+import re
+import icool_exceptions as ie
+import icool_format
+from ipycool import check_spec
+from icool_sweep import parse_parameter, find_paths, get_targets, build_trie, rebuild
+from icool_slots import CommandMeta
+from icool_writer import For001Writer
+
+# Placeholder markers are control characters which do not otherwise occur in a deck.
+marker_format = '\x01%d\x02'
+marker_pattern = re.compile('\x01([0-9]+)\x02')
+
+
+def format_value(value):
+    """Returns the for001.dat text of a parameter value, as rendered by ICoolObject.for001_str_gen."""
+    if value.__class__ is bool:
+        return icool_format.logical_text[value]
+    return str(value)
+
+
+def assign_markers(obj, params):
+    """Returns a copy of obj with the markers in params assigned directly, bypassing type checks."""
+    new = obj.clone()
+    for name in params:
+        new.assign(name, params[name])
+    return new
+
+
+class DeckTemplate(object):
+
+    def __init__(self, deck, placeholders):
+        """
+        Compiles deck, with each parameter in placeholders, a dictionary of placeholder name to
+        parameter, left open.  deck itself is not modified.
+        """
+        self.placeholders = dict(placeholders)
+        self.names = sorted(self.placeholders)
+        self.specs = {}
+        self.pieces = None
+        self.slots = None
+        self.valid = self.compile(deck)
+
+    def compile(self, deck):
+        """Renders deck with markers and splits the text at them.  Returns False on error."""
+        classes = set()
+        for name in self.names:
+            target, param = parse_parameter(self.placeholders[name])
+            if isinstance(target, CommandMeta):
+                classes.add(target)
+        class_paths = find_paths(deck, classes)
+        markers = {}
+        for number, name in enumerate(self.names):
+            parameter = self.placeholders[name]
+            targets = get_targets(deck, parameter, class_paths)
+            if targets is None:
+                return False
+            param, objects = targets
+            specs = []
+            for obj in objects:
+                if param == getattr(obj, 'get_model_descriptor_name', lambda: None)():
+                    print 'Placeholder ' + name + ': a model cannot be a placeholder'
+                    return False
+                if not obj.check_command_param(param):
+                    return False
+                spec = obj.get_schema()[param]
+                if spec not in specs:
+                    specs.append(spec)
+            self.specs[name] = specs
+            markers[parameter] = icool_format.Marker(marker_format % number)
+        text = ''.join(deck.iter_for001(cache=True))
+        if marker_pattern.search(text):
+            print 'Deck text contains placeholder markers'
+            return False
+        marked = rebuild(deck, build_trie(markers, class_paths), {}, assign_markers)
+        pieces = marker_pattern.split(''.join(marked.iter_for001()))
+        self.pieces = pieces[0::2]
+        self.slots = [self.names[int(number)] for number in pieces[1::2]]
+        return True
+
+    def check(self, values):
+        """
+        Returns True if values holds a valid value for every placeholder.  Otherwise prints the error
+        and returns False.
+        """
+        try:
+            for name in self.names:
+                if name not in values:
+                    raise ie.MissingCommandParameter(name, self.names)
+                value = values[name]
+                for spec in self.specs[name]:
+                    check_spec(spec, value, self.placeholders[name])
+        except (ie.MissingCommandParameter, ie.InvalidType, ie.OutOfBounds) as e:
+            print e
+            return False
+        return True
+
+    def __getstate__(self):
+        """
+        Pickles the compiled text and slots only.  The specs hold type check functions which cannot be
+        pickled, so a template sent to another process can substitute values but not check them.
+        """
+        state = dict(self.__dict__)
+        state['specs'] = None
+        return state
+
+    def render(self, values):
+        """Returns the for001.dat text with values substituted, or False if values are not valid."""
+        if not self.valid or not self.check(values):
+            return False
+        return self.substitute(values)
+
+    def substitute(self, values):
+        """Returns the for001.dat text with values, which have already been checked, substituted."""
+        texts = dict((name, format_value(values[name])) for name in self.names)
+        parts = [self.pieces[0]]
+        for slot, piece in zip(self.slots, self.pieces[1:]):
+            parts.append(texts[slot])
+            parts.append(piece)
+        return ''.join(parts)
+
+    def write(self, file, values):
+        """Writes the for001.dat text with values substituted to file.  Returns False on error."""
+        text = self.render(values)
+        if text is False:
+            return False
+        with For001Writer(file) as writer:
+            writer.write(text)
+        return True
@@ -0,0 +1,46 @@
+"""
+Buffered output for for001.dat generation.
+
+For001Writer collects rendered text in a bytearray which is reused between flushes and writes it
+to the underlying file in blocks of block_size bytes, rather than issuing one write() per token.
+"""
+
+default_block_size = 1 << 20
+
+
+class For001Writer(object):
+
+    def __init__(self, file, block_size=default_block_size):
+        self.file = file
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.num_writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def write(self, text):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        if len(text) >= self.block_size:
+            # Large cached fragments are passed straight through.
+            self.flush()
+            self.file.write(text)
+            self.num_writes += 1
+            return
+        self.buffer.extend(text)
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(str(self.buffer))
+            self.num_writes += 1
+            del self.buffer[:]
@@ -0,0 +1,24 @@
+import os
+import sys
+import subprocess
+
+probe = '''
+import sys
+%s
+print 'modules:', ' '.join(sorted(name for name in sys.modules
+                                  if name.split('.')[0] in ('IPython', 'icool_magics')))
+'''
+
+
+def get_loaded(imports):
+    """Returns the IPython and magics modules loaded by running imports in a fresh interpreter."""
+    output = subprocess.check_output([sys.executable, '-c', probe % imports],
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+    line = [line for line in output.splitlines() if line.startswith('modules:')][-1]
+    return line.split()[1:]
+
+
+def import_test():
+    assert get_loaded('import ipycool') == []
+    assert get_loaded('from ipycool import *') == []
+    assert 'IPython' in get_loaded('import IPython')
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import py.test
+from icool_index import For001Index
+from bmt_gen_test import bmt_gen_test
+
+sregion = """SREGION
+0.5 1 1e-3
+1 0 0.5
+SOL 8 40. 0 0 0 0 0 0 0 0 0 0 0 0 0
+LH CBLOCK 0 0 0 0 0 0 0 0 0 0
+
+"""
+
+
+def write_deck(directory, text):
+    path = os.path.join(directory, 'for001.dat')
+    with open(path, 'w') as file:
+        file.write(text)
+    return path
+
+
+def index_test():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'for001.dat')
+    try:
+        bmt_gen_test(path)
+        index = For001Index.open(path)
+        assert [index.get_tag(entry) for entry in range(len(index))] == \
+            ['SECTION', 'CELL', 'REPEAT', 'SREGION', 'SREGION', 'SREGION', 'REPEAT', 'SREGION']
+        for entry in range(len(index)):
+            assert index.load(entry).get_for001() == index.text(entry)
+        assert index.get_parent(index.find('SREGION')[0]) == index.find('REPEAT')[0]
+        index.close()
+        reopened = For001Index.open(path)
+        assert reopened.entries == index.entries
+        reopened.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def index_pseudoregion_test():
+    deck = 'Pseudoregions\n&cont npart=100 /\nSECTION\n' + sregion + 'OUTPUT\n' + sregion + \
+        'OUTPUT\nENDSECTION\n'
+    directory = tempfile.mkdtemp()
+    try:
+        path = write_deck(directory, deck)
+        index = For001Index(path)
+        entries = index.find('SREGION')
+        assert [index.text(entry) for entry in entries] == [sregion, sregion]
+        assert [command.slen for command in index.load_range(entries)] == [0.5, 0.5]
+        index.close()
+
+        write_deck(directory, deck.replace('SECTION\n', 'CELL\n', 1))
+        descriptors = len(os.listdir('/proc/self/fd'))
+        with py.test.raises(ValueError):
+            For001Index(path)
+        assert len(os.listdir('/proc/self/fd')) == descriptors
+    finally:
+        shutil.rmtree(directory)
+
+
+def index_title_test():
+    directory = tempfile.mkdtemp()
+    try:
+        for title in ('CELL study', 'ENDCELL of the channel', 'SREGION'):
+            path = write_deck(directory, title + '\n&cont npart=100 /\nSECTION\n' + sregion + 'ENDSECTION\n')
+            with For001Index(path) as index:
+                assert [index.get_tag(entry) for entry in range(len(index))] == ['SECTION', 'SREGION']
+                assert index.text(index.find('SREGION')[0]) == sregion
+        with For001Index(write_deck(directory, 'SECTION')) as index:
+            assert len(index) == 0
+        with For001Index(write_deck(directory, '')) as index:
+            assert len(index) == 0
+    finally:
+        shutil.rmtree(directory)
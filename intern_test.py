@@ -0,0 +1,59 @@
+from ipycool import *
+from icool_intern import InternPool
+from sweep_test import for001_text
+
+
+def make_sol(bs=40):
+    return Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=bs)
+
+
+def intern_deck():
+    section = Section()
+    for i in range(4):
+        sregion = SRegion(slen=1.0, nrreg=1, zstep=0.001)
+        sregion.add_enclosed_command(SubRegion(irreg=1, rlow=0, rhigh=0.5, field=make_sol(),
+                                               material=Material(geom='CBLOCK', mtag='LH')))
+        section.add_enclosed_command(sregion)
+    return ICoolInput(title=Title(title='intern'), cont=Cont(npart=10), bmt=Bmt(nbeamtyp=1),
+                      ints=Ints(), section=section)
+
+
+def subregions(deck):
+    return [sregion.enclosed_commands[0] for sregion in deck.section.enclosed_commands]
+
+
+def intern_test():
+    deck = intern_deck()
+    original = deck.get_for001()
+    pool = InternPool()
+    assert pool.intern_tree(deck) == 6
+    assert len(pool) == 2
+    fields = [subregion.field for subregion in subregions(deck)]
+    materials = [subregion.material for subregion in subregions(deck)]
+    assert all(field is fields[0] for field in fields)
+    assert all(material is materials[0] for material in materials)
+    assert deck.get_for001() == original
+    assert pool.intern_tree(deck) == 0
+
+    # Replacing the field of one region leaves the others, and their cached text, alone.
+    sregions = deck.section.enclosed_commands
+    texts = [sregion.get_for001() for sregion in sregions]
+    subregions(deck)[1].field = make_sol(2.5)
+    assert [sregion.for001_cache for sregion in sregions] == [texts[0], None, texts[2], texts[3]]
+    assert fields[0].bs == 40 and subregions(deck)[0].field is fields[0]
+    expected = intern_deck()
+    subregions(expected)[1].field.bs = 2.5
+    assert deck.get_for001() == for001_text(expected)
+
+    # Changing the shared field changes every region which still holds it, and no cached text is stale.
+    fields[0].bs = 3.0
+    assert deck.for001_cache is None and sregions[0].for001_cache is None
+    for number in (0, 2, 3):
+        subregions(expected)[number].field.bs = 3.0
+    assert deck.get_for001() == for001_text(expected)
+
+    # The modified command is no longer handed out for its old content.
+    fresh = make_sol()
+    assert pool.intern(fresh) is fresh and fields[0].bs == 3.0
+    assert pool.intern(make_sol()) is fresh
+    assert make_sol().content_key() == fresh.content_key() != fields[0].content_key()
@@ -2,6 +2,13 @@
 import sys
 import icool_exceptions as ie
 import copy
+import weakref
+import hashlib
+from collections import namedtuple
+from icool_slots import CommandMeta, SlotState
+from icool_writer import For001Writer
+import icool_format
+import icool_intern
 
 
 """Nomenclature:
@@ -79,29 +86,130 @@ ENDB
 Command parameters:
 Each regular and pseduoregion command is respectively associated with a set of command parameters.
 """
-from IPython.core.magic_arguments import (argument, magic_arguments,
-                                          parse_argstring)
-from IPython.core.magic import (register_line_magic, register_cell_magic,
-                                register_line_cell_magic)
+# Python types accepted for each ICOOL scalar type.  Matched on the exact class, so that e.g. a bool
+# is not accepted as a Real.
+scalar_types = {
+    'Real': frozenset([int, long, float]),
+    'Integer': frozenset([int, long]),
+    'Logical': frozenset([bool])}
 
-#@register_line_magic
+# ICOOL types which are checked against the command object class of the same name.
+object_types = ('Field', 'Material', 'SubRegion', 'Distribution', 'Correlation')
 
+type_checkers = {}
 
-@magic_arguments()
-@argument('-o', '--option', help='An optional argument.')
-@argument('arg', type=int, help='An integer positional argument.')
-def ipycool(self, arg):
-    """ A really cool ipycool magic command.
 
+def accept_any(value):
+    return True
+
+
+def make_default(default):
     """
-    args = parse_argstring(ipycool, arg)
+    Returns the value to assign for a parameter default.  A default given as a command class (e.g. the
+    namelists of ICoolInput) is instantiated, so that no commands are built at import time and objects
+    do not share a default command.
+    """
+    if isinstance(default, CommandMeta):
+        return default()
+    return default
+
+
+def get_type_checker(icool_type):
+    """Returns a callable taking a python value and returning True if it is valid for icool_type.
+    Types which are not checked (e.g. String) accept any value.  Checkers are built once per type.
+    """
+    checker = type_checkers.get(icool_type)
+    if checker is None:
+        if icool_type in scalar_types:
+            allowed = scalar_types[icool_type]
+            checker = lambda value: value.__class__ in allowed
+        elif icool_type in object_types:
+            cls = globals()[icool_type]
+            checker = lambda value: isinstance(value, cls)
+        else:
+            checker = accept_any
+        type_checkers[icool_type] = checker
+    return checker
+
+
+class ParamSpec(namedtuple('ParamSpec', 'name type check pos req min max default')):
+
+    """Compiled entry of a command_params or model 'parms' table."""
+
+    __slots__ = ()
+
+    def in_bounds(self, value):
+        """
+        Returns True if value is within min and max.  The default is always allowed, as it may stand
+        outside the range for "not used" (e.g. rfdiag = 0 for no file, otherwise 19 < rfdiag < 100).
+        """
+        if value == self.default:
+            return True
+        if self.min is not None and value < self.min:
+            return False
+        if self.max is not None and value > self.max:
+            return False
+        return True
+
+
+class CommandSchema(object):
+
+    """
+    Frozen validator table compiled from a command_params or model 'parms' dictionary.
+    Maps parameter name to a ParamSpec holding the type check callable, position, bounds and default.
+    """
+
+    __slots__ = ('specs', 'names', 'required')
+
+    def __init__(self, command_params):
+        specs = {}
+        for name in command_params:
+            entry = command_params[name]
+            specs[name] = ParamSpec(
+                name,
+                entry.get('type'),
+                get_type_checker(entry.get('type')),
+                entry.get('pos'),
+                entry.get('req', True),
+                entry.get('min'),
+                entry.get('max'),
+                entry.get('default'))
+        object.__setattr__(self, 'specs', specs)
+        object.__setattr__(self, 'names', tuple(command_params))
+        object.__setattr__(self, 'required', tuple(name for name in self.names if specs[name].req))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CommandSchema is read only')
+
+    def __contains__(self, name):
+        return name in self.specs
 
+    def __getitem__(self, name):
+        return self.specs[name]
 
-@magic_arguments()
-@register_line_magic
-def icool():
-    "ICOOL"
-    exec('!icool')
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+
+def check_spec(spec, value, parameter=None, bounds=True):
+    """
+    Raises InvalidType if value is not of the type of spec or, if bounds is True, OutOfBounds if it is
+    outside its min and max.  parameter is the name reported for the parameter, by default that of
+    spec.
+    """
+    if not spec.check(value):
+        raise ie.InvalidType(spec.type, value.__class__.__name__)
+    if bounds and not spec.in_bounds(value):
+        raise ie.OutOfBounds(parameter or spec.name, value, spec.min, spec.max)
+
+
+empty_schema = CommandSchema({})
 
 
 class ICoolGenerator(object):
@@ -138,10 +246,18 @@ class ICoolGenerator(object):
             file.write('\n')
 
 
-class ICoolObject(object):
+class ICoolObject(SlotState):
 
     """Generic ICOOL object providing methods for"""
 
+    __metaclass__ = CommandMeta
+
+    # for001_cache holds the rendered for001.dat text of the object until one of its parameters, or
+    # a command object it encloses, changes.  owners maps id to a weak reference to each object whose
+    # cached text includes this one; entries are added as the enclosing objects are rendered.  Weak
+    # references keep a command shared between trees from keeping those trees alive.
+    transient_attributes = ['for001_cache', 'owners']
+
     def __init__(self, kwargs):
         if self.check_command_params_init(kwargs) is False:
             sys.exit(0)
@@ -174,7 +290,7 @@ class ICoolObject(object):
 
     def __setattr__(self, name, value):
         if self.check_command_param(name):
-            object.__setattr__(self, name, value)
+            self.assign(name, value)
         else:
             sys.exit(0)
 
@@ -182,83 +298,62 @@ class ICoolObject(object):
         """
         Checks whether a parameter specified for command is valid.
         """
-        command_parameters_dict = self.get_command_params()
+        schema = self.get_schema()
         # Check command parameters are all valid
         try:
-            if command_param not in command_parameters_dict:
+            if command_param not in schema:
                 raise ie.InvalidCommandParameter(
                     command_param,
-                    command_parameters_dict.keys())
+                    schema.keys())
         except ie.InvalidCommandParameter as e:
             print e
             return False
-        except ie.InvalidType as e:
-            print e
-            return False
         return True
 
-    def check_command_params_valid(
-            self,
-            command_params,
-            command_parameters_dict):
+    def check_command_params_valid(self, command_params, schema):
         """Returns True if command_params are valid (correspond to the command)
         Otherwise raises an exception and returns False"""
-        # command_parameters_dict = self.get_command_params()
         try:
             for key in command_params:
-                if key not in command_parameters_dict:
+                if key not in schema:
                     raise ie.InvalidCommandParameter(
                         key,
-                        command_parameters_dict)
+                        schema)
         except ie.InvalidCommandParameter as e:
             print e
             return False
         return True
 
-    def check_all_required_command_params_specified(
-            self,
-            command_params,
-            command_parameters_dict):
+    def check_all_required_command_params_specified(self, command_params, schema):
         """Returns True if all required command parameters were specified
         Otherwise raises an exception and returns False"""
-        # command_parameters_dict = self.get_command_params()
         try:
-            for key in command_parameters_dict:
-                if self.is_required(key, command_parameters_dict):
-                    if key not in command_params:
-                        raise ie.MissingCommandParameter(key, command_params)
+            for key in schema.required:
+                if key not in command_params:
+                    raise ie.MissingCommandParameter(key, command_params)
         except ie.MissingCommandParameter as e:
             print e
             return False
         return True
 
-    def check_command_params_type(self, command_params, command_params_dict):
-        """Checks to see whether all required command parameters specified were of the correct type"""
-        # command_params_dict = self.get_command_params()
+    def check_command_params_type(self, command_params, schema, bounds=False):
+        """
+        Checks to see whether all required command parameters specified were of the correct type and,
+        if bounds is True, within their bounds
+        """
         try:
             for key in command_params:
-                if self.check_type(
-                        command_params_dict[key]['type'],
-                        command_params[key]) is False:
-                    raise ie.InvalidType(
-                        command_params_dict[key]['type'],
-                        command_params[key].__class__.__name__)
-        except ie.InvalidType as e:
+                check_spec(schema[key], command_params[key], bounds=bounds)
+        except (ie.InvalidType, ie.OutOfBounds) as e:
             print e
             return False
         return True
 
     def check_command_param_type(self, name, value):
         """Checks to see whether a particular command parameter of name with value is of the correct type"""
-        command_params_dict = self.get_command_params()
         try:
-            if self.check_type(
-                    command_params_dict[name]['type'],
-                    value) is False:
-                raise ie.InvalidType(
-                    command_params_dict[name]['type'],
-                    value.__class__.__name__)
-        except ie.InvalidType as e:
+            check_spec(self.get_schema()[name], value, bounds=False)
+        except (ie.InvalidType, ie.OutOfBounds) as e:
             print e
             return False
         return True
@@ -268,29 +363,20 @@ class ICoolObject(object):
         Checks whether the parameters specified for command are valid, all required parameters are
         specified and all parameters are of correct type.  If not, raises an exception.
         """
-        command_parameters_dict = self.get_command_params()
-        check_params = not self.check_command_params_valid(
-            command_params,
-            command_parameters_dict) or not self.check_all_required_command_params_specified(
-            command_params,
-            command_parameters_dict) or not self.check_command_params_type(
-            command_params,
-            command_parameters_dict)
-
-        if check_params:
-            return False
-        else:
-            return True
+        schema = self.get_schema()
+        return self.check_command_params_valid(command_params, schema) and \
+            self.check_all_required_command_params_specified(command_params, schema) and \
+            self.check_command_params_type(command_params, schema)
 
     def check_command_params_call(self, command_params):
         """
         Checks whether the parameters specified for command are valid and all required parameters exist.
         """
-        command_parameters_dict = self.get_command_params()
-        return self.check_command_params_valid(command_params, command_parameters_dict) and\
+        schema = self.get_schema()
+        return self.check_command_params_valid(command_params, schema) and\
             self.check_command_params_type(
             command_params,
-            command_parameters_dict)
+            schema)
 
     def setall(self, command_params):
         for key in command_params:
@@ -300,71 +386,260 @@ class ICoolObject(object):
         command_params_dict = self.get_command_params()
         for key in command_params_dict:
             if key not in command_params:
-                self.__setattr__(key, command_params_dict[key]['default'])
+                self.__setattr__(key, make_default(command_params_dict[key]['default']))
 
-    def check_type(self, icool_type, provided_type):
-        """Takes provided python object and compares with required icool type name.
-        Returns True if the types match and False otherwise.
+    @classmethod
+    def from_validated(cls, **kwargs):
         """
-        provided_type_name = provided_type.__class__.__name__
-        print icool_type, provided_type_name
-        if icool_type == 'Real':
-            if provided_type_name == 'int' or provided_type_name == 'long' or provided_type_name == 'float':
-                return True
-            else:
-                return False
+        Trusted constructor.  Validates kwargs once, as __init__ does, and then assigns the parameters
+        directly instead of validating each of them again in __setattr__.
+        """
+        obj = cls.__new__(cls)
+        if obj.check_command_params_init(kwargs) is False:
+            sys.exit(0)
+        obj.init_validated(kwargs)
+        return obj
 
-        if icool_type == 'Integer':
-            if provided_type_name == 'int' or provided_type_name == 'long':
-                return True
-            else:
-                return False
+    @classmethod
+    def from_validated_list(cls, kwargs_list):
+        """Builds one object per dictionary in kwargs_list using from_validated."""
+        return [cls.from_validated(**kwargs) for kwargs in kwargs_list]
 
-        if icool_type == 'Logical':
-            if provided_type_name == 'bool':
-                return True
-            else:
-                return False
+    def init_validated(self, command_params):
+        """Initializes a new object from command_params which have already been validated."""
+        self.set_validated(command_params)
 
-        if icool_type == 'Field':
-            if isinstance(provided_type, Field):
-                return True
-            else:
-                return False
+    def set_validated(self, command_params):
+        # The object is new and has no cached text to discard, so the parameters are set directly.
+        set_slot = object.__setattr__
+        for key in command_params:
+            set_slot(self, key, command_params[key])
 
-        if icool_type == 'Material':
-            if isinstance(provided_type, Material):
-                return True
-            else:
-                return False
+    def clone(self, **overrides):
+        """
+        Returns a structural copy of the object with the parameters in overrides changed.
+        Enclosed command objects are shared with the original rather than copied; lists of enclosed
+        commands are copied, so commands added to or removed from the clone do not affect the
+        original.  Overrides are validated as for ordinary assignment.  A shared command which is
+        later modified marks both the original and the clone dirty.
+        """
+        state = self.__getstate__()
+        for name in state:
+            if isinstance(state[name], list):
+                state[name] = list(state[name])
+        obj = self.__class__.__new__(self.__class__)
+        obj.__setstate__(state)
+        for name in overrides:
+            setattr(obj, name, overrides[name])
+        return obj
+
+    def deep_clone(self, **overrides):
+        """
+        Returns a copy of the object with the parameters in overrides changed, as for clone, except
+        that every command object it encloses is copied as well, so nothing is shared with the
+        original.  A command enclosed more than once is copied once, as by copy.deepcopy.
+        """
+        copies = {}
+
+        def copy_command(command):
+            if id(command) not in copies:
+                state = command.__getstate__()
+                for name in state:
+                    value = state[name]
+                    if isinstance(value, list):
+                        state[name] = [copy_command(item) if isinstance(item, ICoolObject) else item
+                                       for item in value]
+                    elif isinstance(value, ICoolObject):
+                        state[name] = copy_command(value)
+                duplicate = command.__class__.__new__(command.__class__)
+                duplicate.__setstate__(state)
+                copies[id(command)] = duplicate
+            return copies[id(command)]
+        obj = copy_command(self)
+        # clone applies the overrides in the order a model change needs.
+        return obj.clone(**overrides) if overrides else obj
+
+    def check_overrides(self, overrides):
+        """
+        Returns True if the parameters in overrides could be assigned to the object, as by clone or
+        evolve, and are within their bounds, as the values substituted by a sweep or template must be.
+        Otherwise prints the error and returns False.
+        """
+        schema = self.get_schema()
+        return self.check_command_params_valid(overrides, schema) and \
+            self.check_command_params_type(overrides, schema, bounds=True)
 
-        if icool_type == 'SubRegion':
-            if isinstance(provided_type, SubRegion):
-                return True
-            else:
-                return False
+    def evolve(self, path, **overrides):
+        """
+        Persistent update.  Returns a new tree in which the command reached from this object by path
+        has the parameters in overrides changed, leaving this tree unchanged.  Each step of path is an
+        index into enclosed_commands or the name of a parameter holding a command object, e.g.
+        section.evolve([0, 2, 0, 'field'], bs=2.5).  Only the commands along the path are cloned; all
+        other subtrees are shared with the original, so each variant costs memory for the changed
+        commands and the lists enclosing them.
+        """
+        nodes = [self]
+        for step in path:
+            nodes.append(nodes[-1].get_child(step))
+        new = nodes[-1].clone(**overrides)
+        for node, step in reversed(zip(nodes[:-1], path)):
+            parent = node.clone()
+            parent.set_child(step, new)
+            new = parent
+        return new
+
+    def get_child(self, step):
+        """Returns enclosed_commands[step] if step is an index, otherwise the parameter named step."""
+        if isinstance(step, (int, long)):
+            return self.enclosed_commands[step]
+        return getattr(self, step)
+
+    def set_child(self, step, command):
+        """Replaces the command returned by get_child(step) with command."""
+        if isinstance(step, (int, long)):
+            self.replace_enclosed_command(command, step)
+        else:
+            old_command = getattr(self, step)
+            self.assign(step, command)
+            if isinstance(old_command, ICoolObject) and old_command is not command:
+                old_command.remove_owner(self)
 
-        if icool_type == 'Distribution':
-            if isinstance(provided_type, Distribution):
-                return True
-            else:
-                return False
+    def assign(self, name, value):
+        """
+        Sets a parameter which has already been validated and discards the cached for001 text.
+        """
+        object.__setattr__(self, name, value)
+        self.mark_dirty()
 
-        if icool_type == 'Correlation':
-            if isinstance(provided_type, Correlation):
-                return True
+    def add_owner(self, owner):
+        if self.owners is None:
+            object.__setattr__(self, 'owners', {})
+        self.owners[id(owner)] = weakref.ref(owner)
+
+    def remove_owner(self, owner):
+        if self.owners is not None:
+            self.owners.pop(id(owner), None)
+
+    def mark_dirty(self):
+        """
+        Discards the cached for001 text of this object and of every object enclosing it, so that the
+        next render only re-renders the changed subtree.  Changes made through __setattr__ and the
+        Container methods mark objects dirty automatically; call this after modifying
+        enclosed_commands in place.
+        """
+        if self.for001_cache is None:
+            # Objects enclosing this one can only hold cached text while this object does.
+            return
+        pending = [self]
+        while pending:
+            obj = pending.pop()
+            object.__setattr__(obj, 'for001_cache', None)
+            if obj.owners:
+                for key, ref in obj.owners.items():
+                    owner = ref()
+                    if owner is None:
+                        del obj.owners[key]
+                    elif owner.for001_cache is not None:
+                        pending.append(owner)
+
+    def get_for001(self):
+        """Returns the for001.dat text of the object, rendering it only if it is not already cached."""
+        if self.for001_cache is None:
+            for text in self.iter_for001(cache=True):
+                pass
+        return self.for001_cache
+
+    def gen_for001(self, file):
+        with For001Writer(file) as writer:
+            for text in self.iter_for001():
+                writer.write(text)
+
+    def iter_for001(self, cache=False, run_length=512):
+        """
+        Yields the for001.dat text of the object in pieces.  Each object supplies for001_parts, which
+        yields strings and, in their place in the output, the command objects it encloses.  The tree is
+        walked with an explicit stack rather than by recursion.  Consecutive strings are joined into
+        runs of about run_length pieces before being yielded.
+
+        Text already cached is reused.  If cache is True, the text of every object rendered is cached
+        as well; otherwise nothing is kept and memory use does not grow with the size of the tree.
+        """
+        if self.for001_cache is not None:
+            yield self.for001_cache
+            return
+        stack = [(self, self.for001_parts(), [] if cache else None)]
+        run = []
+        while stack:
+            obj, parts, pieces = stack[-1]
+            for part in parts:
+                if isinstance(part, basestring):
+                    text = part
+                else:
+                    if pieces is not None:
+                        part.add_owner(obj)
+                    text = part.for001_cache
+                    if text is None:
+                        stack.append((part, part.for001_parts(), [] if cache else None))
+                        break
+                if pieces is not None:
+                    pieces.append(text)
+                run.append(text)
             else:
-                return False
+                stack.pop()
+                if pieces is not None:
+                    text = ''.join(pieces)
+                    object.__setattr__(obj, 'for001_cache', text)
+                    if stack:
+                        stack[-1][2].append(text)
+            if len(run) >= run_length:
+                yield ''.join(run)
+                run = []
+        if run:
+            yield ''.join(run)
+
+    def iter_lines(self, cache=False):
+        """
+        Yields the for001.dat text of the object one finished line at a time, as rendered lazily by
+        iter_for001.
+        """
+        line = []
+        for text in self.iter_for001(cache):
+            start = 0
+            end = text.find('\n')
+            while end >= 0:
+                line.append(text[start:end + 1])
+                yield ''.join(line)
+                line = []
+                start = end + 1
+                end = text.find('\n', start)
+            if start < len(text):
+                line.append(text[start:])
+        if line:
+            yield ''.join(line)
+
+    def check_type(self, icool_type, provided_type):
+        """Takes provided python object and compares with required icool type name.
+        Returns True if the types match and False otherwise.
+        """
+        return get_type_checker(icool_type)(provided_type)
 
     def get_command_params(self):
         return self.command_params
 
-    def is_required(self, command_param, command_parameters_dict):
-        # command_parameters_dict = self.get_command_params()
-        if 'req' not in command_parameters_dict[command_param]:
-            return True
-        else:
-            return command_parameters_dict[command_param]['req']
+    def get_schema(self):
+        """
+        Returns the validator schema compiled from command_params.
+        The schema is compiled the first time it is needed and then shared by all instances of the class.
+        """
+        cls = self.__class__
+        schema = cls.__dict__.get('_schema')
+        if schema is None:
+            schema = CommandSchema(cls.command_params)
+            cls._schema = schema
+        return schema
+
+    def is_required(self, command_param, schema):
+        return schema[command_param].req
 
     def gen_parm(self):
         command_params = self.get_command_params()
@@ -374,7 +649,6 @@ class ICoolObject(object):
             pos = int(command_params[key]['pos']) - 1
             val = getattr(self, key)
             parm[pos] = val
-        print parm
         return parm
 
     def for001_str_gen(self, value):
@@ -398,24 +672,24 @@ class ICoolObject(object):
 
 class ICoolNameList(ICoolObject):
 
-    def gen_for001(self, file):
+    def for001_parts(self):
         name = self.__class__.__name__.lower()
-        file.write('&')
-        file.write(name)
-        file.write(' ')
+        yield '&'
+        yield name
+        yield ' '
         count = 0
         items_per_line = 5
         for key in self.command_params:
             if hasattr(self, key):
-                file.write(str(key))
-                file.write('=')
-                file.write(self.for001_str_gen(getattr(self, key)))
-                file.write(' ')
+                yield str(key)
+                yield '='
+                yield self.for001_str_gen(getattr(self, key))
+                yield ' '
                 count = count + 1
                 if count % items_per_line == 0:
-                    file.write('\n')
-        file.write('/')
-        file.write('\n')
+                    yield '\n'
+        yield '/'
+        yield '\n'
 
 
 class Container(ICoolObject):
@@ -423,6 +697,8 @@ class Container(ICoolObject):
     """Abstract class container for other commands.
     """
 
+    instance_attributes = ['enclosed_commands']
+
     def __init__(self, enclosed_commands=None):
         if enclosed_commands is None:
             print "Setting self.enclosed_commands to []"
@@ -434,7 +710,7 @@ class Container(ICoolObject):
     def __setattr__(self, name, value):
         # command_parameters_dict = self.command_params
         if name == 'enclosed_commands':
-            object.__setattr__(self, name, value)
+            self.assign(name, value)
         else:
             if not self.check_command_param(name):
                 return False
@@ -442,7 +718,7 @@ class Container(ICoolObject):
                 if not self.check_command_param_type(name, value):
                     return False
                 else:
-                    object.__setattr__(self, name, value)
+                    self.assign(name, value)
                     return True
 
     def __str__(self):
@@ -456,15 +732,35 @@ class Container(ICoolObject):
             sys.exit(0)
         else:
             self.enclosed_commands.append(command)
+            self.mark_dirty()
 
     def insert_enclosed_command(self, command, insert_point):
         if self.check_allowed_command(command) is False:
             sys.exit(0)
         else:
             self.enclosed_commands.insert(insert_point, command)
+            self.mark_dirty()
 
     def remove_enclosed_command(self, delete_point):
+        command = self.enclosed_commands[delete_point]
         del self.enclosed_commands[delete_point]
+        if command not in self.enclosed_commands:
+            command.remove_owner(self)
+        self.mark_dirty()
+
+    def replace_enclosed_command(self, command, replace_point):
+        if self.check_allowed_enclosed_command(command) is False:
+            sys.exit(0)
+        else:
+            old_command = self.enclosed_commands[replace_point]
+            self.enclosed_commands[replace_point] = command
+            if old_command not in self.enclosed_commands:
+                old_command.remove_owner(self)
+            self.mark_dirty()
+
+    def init_validated(self, command_params):
+        ICoolObject.init_validated(self, command_params)
+        object.__setattr__(self, 'enclosed_commands', [])
 
     def check_allowed_enclosed_command(self, command):
         try:
@@ -480,20 +776,21 @@ class Container(ICoolObject):
     def check_allowed_enclosed_commands(self, enclosed_commands):
         pass
 
-    def gen_for001(self, file):
+    def for001_parts(self):
         for command in self.enclosed_commands:
-            print 'Command is: ', command
-            if hasattr(command, 'gen_for001'):
-                command.gen_for001(file)
+            if isinstance(command, ICoolObject):
+                yield command
             else:
-                file.write(self.for001_str_gen(command))
+                yield self.for001_str_gen(command)
 
 
 class ICoolNameListContainer(ICoolNameList, Container):
 
-    def gen_for001(self, file):
-        ICoolNameList.gen_for001(self, file)
-        Container.gen_for001(self, file)
+    def for001_parts(self):
+        for part in ICoolNameList.for001_parts(self):
+            yield part
+        for part in Container.for001_parts(self):
+            yield part
 
 
 class Title(ICoolObject):
@@ -515,9 +812,9 @@ class Title(ICoolObject):
     def __repr__(self):
         return 'Problem Title: ' + self.title + '\n'
 
-    def gen_for001(self, file):
-        file.write(self.title)
-        file.write('\n')
+    def for001_parts(self):
+        yield self.title
+        yield '\n'
 
 
 class Cont(ICoolNameList):
@@ -1305,30 +1602,33 @@ class Region(ICoolObject):
     def __setattr__(self, name, value):
         ICoolObject.__setattr__(self, name, value)
 
-    def gen_for001(self, file):
-        if hasattr(self, 'begtag'):
-            print 'Writing begtag'
-            file.write(self.get_begtag())
-            file.write('\n')
-        parm = self.gen_parm()
-        splits = self.get_line_splits()
-        count = 0
-        split_num = 0
-        cur_split = splits[split_num]
-        for command in parm:
-            if count == cur_split:
-                file.write('\n')
-                count = 0
-                split_num = split_num + 1
-                cur_split = splits[split_num]
-            print 'Command is: ', command
-            if hasattr(command, 'gen_for001'):
-                command.gen_for001(file)
-            else:
-                file.write(self.for001_str_gen(command))
-            file.write(' ')
-            count = count + 1
-        file.write('\n')
+    def get_for001_formatter(self):
+        """
+        Returns the for001_parts generator compiled from the parameter positions and line_splits of
+        the class.  It is compiled the first time the class is rendered.
+        """
+        cls = self.__class__
+        formatter = cls.__dict__.get('_for001_formatter')
+        if formatter is None:
+            schema = self.get_schema()
+            fields = [icool_format.field_text('None')] * self.num_params
+            for name in schema:
+                spec = schema[name]
+                if spec.type in object_types:
+                    kind = icool_format.command
+                elif spec.type == 'Logical':
+                    kind = icool_format.logical
+                else:
+                    kind = icool_format.value
+                fields[int(spec.pos) - 1] = icool_format.field_attr(name, kind)
+            prefix = self.get_begtag() + '\n' if hasattr(self, 'begtag') else ''
+            formatter = icool_format.compile_for001_parts(
+                cls.__name__, prefix, fields, self.get_line_splits(), '\n')
+            cls._for001_formatter = formatter
+        return formatter
+
+    def for001_parts(self):
+        return self.get_for001_formatter()(self)
 
 
 class RegularRegion(Region):
@@ -1371,18 +1671,14 @@ class PseudoRegion(Region):
 
 class RegularRegionContainer(RegularRegion, Container):
 
-    def gen_for001(self, file):
-        # self.gen_begtag(file)
-        # if hasattr(self, 'begtag'):
-        #    print 'Writing begtag'
-        #    file.write(self.get_begtag())
-        #    file.write('\n')
-        Region.gen_for001(self, file)
-        Container.gen_for001(self, file)
-        # self.gen_endtag(file)
+    def for001_parts(self):
+        for part in Region.for001_parts(self):
+            yield part
+        for part in Container.for001_parts(self):
+            yield part
         if hasattr(self, 'endtag'):
-            file.write(self.get_endtag())
-            file.write('\n')
+            yield self.get_endtag()
+            yield '\n'
 
 
 class Section(RegularRegionContainer):
@@ -1507,9 +1803,8 @@ class Repeat(RegularRegionContainer):
     def wrapped_sreg(cls, **kwargs):
         sreg = kwargs['sreg']
         outstep = kwargs['outstep']
-        sreg_copy = copy.deepcopy(sreg)
+        sreg_copy = sreg.deep_clone(slen=outstep)
         nrep = int(sreg.slen/outstep)
-        sreg_copy.slen = outstep
         r = cls(nrep=nrep)
         output = Output()
         r.add_enclosed_command(output)
@@ -1860,6 +2155,13 @@ class SubRegion(RegularRegion):
         Region.__setattr__(self, name, value)
 
 
+def freeze_value(value):
+    """Returns value with lists converted to tuples, so that it can be used in a content_key."""
+    if isinstance(value, list):
+        return tuple(freeze_value(item) for item in value)
+    return value
+
+
 class ModeledCommandParameter(ICoolObject):
 
     def __init__(self, kwargs):
@@ -1906,7 +2208,7 @@ class ModeledCommandParameter(ICoolObject):
                 # Delete all attributes of the current model
                 print 'Resetting model to ', value
                 self.reset_model()
-            object.__setattr__(self, self.get_model_descriptor_name(), value)
+            self.assign(self.get_model_descriptor_name(), value)
             # If new model, set all attributes of new model to 0.
             if new_model is True:
                 self.set_and_init_params_for_model(value)
@@ -1914,7 +2216,7 @@ class ModeledCommandParameter(ICoolObject):
         try:
             if self.check_command_param(name):
                 if self.check_command_param_type(name, value):
-                    object.__setattr__(self, name, value)
+                    self.assign(name, value)
             else:
                 raise ie.SetAttributeError('', self, name)
         except ie.InvalidType as e:
@@ -1931,6 +2233,36 @@ class ModeledCommandParameter(ICoolObject):
             desc = desc + key + ': ' + str(getattr(self, key)) + '\n'
         return desc
 
+    def clone(self, **overrides):
+        """
+        Returns a structural copy of the object with the parameters in overrides changed, as for
+        ICoolObject.clone.  A new model in overrides is set first, so that the other overrides are
+        parameters of the new model.
+        """
+        descriptor = self.get_model_descriptor_name()
+        if descriptor not in overrides:
+            return ICoolObject.clone(self, **overrides)
+        overrides = dict(overrides)
+        obj = ICoolObject.clone(self, **{descriptor: overrides.pop(descriptor)})
+        for name in overrides:
+            setattr(obj, name, overrides[name])
+        return obj
+
+    def check_overrides(self, overrides):
+        """
+        Returns True if the parameters in overrides could be assigned to the object.  If overrides
+        changes the model, the other parameters are checked against the new model.
+        """
+        descriptor = self.get_model_descriptor_name()
+        if descriptor in overrides:
+            if not self.check_valid_model(overrides[descriptor]):
+                return False
+            schema = self.get_model_schema(overrides[descriptor])
+        else:
+            schema = self.get_schema()
+        return self.check_command_params_valid(overrides, schema) and \
+            self.check_command_params_type(overrides, schema, bounds=True)
+
     def set_keyword_args_model_specified(self, kwargs):
         setattr(
             self,
@@ -1945,6 +2277,15 @@ class ModeledCommandParameter(ICoolObject):
         for key in kwargs:
             object.__setattr__(self, key, kwargs[key])
 
+    def init_validated(self, command_params):
+        """
+        Initializes a new object from validated command_params.  The model is assigned directly along
+        with its parameters; there is no previous model to reset.
+        """
+        if self.check_no_model():
+            return
+        self.set_validated(command_params)
+
     def reset_model(self):
         for key in self.get_model_parms_dict():
             if hasattr(self, key):
@@ -1970,11 +2311,10 @@ class ModeledCommandParameter(ICoolObject):
                     self.get_model_name_in_dict(command_params)):
                 return False
             else:
-                command_params_dict = self.get_command_params_for_specified_input_model(
-                    command_params)
-                if not self.check_command_params_valid(command_params, command_params_dict) \
-                    or not self.check_all_required_command_params_specified(command_params, command_params_dict) \
-                        or not self.check_command_params_type(command_params, command_params_dict):
+                schema = self.get_model_schema(self.get_model_name_in_dict(command_params))
+                if not self.check_command_params_valid(command_params, schema) \
+                    or not self.check_all_required_command_params_specified(command_params, schema) \
+                        or not self.check_command_params_type(command_params, schema):
                             return False
                 else:
                     return True
@@ -1988,9 +2328,9 @@ class ModeledCommandParameter(ICoolObject):
         raises an exception otherwise.
         """
         if not self.get_model_descriptor_name() in command_params.keys():
-            command_params_dict = self.get_model_parms_dict()
-            if not self.check_command_params_valid(command_params, command_params_dict) \
-                or not self.check_command_params_type(command_params, command_params_dict):
+            schema = self.get_schema()
+            if not self.check_command_params_valid(command_params, schema) \
+                or not self.check_command_params_type(command_params, schema):
                     return False
             else:
                 return True
@@ -2003,7 +2343,7 @@ class ModeledCommandParameter(ICoolObject):
         If model is not valid, raises an exception and returns False.  Otherwise returns True.
         """
         try:
-            if not str(model) in self.get_model_names():
+            if model not in self._registry:
                 raise ie.InvalidModel(str(model), self.get_model_names())
         except ie.InvalidModel as e:
             print e
@@ -2063,14 +2403,14 @@ class ModeledCommandParameter(ICoolObject):
 
     def get_model_descriptor(self):
         """Returns the model descriptor dictionary"""
-        return self.models['model_descriptor']
+        return self._registry.descriptor
 
     def get_model_descriptor_name(self):
         """
         The model descriptor name is an alias name for the term 'model', which is specified for each descendent class.
         Returns the model descriptor name.
         """
-        return self.get_model_descriptor()['name']
+        return self._registry.descriptor_name
 
     def get_current_model_name(self):
         """Returns the name of the current model"""
@@ -2089,30 +2429,22 @@ class ModeledCommandParameter(ICoolObject):
         """
         Returns the parameter dictionary for model name.
         """
-        return self.models[str(model)]['parms']
+        return self._registry.parms[str(model)]
 
     def get_num_params(self):
         """
         Returns the number of parameters for model.
         """
-        return self.get_model_descriptor()['num_parms']
+        return self._registry.num_parms
 
     def get_icool_model_name(self):
         """Check to see whether there is an alternate icool_model_name from the common name.
         If so return that.  Otherwise, just return the common name."""
-        if 'icool_model_name' not in self.models[
-                str(self.get_current_model_name())]:
-            return self.get_current_model_name()
-        else:
-            return self.models[str(self.get_current_model_name())][
-                'icool_model_name']
+        return self._registry.icool_names[str(self.get_current_model_name())]
 
     def get_model_names(self):
         """Returns a list of all model names"""
-        ret_list = self.models.keys()
-        pos = ret_list.index('model_descriptor')
-        del ret_list[pos]
-        return ret_list
+        return list(self._registry.names)
 
     def get_model_name_in_dict(self, dict):
         """Returns the model name in a provided dictionary if it exists.  Otherwise returns None"""
@@ -2124,6 +2456,56 @@ class ModeledCommandParameter(ICoolObject):
     def get_command_params(self):
         return self.get_model_parms_dict()
 
+    def get_schema(self):
+        """
+        Returns the validator schema for the current model.
+        """
+        if self.get_model_descriptor_name() is None:
+            return empty_schema
+        else:
+            return self.get_model_schema(self.get_current_model_name())
+
+    def get_model_schema(self, model):
+        """
+        Returns the validator schema for model name.  Schemas for all models of the class are compiled
+        the first time one of them is needed.
+        """
+        cls = self.__class__
+        schemas = cls.__dict__.get('_model_schemas')
+        if schemas is None:
+            schemas = {}
+            for name in cls._registry.names:
+                schemas[name] = CommandSchema(cls._registry.parms[name])
+            cls._model_schemas = schemas
+        return schemas[str(model)]
+
+    def content_key(self):
+        """
+        Returns a hashable key identifying the content of the command: its class, its model and the
+        values of the model parameters in position order.  Commands with equal keys render the same
+        for001.dat text.
+        """
+        descriptor_name = self.get_model_descriptor_name()
+        if descriptor_name is None:
+            return (self.__class__.__name__, None, ())
+        model = str(self.get_current_model_name())
+        return (self.__class__.__name__, model,
+                tuple(freeze_value(getattr(self, name, None)) for name in self._registry.orderings[model]))
+
+    def content_hash(self):
+        """Returns a hex digest of content_key which is stable between sessions."""
+        return hashlib.sha1(repr(self.content_key())).hexdigest()
+
+    @classmethod
+    def interned(cls, pool=None, **kwargs):
+        """
+        Returns the command built from kwargs, shared with any identical command already in pool
+        (icool_intern.intern_pool by default).  Interned commands should not be modified in place.
+        """
+        if pool is None:
+            pool = icool_intern.intern_pool
+        return pool.intern(cls.from_validated(**kwargs))
+
     def get_command_params_for_specified_input_model(
             self,
             input_command_params):
@@ -2132,7 +2514,7 @@ class ModeledCommandParameter(ICoolObject):
         return self.get_model_dict(specified_model)
 
     def get_line_splits(self):
-        return self.models['model_descriptor']['for001_format']['line_splits']
+        return self._registry.line_splits
 
     ##################################################
 
@@ -2152,39 +2534,44 @@ class ModeledCommandParameter(ICoolObject):
             pos = int(command_params[key]['pos']) - 1
             if key == self.get_model_descriptor_name():
                 val = self.get_icool_model_name()
-                print 'Using icool name', val
             else:
                 val = getattr(self, key)
             parm[pos] = val
-        print parm
         return parm
 
-    def gen_for001(self, file):
-        if hasattr(self, 'begtag'):
-            print 'Writing begtag'
-            # file.write('\n')
-            file.write(self.get_begtag())
-            file.write('\n')
-        parm = self.gen_parm()
-        splits = self.get_line_splits()
-        count = 0
-        split_num = 0
-        cur_split = splits[split_num]
-        for i in parm:
-            if count == cur_split:
-                file.write('\n')
-                count = 0
-                split_num = split_num + 1
-                cur_split = splits[split_num]
-            file.write(str(i))
-            file.write(' ')
-            count = count + 1
-        file.write('\n')
-        if hasattr(self, 'endtag'):
-            print 'Writing endtag'
-            file.write('\n')
-            file.write(self.get_endtag())
-            file.write('\n')
+    def get_for001_formatter(self):
+        """
+        Returns the for001_parts generator for the current model, compiled from the positions of the
+        model parameters and the line_splits of the model descriptor.  The generators of all models
+        are cached on the class; each is compiled the first time its model is rendered.
+        """
+        cls = self.__class__
+        formatters = cls.__dict__.get('_for001_formatters')
+        if formatters is None:
+            formatters = {}
+            cls._for001_formatters = formatters
+        descriptor_name = self.get_model_descriptor_name()
+        model = None if descriptor_name is None else str(self.get_current_model_name())
+        formatter = formatters.get(model)
+        if formatter is None:
+            fields = [icool_format.field_text('0')] * self.get_num_params()
+            if model is not None:
+                schema = self.get_model_schema(model)
+                for name in schema:
+                    if name == descriptor_name:
+                        field = icool_format.field_text(str(self.get_icool_model_name()))
+                    else:
+                        field = icool_format.field_attr(name)
+                    fields[int(schema[name].pos) - 1] = field
+            prefix = self.get_begtag() + '\n' if hasattr(self, 'begtag') else ''
+            suffix = '\n\n' + self.get_endtag() + '\n' if hasattr(self, 'endtag') else '\n'
+            formatter = icool_format.compile_for001_parts(
+                '%s %s' % (cls.__name__, model), prefix, fields, self.get_line_splits(), suffix)
+            formatters[model] = formatter
+        return formatter
+
+    def for001_parts(self):
+        return self.get_for001_formatter()(self)
 
 
 class Refp(ModeledCommandParameter, PseudoRegion):
@@ -2458,7 +2845,7 @@ class Correlation(ModeledCommandParameter):
                             'pos': 2, 'type': 'Real', 'doc': 'Eref [GeV]'},
                         'babs': {
                             'pos': 3, 'type': 'Real', 'doc': 'Babs [ T ]'},
-                        'sigma_e:': {
+                        'sigma_e': {
                             'pos': 4, 'type': 'Real', 'doc': 'σE [GeV]'}}},
         'dispersion': {
             'desc': 'Dispersion', 'doc': '',
@@ -2567,19 +2954,19 @@ class BeamType(Container):
     def __repr__(self):
         return '[BeamType: ]'
 
-    def gen_for001(self, file):
-        file.write(str(self.partnum))
-        file.write(' ')
-        file.write(str(self.bmtype))
-        file.write(' ')
-        file.write(str(self.fractbt))
-        file.write('\n')
-        self.distribution.gen_for001(file)
-        file.write('\n')
-        file.write(str(self.nbcorr))
-        file.write('\n')
+    def for001_parts(self):
+        yield str(self.partnum)
+        yield ' '
+        yield str(self.bmtype)
+        yield ' '
+        yield str(self.fractbt)
+        yield '\n'
+        yield self.distribution
+        yield '\n'
+        yield str(self.nbcorr)
+        yield '\n'
         for c in self.enclosed_commands:
-            c.gen_for001(file)
+            yield c
 
 
 class Field(ModeledCommandParameter):
@@ -2594,10 +2981,17 @@ class Field(ModeledCommandParameter):
     FPARM - 15 parameters describing the field.  The first parameter is the model.
     """
 
+    instance_attributes = ['ftag', 'fparm']
+
     def __init__(self, ftag, kwargs):
         ModeledCommandParameter.__init__(self, kwargs)
         self.ftag = ftag
 
+    def init_validated(self, command_params):
+        ModeledCommandParameter.init_validated(self, command_params)
+        # The ftag of each field class is the same as its begtag
+        object.__setattr__(self, 'ftag', self.begtag)
+
     def __call__(self, kwargs):
         ModeledCommandParameter.__call__(self, kwargs)
 
@@ -2655,6 +3049,8 @@ class Material(ModeledCommandParameter):
     ...
 
     """
+    instance_attributes = ['mparm']
+
     materials = {
         'VAC': {'desc': 'Vacuum (no material)', 'icool_material_name': ''},
         'GH': {'desc': 'Gaseous hydrogen'},
@@ -2790,13 +3186,13 @@ class Material(ModeledCommandParameter):
                     'pos': 4, 'type': 'Real', 'doc': 'Distance from center to left edge [m] '},
                 'z1': {
                     'pos': 5, 'type': 'Real', 'doc': 'Distance from center to right edge [m]}'},
-                'θ0': {
+                'theta0': {
                     'pos': 6, 'type': 'Real', 'doc': 'Polar angle from vertex of left edge [deg]'},
-                'φ0': {
+                'phi0': {
                     'pos': 7, 'type': 'Real', 'doc': 'Azimuthal angle of left face [deg]'},
-                'θ1': {
+                'theta1': {
                     'pos': 8, 'type': 'Real', 'doc': 'Polar angle from vertex of right edge [deg] '},
-                'φ1': {
+                'phi1': {
                     'pos': 9, 'type': 'Real', 'doc': 'Azimuthal angle of right face [deg]'}}},
         'PWEDGE': {
             'desc': 'Asymmetric polynomial wedge absorber region',
@@ -4048,37 +4444,37 @@ class ICoolInput(ICoolObject):
                 'doc': '',
                 'type': 'Nhs',
                 'req': False,
-                'default': Nhs()},
+                'default': Nhs},
 
         'nsc': {'desc': 'ICOOL scatterplot defintion variables',
                 'doc': '',
                 'type': 'Nsc',
                        'req': False,
-                       'default': Nsc()},
+                       'default': Nsc},
 
         'nzh': {'desc': 'ICOOL z history definition variables',
                 'doc': '',
                 'type': 'Nzh',
                 'req': False,
-                'default': Nzh()},
+                'default': Nzh},
 
         'nrh': {'desc': 'ICOOL r history definition variables',
                 'doc': '',
                 'type': 'Nrh',
                 'req': False,
-                'default': Nrh()},
+                'default': Nrh},
 
         'nem': {'desc': 'ICOOL emittance plane definition variables',
                 'doc': '',
                 'type': 'Nem',
                        'req': False,
-                       'default': Nem()},
+                       'default': Nem},
 
         'ncv': {'desc': 'ICOOL covariance plane definition variables',
                 'doc': '',
                 'type': 'Ncv',
                        'req': False,
-                       'default': Ncv()},
+                       'default': Ncv},
 
         'section': {'desc': 'ICOOL cooling section region definition ',
                     'doc': '',
@@ -4096,6 +4492,12 @@ class ICoolInput(ICoolObject):
     def __str__(self):
         return ICoolObject.__str__(self, 'CONT')
 
+    def init_validated(self, command_params):
+        ICoolObject.init_validated(self, command_params)
+        for key in self.command_params:
+            if key not in command_params:
+                self.assign(key, make_default(self.command_params[key]['default']))
+
     def add_title(self, title):
         self.title = title
 
@@ -4105,26 +4507,41 @@ class ICoolInput(ICoolObject):
     def add_sec(self, sec):
         self.sec = sec
 
+    def for001_parts(self):
+        for name in ('title', 'cont', 'bmt', 'ints', 'nhs', 'nsc', 'nzh', 'nrh', 'nem', 'ncv', 'section'):
+            command = getattr(self, name)
+            if command is not None:
+                yield command
+
     def gen(self, file):
-        if self.title is not None:
-            self.title.gen_for001(file)
-        if self.cont is not None:
-            self.cont.gen_for001(file)
-        if self.bmt is not None:
-            self.bmt.gen_for001(file)
-        if self.ints is not None:
-            self.ints.gen_for001(file)
-        if self.nhs is not None:
-            self.nhs.gen_for001(file)
-        if self.nsc is not None:
-            self.nsc.gen_for001(file)
-        if self.nzh is not None:
-            self.nzh.gen_for001(file)
-        if self.nrh is not None:
-            self.nrh.gen_for001(file)
-        if self.nem is not None:
-            self.nem.gen_for001(file)
-        if self.ncv is not None:
-            self.ncv.gen_for001(file)
-        if self.section is not None:
-            self.section.gen_for001(file)
+        """
+        Writes for001.dat to file.  The text of every object is cached, so that subsequent calls only
+        re-render objects which have changed.  Use iter_lines to stream very large decks without caching.
+        """
+        with For001Writer(file) as writer:
+            for text in self.iter_for001(cache=True):
+                writer.write(text)
+
+
+def search(query, limit=10, kind=None):
+    """
+    Searches the documentation of all commands, parameters, models and namelist variables, e.g.
+    search('focusing deficit').  See icool_search.search.
+    """
+    import icool_search
+    return icool_search.search(query, limit, kind)
+
+
+def load_ipython_extension(ipython):
+    """Registers the ipycool magics with IPython (%load_ext ipycool)."""
+    import icool_magics
+    icool_magics.load_ipython_extension(ipython)
+
+
+# IPython itself is never imported here, so that batch jobs which only build and render decks do not
+# pay for it.  When ipycool is imported into a running IPython session the magics are registered.
+if 'IPython' in sys.modules:
+    _ipython = sys.modules['IPython'].get_ipython()
+    if _ipython is not None:
+        load_ipython_extension(_ipython)
+    del _ipython
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from icool_jobs import JobRunner
+
+stand_in = """#!%s
+import sys
+import time
+deck = open('for001.dat').read()
+for n in range(3):
+    print 'step', n
+    sys.stdout.flush()
+    time.sleep(0.05)
+sys.stderr.write('stand-in for ICOOL\\n')
+if 'HANG' in deck:
+    time.sleep(60)
+sys.exit(3 if 'FAIL' in deck else 0)
+"""
+
+
+def jobs_test():
+    root = tempfile.mkdtemp()
+    try:
+        executable = os.path.join(root, 'icool')
+        with open(executable, 'w') as file:
+            file.write(stand_in % sys.executable)
+        os.chmod(executable, 0755)
+        directories = []
+        for number, deck in enumerate(['OK', 'FAIL', 'HANG', 'OK']):
+            directory = os.path.join(root, 'point_%d' % number)
+            os.mkdir(directory)
+            with open(os.path.join(directory, 'for001.dat'), 'w') as file:
+                file.write(deck)
+            directories.append(directory)
+        lines = []
+        finished = []
+        runner = JobRunner(executable, processes=1)
+        start = time.time()
+        jobs = runner.submit_all(directories, on_line=lambda job, stream, line: lines.append((job.number, stream, line)))
+        assert time.time() - start < 0.5
+        for job in jobs:
+            job.add_done_callback(finished.append)
+        assert jobs[3].cancel()
+        assert jobs[0].wait().status == 0
+        assert jobs[1].wait().status == 3
+        assert [line for number, stream, line in lines if number == 0] == \
+            ['step 0', 'step 1', 'step 2', 'stand-in for ICOOL']
+        assert jobs[1].last_line == 'step 2'
+        while jobs[2].state != 'running':
+            time.sleep(0.01)
+        assert jobs[2].wait(0.1) is None
+        assert jobs[2].cancel()
+        assert jobs[2].wait().status == -9
+        assert [job.state for job in jobs] == ['done', 'done', 'cancelled', 'cancelled']
+        assert jobs[3].result is None
+        assert not jobs[0].cancel()
+        assert sorted(job.number for job in finished) == [0, 1, 2, 3]
+        again = runner.submit(directories[0])
+        assert again.number == 4 and again.wait().status == 0
+        # A directory which is missing, or whose run raises, fails alone and the batch goes on.
+        batch = runner.submit_all([os.path.join(root, 'missing'), directories[0]])
+        assert batch[0].wait().status is None and batch[1].wait().status == 0
+        start = runner.start
+        runner.start = lambda directory: 1 / 0 if directory == directories[1] else start(directory)
+        try:
+            batch = runner.submit_all(directories[1:2] + directories[:1])
+            assert batch[0].wait().status is None and batch[1].wait().status == 0
+            assert [job.state for job in batch] == ['done', 'done'] and runner.thread.is_alive()
+        finally:
+            runner.start = start
+        runner.shutdown()
+        assert not runner.thread.is_alive()
+        assert threading.active_count() == 1
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,136 @@
+import os
+import sys
+import socket
+import shutil
+import tempfile
+import subprocess
+from icool_runner import Runner, RunResult
+from icool_jobtable import JobTable
+
+stand_in = """#!%s
+import os
+import sys
+import time
+deck = open('for001.dat').read()
+with open(os.path.join(os.path.dirname(sys.argv[0]), 'runs'), 'a') as file:
+    file.write(os.getcwd() + '\\n')
+with open('for009.dat', 'w') as file:
+    file.write(deck)
+time.sleep(0.05)
+sys.exit(3 if 'FAIL' in deck else 0)
+"""
+
+
+def jobtable_test():
+    root = tempfile.mkdtemp()
+    try:
+        executable = os.path.join(root, 'icool')
+        with open(executable, 'w') as file:
+            file.write(stand_in % sys.executable)
+        os.chmod(executable, 0755)
+        directories = []
+        for number in range(12):
+            directory = os.path.join(root, 'point_%02d' % number)
+            os.mkdir(directory)
+            with open(os.path.join(directory, 'for001.dat'), 'w') as file:
+                file.write('FAIL' if number == 5 else 'deck %d' % number)
+            directories.append(directory)
+        path = os.path.join(root, 'jobs.db')
+        table = JobTable(path)
+        assert table.add(directories, [{'n': number} for number in range(12)]) == 12
+        assert table.add(directories, [{'n': number} for number in range(12)]) == 0
+        runner = Runner(executable, processes=2)
+        # An interrupted sweep: only some jobs are run, and one is left running by a dead worker.
+        assert table.work(runner, limit=3) == 3
+        assert table.claim('%s:%d' % (socket.gethostname(), 2 ** 22 + 1)) == [(4, directories[3])]
+        assert table.get_counts() == {'done': 3, 'running': 1, 'pending': 8}
+        # Workers in several processes share the rest, and each job is run once.
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icool_jobtable.py')
+        workers = [subprocess.Popen([sys.executable, script, path, '-j', '2', '-e', executable],
+                                    stdout=subprocess.PIPE)
+                   for worker in range(3)]
+        for worker in workers:
+            worker.communicate()
+            assert worker.returncode == 0
+        runs = open(os.path.join(root, 'runs')).read().split()
+        assert sorted(runs) == sorted(set(runs)) == sorted(os.path.realpath(d) for d in directories)
+        assert table.get_counts() == {'done': 11, 'failed': 1}
+        jobs = table.get_jobs()
+        assert [job['parameters'] for job in jobs] == [{'n': number} for number in range(12)]
+        assert jobs[0]['directory'] == directories[0] and jobs[0]['outputs'] == ['for009.dat', 'icool.err',
+                                                                                 'icool.log']
+        assert jobs[5]['state'] == 'failed' and jobs[5]['status'] == 3
+        # A changed deck is run again.
+        with open(os.path.join(directories[5], 'for001.dat'), 'w') as file:
+            file.write('deck 5')
+        assert table.add(directories, [{'n': number} for number in range(12)]) == 1
+        assert table.work(runner) == 1
+        assert table.get_counts() == {'done': 12}
+        # A worker whose job was recovered and claimed by another cannot record its result.
+        with open(os.path.join(directories[0], 'for001.dat'), 'w') as file:
+            file.write('deck 0 changed')
+        assert table.add(directories, [{'n': number} for number in range(12)]) == 1
+        [(job_id, directory)] = table.claim('old:1')
+        table.release([job_id])
+        assert table.claim('new:2') == [(job_id, directory)]
+        result = RunResult(directory, 0, 1.0, 0, False, False)
+        assert table.finish(job_id, 'old:1', result) is False
+        assert table.get_counts() == {'done': 11, 'running': 1}
+        assert table.finish(job_id, 'new:2', result) is True
+        assert table.get_counts() == {'done': 12}
+        table.close()
+    finally:
+        shutil.rmtree(root)
+
+
+def jobtable_recover_test():
+    import icool_jobtable
+    root = tempfile.mkdtemp()
+    interval = icool_jobtable.recover_interval
+    try:
+        executable = os.path.join(root, 'icool')
+        with open(executable, 'w') as file:
+            file.write(stand_in % sys.executable)
+        os.chmod(executable, 0755)
+        directories = []
+        for number in range(4):
+            directory = os.path.join(root, 'point_%d' % number)
+            os.mkdir(directory)
+            with open(os.path.join(directory, 'for001.dat'), 'w') as file:
+                file.write('deck %d' % number)
+            directories.append(directory)
+        table = JobTable(os.path.join(root, 'jobs.db'))
+        table.add(directories, [{'n': number} for number in range(4)])
+        runner = Runner(executable, processes=1)
+        dead = '%s:%d' % (socket.gethostname(), 2 ** 22 + 1)
+        recoveries = []
+        recover = table.recover
+        table.recover = lambda: recoveries.append(recover()) or recoveries[-1]
+        start = runner.start
+        lose_on = [directories[0]]
+
+        def start_and_lose(directory):
+            # A dead worker takes the next job while this one runs.
+            if directory in lose_on:
+                table.claim(dead)
+            return start(directory)
+        runner.start = start_and_lose
+        # Lost jobs are recovered while the worker runs, not only when it starts.
+        icool_jobtable.recover_interval = 0.0
+        assert table.work(runner) == 4
+        assert recoveries[0] == 0 and sum(recoveries) == 1 and len(recoveries) > 2
+        assert table.get_counts() == {'done': 4}
+        # A job lost after the last pending one was claimed is recovered before the worker stops.
+        icool_jobtable.recover_interval = interval
+        for number in (2, 3):
+            with open(os.path.join(directories[number], 'for001.dat'), 'w') as file:
+                file.write('deck %d changed' % number)
+        table.add(directories, [{'n': number} for number in range(4)])
+        lose_on[:] = [directories[2]]
+        del recoveries[:]
+        assert table.work(runner) == 2 and recoveries == [0, 1, 0]
+        assert table.get_counts() == {'done': 4}
+        table.close()
+    finally:
+        icool_jobtable.recover_interval = interval
+        shutil.rmtree(root)
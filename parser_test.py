@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import py.test
+import cStringIO
+import icool_exceptions as ie
+from ipycool import *
+from icool_parser import read_for001, parse_for001
+from bmt_gen_test import bmt_gen_test
+
+
+def parser_round_trip_test():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'for001.dat')
+    try:
+        bmt_gen_test(path)
+        text = open(path).read()
+        for intern in (False, True):
+            out = cStringIO.StringIO()
+            read_for001(path, intern).gen(out)
+            assert out.getvalue() == text
+    finally:
+        shutil.rmtree(directory)
+
+
+def parser_layout_test():
+    deck = """Hand written deck
+&cont npart=100,
+  bgen=.true. /
+&bmt nbeamtyp=1 /
+1 2 1 1 0 0 0 0 0 0.2 0.00486 0.00486 0.86 0.000935 0.000935 0.002 0
+&ints /
+SECTION
+SREGION
+0.5 1 1e-3
+1 0 0.5
+SOL 8 40. 0 0 0 0 0 0 0 0 0 0 0 0 0
+LH CBLOCK 0 0 0 0 0 0 0 0 0 0
+ENDSECTION
+"""
+    inp = parse_for001(deck)
+    assert inp.title.title == 'Hand written deck'
+    assert inp.cont.npart == 100 and inp.cont.bgen is True
+    sreg = inp.section.enclosed_commands[0]
+    assert sreg.slen == 0.5 and sreg.zstep == 0.001
+    subr = sreg.enclosed_commands[0]
+    assert subr.field.model == 'edge' and subr.field.bs == 40.0
+    assert subr.material.geom == 'CBLOCK' and subr.material.mtag == 'LH'
+
+
+def parser_error_test():
+    deck = 'Truncated deck\n&cont npart=100 /\nSECTION\nSREGION\n0.5 1\n'
+    with py.test.raises(ie.For001ParseError):
+        parse_for001(deck)
+
+
+def parser_integer_test():
+    deck = """Integers written as reals
+&cont npart=1.0d2 nprnt=-1. /
+&bmt nbeamtyp=1. /
+1 2 1 1 0 0 0 0 0 0.2 0.00486 0.00486 0.86 0.000935 0.000935 0.002 0
+&ints /
+SECTION
+SREGION
+0.5 1. 1e-3
+1.0D0 0 0.5
+SOL 8 40. 0 0 0 0 0 0 0 0 0 0 0 0 0
+LH CBLOCK 0 0 0 0 0 0 0 0 0 0
+ENDSECTION
+"""
+    inp = parse_for001(deck)
+    assert inp.cont.npart == 100 and type(inp.cont.npart) is int and inp.cont.nprnt == -1
+    sreg = inp.section.enclosed_commands[0]
+    assert sreg.nrreg == 1 and type(sreg.nrreg) is int
+    assert sreg.enclosed_commands[0].irreg == 1 and type(sreg.enclosed_commands[0].irreg) is int
+    assert parse_for001(deck.replace('nprnt=-1.', 'rfphase=0 rfdiag=0 prlevel=5')).cont.prlevel == 5
+    for value in ('1.5', '1.0e-1', 'one'):
+        with py.test.raises(ie.For001ParseError):
+            parse_for001(deck.replace('0.5 1. 1e-3', '0.5 %s 1e-3' % value))
+
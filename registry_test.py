@@ -0,0 +1,73 @@
+import sys
+import subprocess
+import py.test
+import icool_exceptions as ie
+from ipycool import *
+from icool_registry import ModelRegistry
+from icool_parser import parse_for001
+
+
+def registry_find_model_test():
+    registry = Sol._registry
+    assert isinstance(registry, ModelRegistry) and isinstance(Sol.__dict__['_registry'], ModelRegistry)
+    assert registry.find_model(['8', '40.', '0']) == 'edge'
+    assert registry.find_model(['8.', '40.']) == registry.find_model(['8.0d0']) == 'edge'
+    assert registry.find_model(['1']) == 'bz' and registry.find_model(['10']) == 'on_axis'
+    assert registry.find_model(['99', '40.']) is None and registry.find_model([]) is None
+    materials = Material._registry
+    assert materials.find_model(['LH', 'CBLOCK', '0']) == 'CBLOCK'
+    assert materials.find_model(['LH', 'cblock']) == 'CBLOCK'
+    # VAC has no geometry code, and is the model of a material with no known one.
+    assert materials.find_model(['VAC', 'NONE']) == 'VAC'
+    assert Accel._registry.find_model(['99']) is None
+    with py.test.raises(AttributeError):
+        registry.num_parms = 1
+
+
+def registry_icool_model_name_test():
+    assert Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40).get_icool_model_name() == 8
+    assert Material(geom='CBLOCK', mtag='LH').get_icool_model_name() == 'CBLOCK'
+    distribution = Distribution(bdistyp='gaussian', x_mean=0, y_mean=0, z_mean=0, px_mean=0, py_mean=0,
+                                pz_mean=0.2, x_std=0, y_std=0, z_std=0, px_std=0, py_std=0, pz_std=0)
+    assert distribution.get_icool_model_name() == 1
+    for cls in (Sol, Material, Distribution):
+        registry = cls._registry
+        for name in registry:
+            code = registry.icool_names[name]
+            fields = ['0'] * registry.num_parms
+            if name not in registry.untagged:
+                fields[registry.code_positions[0]] = str(code)
+            assert registry.find_model(fields) == name
+
+
+def registry_unknown_model_test():
+    sol = Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40)
+    assert sol.check_valid_model('no_such_model') is False
+    assert 'no_such_model' not in Sol._registry
+    with py.test.raises(KeyError):
+        Sol._registry.icool_names['no_such_model']
+    deck = """Unknown model
+&cont npart=100 /
+&bmt nbeamtyp=1 /
+1 2 1 1 0 0 0 0 0 0.2 0.00486 0.00486 0.86 0.000935 0.000935 0.002 0
+&ints /
+SECTION
+SREGION
+0.5 1 1e-3
+1 0 0.5
+SOL 99 40. 0 0 0 0 0 0 0 0 0 0 0 0 0
+LH CBLOCK 0 0 0 0 0 0 0 0 0 0
+ENDSECTION
+"""
+    with py.test.raises(ie.For001ParseError):
+        parse_for001(deck)
+
+
+def registry_lazy_test():
+    script = ('import ipycool, icool_registry\n'
+              'lazy = isinstance(ipycool.Accel.__dict__["_registry"], icool_registry.LazyRegistry)\n'
+              'registry = ipycool.Accel._registry\n'
+              'print lazy, isinstance(ipycool.Accel.__dict__["_registry"], icool_registry.ModelRegistry), '
+              'ipycool.Accel._registry is registry\n')
+    output = subprocess.check_output([sys.executable, '-c', script])
+    assert output.split() == ['True', 'True', 'True']
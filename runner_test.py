@@ -0,0 +1,62 @@
+import os
+import sys
+import shutil
+import tempfile
+from icool_runner import Runner, read_results
+
+stand_in = """#!%s
+import sys
+import time
+deck = open('for001.dat').read()
+print 'start', time.time()
+sys.stderr.write('stand-in for ICOOL\\n')
+block = 'x' * (40 * 1024 * 1024)
+if 'HANG' in deck:
+    time.sleep(60)
+time.sleep(0.2)
+print 'end', time.time()
+sys.exit(3 if 'FAIL' in deck else 0)
+"""
+
+
+def runner_test():
+    root = tempfile.mkdtemp()
+    try:
+        executable = os.path.join(root, 'icool')
+        with open(executable, 'w') as file:
+            file.write(stand_in % sys.executable)
+        os.chmod(executable, 0755)
+        directories = []
+        for number, deck in enumerate(['OK', 'OK', 'FAIL', 'OK', 'HANG']):
+            directory = os.path.join(root, 'point_%d' % number)
+            os.mkdir(directory)
+            with open(os.path.join(directory, 'for001.dat'), 'w') as file:
+                file.write(deck)
+            directories.append(directory)
+        runner = Runner(executable, processes=2, timeout=2.0)
+        results = runner.run(directories)
+        assert [result.status for result in results] == [0, 0, 3, 0, -9]
+        assert [result.timed_out for result in results] == [False] * 4 + [True]
+        assert all(result.max_rss > 40 * 1024 for result in results[:4])
+        spans = []
+        for directory in directories[:4]:
+            log = dict(line.split() for line in open(os.path.join(directory, 'icool.log')))
+            spans.append((float(log['start']), float(log['end'])))
+            assert open(os.path.join(directory, 'icool.err')).read() == 'stand-in for ICOOL\n'
+        for start, end in spans:
+            assert sum(1 for other_start, other_end in spans if other_start < end and start < other_end) <= 2
+        path = os.path.join(root, 'results.csv')
+        runner.write_results(path, results)
+        assert read_results(path) == results
+        missing = Runner(os.path.join(root, 'missing')).run(directories[:1])
+        assert missing[0].status is None
+        absent = runner.run([os.path.join(root, 'no_such_point')])
+        assert absent[0].status is None and not absent[0].timed_out
+        # A directory given twice is run once, and its result given in each place.
+        repeated = [directories[2], directories[0], directories[2] + os.sep, directories[0]]
+        assert len(list(runner.iter_run(repeated))) == 2
+        results = runner.run(repeated)
+        assert [result.status for result in results] == [3, 0, 3, 0]
+        assert results[0] is results[2] and results[1].directory == directories[0]
+    finally:
+        shutil.rmtree(root)
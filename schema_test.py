@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import py.test
+import icool_schema
+from icool_schema import load_schema
+
+
+def schema_cache_test():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'icool_commands.json')
+        shutil.copy(icool_schema.default_path, path)
+        registry = load_schema(path)
+        assert os.path.exists(path + icool_schema.cache_suffix)
+        namespace, (desc, icool_type, default) = registry['epsf']
+        assert namespace == 'CONT' and icool_type == 'R' and default == 0.05
+        assert 'SECTION' in registry and registry['SECTION'][0] == 'REGULAR'
+        assert load_schema(path) is registry
+
+        icool_schema.loaded.clear()
+        cached = load_schema(path)
+        assert cached is not registry and cached.commands == registry.commands
+
+        with open(path, 'a') as file:
+            file.write('\n')
+        os.utime(path, (0, 0))
+        assert load_schema(path) is not cached
+        assert icool_schema.read_cache(path, (0, 0)) is None
+    finally:
+        shutil.rmtree(directory)
+
+
+def schema_read_only_test():
+    from icool_gen import parse_icool_lang
+    registry = load_schema()
+    tables = [registry.groups, registry.groups['ICOOL_COMMANDS'], registry.namespaces,
+              registry.namespaces['CONT'], registry.commands, parse_icool_lang()]
+    for table in tables:
+        with py.test.raises(TypeError):
+            table['EPSF'] = None
+        with py.test.raises(TypeError):
+            table.update({})
+        with py.test.raises(TypeError):
+            table.pop('CONT', None)
+    copied = dict(registry.namespaces['CONT'])
+    copied['epsf'] = None
+    assert registry['epsf'][1][2] == 0.05 and load_schema() is registry
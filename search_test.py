@@ -0,0 +1,10 @@
+from ipycool import search
+
+
+def search_test():
+    names = [match.name for match in search('focusing deficit', 3)]
+    assert names[0] == 'Sol.edge'
+    assert 'Sol.edge.ent_def' in names and 'Sol.edge.ex_def' in names
+    assert search('focussing deficit', 1)[0].name == 'Sol.edge'
+    assert search('gaussian', 1, kind='model')[0].name == 'Distribution.gaussian'
+    assert search('xyzzy') == []
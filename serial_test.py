@@ -0,0 +1,40 @@
+import marshal
+import cStringIO
+import icool_exceptions as ie
+import icool_serial
+from icool_serial import dump, load, dumps, loads
+from sweep_test import sweep_deck, for001_text
+
+
+def rejects(data):
+    try:
+        loads(data)
+    except ie.SerialFormatError:
+        return True
+    return False
+
+
+def serial_test():
+    deck = sweep_deck()
+    out = cStringIO.StringIO()
+    dump(deck, out)
+    data = out.getvalue()
+    loaded = load(cStringIO.StringIO(data))
+    assert loaded is not deck and for001_text(loaded) == for001_text(deck)
+    regions = loaded.section.enclosed_commands
+    assert regions[0].enclosed_commands[0].field is regions[3].enclosed_commands[0].field
+    assert dumps(loaded) == data
+
+    header = icool_serial.header
+    body = data[header.size:]
+    assert rejects(header.pack(icool_serial.magic, icool_serial.format_version + 1) + body)
+    assert rejects(header.pack('NOTICOOL', icool_serial.format_version) + body)
+    root, layouts, counts, columns = marshal.loads(body)
+    module, name, names = layouts[0]
+    renamed = [(module, name, names[:-1] + ('no_such_parameter',))] + layouts[1:]
+    assert rejects(data[:header.size] + marshal.dumps((root, renamed, counts, columns), 2))
+    foreign = [('os', 'path', names)] + layouts[1:]
+    assert rejects(data[:header.size] + marshal.dumps((root, foreign, counts, columns), 2))
+
+    for size in (0, 4, header.size, header.size + 1, len(data) // 2, len(data) - 1):
+        assert rejects(data[:size])
@@ -0,0 +1,58 @@
+import os
+import json
+import shutil
+import tempfile
+import cStringIO
+from ipycool import *
+from icool_sweep import Sweep
+
+
+def sweep_deck():
+    sol = Sol(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40)
+    material = Material(geom='CBLOCK', mtag='LH')
+    section = Section()
+    for i in range(4):
+        sregion = SRegion(slen=1.0, nrreg=1, zstep=0.001)
+        sregion.add_enclosed_command(
+            SubRegion(irreg=1, rlow=0, rhigh=0.5, field=sol, material=material))
+        section.add_enclosed_command(sregion)
+    return ICoolInput(title=Title(title='sweep'), cont=Cont(npart=10), bmt=Bmt(nbeamtyp=1),
+                      ints=Ints(), section=section)
+
+
+def for001_text(deck):
+    out = cStringIO.StringIO()
+    deck.gen_for001(out)
+    return out.getvalue()
+
+
+def sweep_test():
+    template = sweep_deck()
+    original = for001_text(template)
+    root = tempfile.mkdtemp()
+    try:
+        grid = [('Sol.bs', [1.0, 2.0]), ('cont.rnseed', [5, 6]), ('section.2.slen', [0.25])]
+        for processes, use_template in ((1, True), (2, True), (1, False), (2, False)):
+            sweep = Sweep(template, os.path.join(root, str(processes) + str(use_template)), grid=grid)
+            manifest = sweep.run(processes, use_template=use_template)
+            assert len(manifest['points']) == 4
+            saved = json.load(open(os.path.join(sweep.root, 'manifest.json')))
+            assert saved == json.loads(json.dumps(manifest))
+            for point in manifest['points']:
+                expected = sweep_deck()
+                parameters = point['parameters']
+                expected.section.enclosed_commands[0].enclosed_commands[0].field.bs = parameters['Sol.bs']
+                expected.cont.rnseed = parameters['cont.rnseed']
+                expected.section.enclosed_commands[2].slen = 0.25
+                text = open(os.path.join(sweep.root, point['directory'], 'for001.dat')).read()
+                assert text == for001_text(expected)
+        assert sorted(os.listdir(os.path.join(root, '1True'))) == ['manifest.json', 'point_0', 'point_1',
+                                                                'point_2', 'point_3']
+        assert for001_text(template) == original
+        assert Sweep(template, root, points=[{'Sol.bs': 'strong'}]).run() is False
+        assert Sweep(template, root, points=[{'section.9.slen': 1.0}]).run() is False
+        assert Sweep(template, root, points=[{'cont.rfphase': 0}]).check()
+        for use_template in (True, False):
+            assert Sweep(template, root, points=[{'cont.prlevel': 5}]).run(use_template=use_template) is False
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,28 @@
+import cStringIO
+from ipycool import *
+import icool_format
+from icool_template import DeckTemplate
+from sweep_test import sweep_deck, for001_text
+
+
+def template_test():
+    deck = sweep_deck()
+    original = for001_text(deck)
+    template = DeckTemplate(deck, {'bs': 'Sol.bs', 'level': 'cont.prlevel', 'slen': 'section.1.slen',
+                                   'tag': 'Material.mtag'})
+    assert template.valid
+    assert dict(icool_format.logical_text) == {True: '.true.', False: '.false.'}
+    assert for001_text(deck) == original
+    values = {'bs': 2.5, 'level': 3, 'slen': 0.25, 'tag': 'LI'}
+    expected = sweep_deck()
+    expected.section.enclosed_commands[0].enclosed_commands[0].field.bs = 2.5
+    expected.section.enclosed_commands[0].enclosed_commands[0].material.mtag = 'LI'
+    expected.section.enclosed_commands[1].slen = 0.25
+    expected.cont.prlevel = 3
+    assert template.render(values) == for001_text(expected)
+    out = cStringIO.StringIO()
+    assert template.write(out, values) and out.getvalue() == for001_text(expected)
+    assert template.render(dict(values, bs='strong')) is False
+    assert template.render(dict(values, level=5)) is False
+    assert template.render({'bs': 2.5}) is False
+    assert not DeckTemplate(deck, {'model': 'Sol.model'}).valid
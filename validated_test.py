@@ -0,0 +1,84 @@
+from ipycool import *
+from sweep_test import for001_text
+
+
+def same(built, validated):
+    return built.__class__ is validated.__class__ and built.__getstate__() == validated.__getstate__() \
+        and built.get_for001() == validated.get_for001()
+
+
+def count_calls(cls, name, function, *args):
+    """Calls function(*args) and returns its result and the number of calls to cls.name made by it."""
+    original = cls.__dict__[name]
+    calls = []
+
+    def counted(*call_args):
+        calls.append(call_args)
+        return original(*call_args)
+    setattr(cls, name, counted)
+    try:
+        result = function(*args)
+    finally:
+        setattr(cls, name, original)
+    return result, len(calls)
+
+
+def exits(function, *args, **kwargs):
+    try:
+        function(*args, **kwargs)
+    except SystemExit:
+        return True
+    return False
+
+
+def validated_test():
+    sol = dict(model='edge', ent_def=0, ex_def=0, foc_flag=0, bs=40)
+    material = dict(geom='CBLOCK', mtag='LH')
+    assert same(Sol(**sol), Sol.from_validated(**sol))
+    assert same(Material(**material), Material.from_validated(**material))
+    assert same(Cont(npart=10), Cont.from_validated(npart=10))
+    subregion = dict(irreg=1, rlow=0, rhigh=0.5, field=Sol(**sol), material=Material(**material))
+    assert same(SubRegion(**subregion), SubRegion.from_validated(**subregion))
+    sregion = SRegion.from_validated(slen=1.0, nrreg=1, zstep=0.001)
+    assert same(SRegion(slen=1.0, nrreg=1, zstep=0.001), sregion)
+    assert sregion.enclosed_commands == []
+    sregion.add_enclosed_command(SubRegion.from_validated(**subregion))
+    built = SRegion(slen=1.0, nrreg=1, zstep=0.001)
+    built.add_enclosed_command(SubRegion(**subregion))
+    assert for001_text(built) == for001_text(sregion)
+
+    fields = Sol.from_validated_list([dict(sol, bs=bs) for bs in (1.0, 2.0, 3.0)])
+    assert [field.bs for field in fields] == [1.0, 2.0, 3.0]
+    assert all(same(Sol(**dict(sol, bs=field.bs)), field) for field in fields)
+
+    # The parameters are validated once, as a whole, and not again one at a time.
+    built, per_parameter = count_calls(ICoolObject, 'check_command_param',
+                                       lambda: SubRegion(**subregion))
+    validated, skipped = count_calls(ICoolObject, 'check_command_param',
+                                     lambda: SubRegion.from_validated(**subregion))
+    assert per_parameter > 0 and skipped == 0 and same(built, validated)
+    validated, checks = count_calls(ICoolObject, 'check_command_params_init',
+                                    lambda: SubRegion.from_validated(**subregion))
+    assert checks == 1
+
+    # Invalid parameters are rejected as by normal construction.
+    assert exits(Sol.from_validated, **dict(sol, bs='strong')) and exits(Sol, **dict(sol, bs='strong'))
+    assert exits(Material.from_validated, geom='CBLOCK', no_such_parameter=1)
+    assert exits(Sol.from_validated_list, [sol, dict(sol, ent_def='none')])
+    # Later assignments are validated as usual.
+    field = Sol.from_validated(**sol)
+    field.bs = 'strong'
+    assert field.bs == 40
+
+
+def bounds_test():
+    # Bounds are checked on the values substituted by a sweep or template, not on construction, so
+    # the defaults and decks written by hand are accepted as they are.
+    cont = Cont(npart=10)
+    assert same(Cont(npart=10, rfphase=0, rfdiag=0), Cont.from_validated(npart=10, rfphase=0, rfdiag=0))
+    assert not exits(Cont, prlevel=5) and not exits(Cont.from_validated, prlevel=5)
+    cont.rfphase = 0
+    cont.prlevel = 5
+    assert cont.prlevel == 5
+    assert cont.check_overrides({'rfphase': 0, 'rfdiag': 0}) and cont.check_overrides({'rfphase': 50})
+    assert not cont.check_overrides({'rfphase': 10}) and not cont.check_overrides({'prlevel': 5})